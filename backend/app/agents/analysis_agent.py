@@ -5,7 +5,7 @@ import json
 import os
 from typing import Any, Dict, List
 
-from ..ai.service import generate_entity_summary
+from ..ai.service import Priority, agenerate_entity_summary
 
 ANALYSIS_PARALLELISM = max(1, int(os.getenv("ANGELA_AGENT_ANALYSIS_PARALLELISM", "4")))
 
@@ -40,8 +40,7 @@ class AnalysisAgent:
             async def summarize_profile(profile: Dict[str, Any]) -> str:
                 reasons = profile.get("reasons", [])
                 async with semaphore:
-                    return await asyncio.to_thread(
-                        generate_entity_summary,
+                    return await agenerate_entity_summary(
                         entity_id=profile["entity_id"],
                         risk_score=profile.get("risk_score", 0.0),
                         reasons_key=json.dumps(reasons, sort_keys=True, default=str),
@@ -52,6 +51,7 @@ class AnalysisAgent:
                             else "null"
                         ),
                         bucket=bucket,
+                        priority=Priority.AGENT,
                     )
 
             summary_results = await asyncio.gather(
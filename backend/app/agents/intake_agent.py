@@ -1,21 +1,23 @@
 from __future__ import annotations
 
-import asyncio
 from typing import Any, Dict
 
-from ..nlq import parse_query
+from ..ai.service import Priority
+from ..nlq import aparse_query
 
 
 class IntakeAgent:
     name = "intake"
 
     async def run(self, query: str, bucket: int) -> Dict[str, Any]:
-        parsed = await asyncio.to_thread(parse_query, query)
+        parsed = await aparse_query(query, priority=Priority.AGENT)
         return {
             "query": query,
             "bucket": bucket,
             "intent": parsed.get("intent", "SHOW_HIGH_RISK"),
             "params": parsed.get("params", {}),
             "interpretation": parsed.get("interpretation", ""),
+            "parser": parsed.get("parser", "llm"),
+            "confidence": parsed.get("confidence"),
         }
 
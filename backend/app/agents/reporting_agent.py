@@ -6,7 +6,7 @@ import os
 from typing import Any, Dict, List, Optional
 
 from ..ai.prompts_sar import build_sar_payload
-from ..ai.service import _call_llm, generate_sar_narrative
+from ..ai.service import Priority, agenerate_sar_narrative, call_llm
 from ..data_loader import store
 
 
@@ -47,11 +47,11 @@ class ReportingAgent:
             )
             max_tokens = REPORTING_MAX_TOKENS if profile == "deep" else min(500, REPORTING_MAX_TOKENS)
             narrative_task = asyncio.create_task(
-                asyncio.to_thread(
-                    _call_llm,
+                call_llm(
                     prompt,
                     system_prompt=REPORTING_SYSTEM_PROMPT,
                     max_tokens=max_tokens,
+                    priority=Priority.AGENT,
                 )
             )
 
@@ -63,10 +63,10 @@ class ReportingAgent:
             sar_payload = await asyncio.to_thread(_build_entity_sar_payload, top_entity, bucket)
             if sar_payload is not None:
                 sar_task = asyncio.create_task(
-                    asyncio.to_thread(
-                        generate_sar_narrative,
+                    agenerate_sar_narrative(
                         entity_id=top_entity,
                         payload_key=json.dumps(sar_payload, sort_keys=True, default=str),
+                        priority=Priority.AGENT,
                     )
                 )
 
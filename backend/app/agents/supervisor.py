@@ -127,6 +127,7 @@ class InvestigationSupervisor:
                 "intent": intake_output.get("intent", ""),
                 "params": intake_output.get("params", {}),
                 "interpretation": intake_output.get("interpretation", ""),
+                "parser": intake_output.get("parser", "llm"),
                 "research": research_output,
                 "analysis": analysis_output,
                 "reporting": reporting_output,
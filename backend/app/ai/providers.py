@@ -0,0 +1,470 @@
+"""Async LLM providers, the AI event loop and the concurrency governor.
+
+Every LLM request runs on one dedicated event loop thread. The pooled
+keep-alive connections of the async OpenAI client, the governor and any
+in-flight bookkeeping live there, so they are shared by FastAPI handlers,
+agents and warmup threads alike:
+
+- async callers ``await run_async(coro)``; no thread is held while waiting
+- threads such as the warmup runner block in ``run_blocking``
+
+Identical prompts asked while one is already in flight share its result
+(``SingleFlight``), whichever of the two paths they came from. Finished
+responses are kept in the persistent ``response_store``, whose SQLite
+calls run on their own worker thread so a locked database never stalls
+the AI loop.
+
+The governor caps in-flight requests at ``ANGELA_AI_MAX_CONCURRENCY``.
+Waiters are admitted by ``Priority`` and then in arrival order, so
+background warmup never delays an analyst's request. Each attempt is
+bounded by ``ANGELA_AI_TIMEOUT`` and holds a slot only while it runs.
+Timeouts, throttling, connection errors and 5xx responses are retried
+with jittered exponential backoff.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+import openai
+
+from .response_store import response_store
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+PROVIDER = os.getenv("ANGELA_AI_PROVIDER", "openai_compat").strip().lower()
+MODEL = os.getenv("ANGELA_AI_MODEL", "gpt-5-mini")
+BASE_URL = os.getenv("ANGELA_AI_BASE_URL", "https://api.openai.com/v1")
+AWS_REGION = os.getenv("AWS_REGION", os.getenv("ANGELA_AWS_REGION", "us-east-1"))
+TIMEOUT = float(os.getenv("ANGELA_AI_TIMEOUT", "45.0"))
+MAX_CONCURRENCY = max(1, int(os.getenv("ANGELA_AI_MAX_CONCURRENCY", "16")))
+QUEUE_TIMEOUT = float(os.getenv("ANGELA_AI_QUEUE_TIMEOUT", "60.0"))
+MAX_RETRIES = max(0, int(os.getenv("ANGELA_AI_MAX_RETRIES", "2")))
+RETRY_BASE_SECONDS = float(os.getenv("ANGELA_AI_RETRY_BASE_SECONDS", "0.5"))
+
+_BEDROCK_RETRYABLE_CODES = {
+    "ThrottlingException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelNotReadyException",
+}
+
+
+class QueueTimeout(RuntimeError):
+    """Raised when a request waits longer than ``ANGELA_AI_QUEUE_TIMEOUT`` for a slot."""
+
+
+class Priority(IntEnum):
+    """Admission order when the governor is saturated (lower goes first)."""
+
+    INTERACTIVE = 0  # analyst-facing /ai/* and /nlq requests
+    AGENT = 1  # multi-agent investigation steps
+    BACKGROUND = 2  # cache warmup
+
+
+# ── AI event loop ─────────────────────────────────────────────────────
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _ai_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, daemon=True, name="angela-ai-loop").start()
+            _loop = loop
+        return _loop
+
+
+def _on_ai_loop() -> bool:
+    try:
+        return asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        return False
+
+
+async def run_async(coro: Awaitable[T]) -> T:
+    """Await ``coro`` on the AI loop from any event loop."""
+    if _on_ai_loop():
+        return await coro
+    return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, _ai_loop()))
+
+
+def run_blocking(coro: Awaitable[T]) -> T:
+    """Run ``coro`` on the AI loop and wait for it; for worker threads only."""
+    if _on_ai_loop():
+        raise RuntimeError("run_blocking called on the AI loop; await run_async instead")
+    return asyncio.run_coroutine_threadsafe(coro, _ai_loop()).result()
+
+
+# ── Concurrency governor ──────────────────────────────────────────────
+
+class ConcurrencyGovernor:
+    """Caps in-flight requests; waiters are admitted by priority, then FIFO.
+
+    Only used from the AI loop, so it needs no locking.
+    """
+
+    def __init__(self, limit: int = MAX_CONCURRENCY) -> None:
+        self.limit = limit
+        self.active = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+
+    async def acquire(self, priority: Priority) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        self.queued += 1
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._seq), waiter))
+        try:
+            await waiter
+        except BaseException:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as this waiter gave up
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        self.admitted += 1
+
+    def release(self) -> None:
+        # Hand the slot straight to the next live waiter
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, priority: Priority, timeout: float = QUEUE_TIMEOUT) -> AsyncIterator[None]:
+        try:
+            await asyncio.wait_for(self.acquire(priority), timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise QueueTimeout(f"no AI slot free within {timeout:.0f}s") from None
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        waiting = [0] * len(Priority)
+        for priority, _, waiter in self._waiters:
+            if not waiter.done():
+                waiting[priority] += 1
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": {p.name.lower(): waiting[p] for p in Priority},
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
+
+
+# ── Providers ─────────────────────────────────────────────────────────
+
+def _extract_openai_chat_text(response: Any) -> str:
+    """Extract assistant text from OpenAI-compatible chat completion response."""
+    if not getattr(response, "choices", None):
+        return ""
+    message = response.choices[0].message
+    content = message.content
+
+    if isinstance(content, str):
+        return content.strip()
+
+    if isinstance(content, list):
+        parts: list[str] = []
+        for block in content:
+            text: Optional[str] = None
+            if isinstance(block, dict):
+                text = block.get("text")
+            else:
+                text = getattr(block, "text", None)
+            if isinstance(text, str) and text:
+                parts.append(text)
+        return "".join(parts).strip()
+
+    return ""
+
+
+class OpenAICompatProvider:
+    """Any OpenAI chat-completions endpoint over one pooled async HTTP client."""
+
+    name = "openai_compat"
+
+    def __init__(self) -> None:
+        self._client: Optional[openai.AsyncOpenAI] = None
+
+    def _get_client(self) -> openai.AsyncOpenAI:
+        if self._client is None:
+            api_key = os.getenv("ANGELA_AI_API_KEY") or os.getenv("OPENAI_API_KEY")
+            if not api_key:
+                raise RuntimeError("ANGELA_AI_API_KEY/OPENAI_API_KEY not set")
+            import httpx
+
+            self._client = openai.AsyncOpenAI(
+                api_key=api_key,
+                base_url=BASE_URL,
+                timeout=TIMEOUT,
+                # Retries are done by complete() so they respect the governor
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=MAX_CONCURRENCY,
+                        max_keepalive_connections=MAX_CONCURRENCY,
+                    ),
+                ),
+            )
+        return self._client
+
+    async def complete(self, user_prompt: str, system_prompt: str, max_tokens: int) -> str:
+        client = self._get_client()
+        response = await client.chat.completions.create(
+            model=MODEL,
+            max_tokens=max_tokens,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+        )
+        text = _extract_openai_chat_text(response)
+        if text:
+            return text
+
+        # Some reasoning-enabled models may spend all budget on internal reasoning
+        # and return no assistant text when finish_reason is "length".
+        finish_reason = response.choices[0].finish_reason if response.choices else None
+        if finish_reason == "length":
+            retry_tokens = max(max_tokens * 3, 600)
+            retry = await client.chat.completions.create(
+                model=MODEL,
+                max_tokens=retry_tokens,
+                messages=[
+                    {"role": "system", "content": f"{system_prompt}\nRespond with final answer only."},
+                    {"role": "user", "content": user_prompt},
+                ],
+            )
+            retry_text = _extract_openai_chat_text(retry)
+            if retry_text:
+                return retry_text
+
+        log.warning(
+            f"OpenAI-compatible model returned empty content (model={MODEL}, finish_reason={finish_reason})"
+        )
+        return ""
+
+    @staticmethod
+    def is_retryable(exc: BaseException) -> bool:
+        return isinstance(exc, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError))
+
+
+class BedrockProvider:
+    """AWS Bedrock Runtime ``converse`` via boto3 on a dedicated bounded pool.
+
+    boto3 has no async client, so calls run on their own executor sized to
+    the governor limit and never touch the default thread pool.
+    """
+
+    name = "bedrock_native"
+
+    def __init__(self) -> None:
+        self._client: Any = None
+        self._executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix="angela-bedrock")
+
+    def _get_client(self) -> Any:
+        if self._client is None:
+            try:
+                import boto3
+                from botocore.config import Config
+            except Exception as exc:
+                raise RuntimeError(
+                    "boto3 is required for ANGELA_AI_PROVIDER=bedrock_native. "
+                    "Install with: pip install boto3"
+                ) from exc
+            self._client = boto3.client(
+                "bedrock-runtime",
+                region_name=AWS_REGION,
+                config=Config(
+                    max_pool_connections=MAX_CONCURRENCY,
+                    read_timeout=TIMEOUT,
+                    retries={"total_max_attempts": 1},
+                ),
+            )
+        return self._client
+
+    def _converse(self, user_prompt: str, system_prompt: str, max_tokens: int) -> str:
+        response = self._get_client().converse(
+            modelId=MODEL,
+            system=[{"text": system_prompt}],
+            messages=[{"role": "user", "content": [{"text": user_prompt}]}],
+            inferenceConfig={"maxTokens": max_tokens},
+        )
+
+        content = response.get("output", {}).get("message", {}).get("content", [])
+        parts: list[str] = []
+        for block in content:
+            if isinstance(block, dict):
+                text = block.get("text")
+                if isinstance(text, str) and text:
+                    parts.append(text)
+        return "".join(parts)
+
+    async def complete(self, user_prompt: str, system_prompt: str, max_tokens: int) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._converse, user_prompt, system_prompt, max_tokens)
+
+    @staticmethod
+    def is_retryable(exc: BaseException) -> bool:
+        try:
+            from botocore.exceptions import ClientError, ConnectionError, HTTPClientError
+        except Exception:
+            return False
+        if isinstance(exc, ClientError):
+            return exc.response.get("Error", {}).get("Code") in _BEDROCK_RETRYABLE_CODES
+        return isinstance(exc, (ConnectionError, HTTPClientError))
+
+
+def _make_provider() -> Any:
+    if PROVIDER == "bedrock_native":
+        return BedrockProvider()
+    if PROVIDER != "openai_compat":
+        log.warning(f"Unknown ANGELA_AI_PROVIDER '{PROVIDER}', falling back to openai_compat")
+    return OpenAICompatProvider()
+
+
+provider = _make_provider()
+governor = ConcurrencyGovernor()
+
+
+def _backoff(attempt: int) -> float:
+    # Full jitter: uniform over [0, base * 2^attempt]
+    return random.uniform(0, RETRY_BASE_SECONDS * (2 ** attempt))
+
+
+def prompt_hash(text: str) -> str:
+    """Hash of ``text`` with whitespace runs collapsed and ends stripped."""
+    return hashlib.blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).hexdigest()
+
+
+class SingleFlight:
+    """Shares one in-flight request among concurrent identical prompts.
+
+    Keyed by provider, model, token budget and the normalized prompt
+    hashes. The first caller's request (and priority) serves everyone who
+    asks before it finishes; only the AI loop touches it.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: dict[tuple, asyncio.Task] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def do(self, key: tuple, make: Callable[[], Awaitable[str]]) -> str:
+        task = self._inflight.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.ensure_future(make())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.coalesced += 1
+        # A caller that gives up must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    def _forget(self, key: tuple, done: asyncio.Task) -> None:
+        if self._inflight.get(key) is done:
+            del self._inflight[key]
+        if not done.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            done.exception()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), "started": self.started, "coalesced": self.coalesced}
+
+
+single_flight = SingleFlight()
+
+# One thread keeps store reads and writes in submission order
+_store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="angela-ai-store")
+
+
+async def complete(
+    user_prompt: str,
+    system_prompt: str,
+    max_tokens: int,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    """One governed completion, shared with identical requests in flight.
+
+    Must run on the AI loop (see ``run_async``/``run_blocking``).
+    """
+    key = (provider.name, MODEL, max_tokens, prompt_hash(system_prompt), prompt_hash(user_prompt))
+    if response_store is not None:
+        stored = await asyncio.get_running_loop().run_in_executor(_store_executor, response_store.get, key)
+        if stored is not None:
+            return stored
+    return await single_flight.do(key, lambda: _complete_and_store(key, user_prompt, system_prompt, max_tokens, priority))
+
+
+async def _complete_and_store(
+    key: tuple, user_prompt: str, system_prompt: str, max_tokens: int, priority: Priority
+) -> str:
+    text = await _complete_with_retries(user_prompt, system_prompt, max_tokens, priority)
+    if text and response_store is not None:
+        # Not awaited; later reads are queued behind the write
+        asyncio.get_running_loop().run_in_executor(_store_executor, response_store.put, key, text)
+    return text
+
+
+async def _complete_with_retries(user_prompt: str, system_prompt: str, max_tokens: int, priority: Priority) -> str:
+    """Per-attempt timeout and jittered retries around the provider."""
+    attempt = 0
+    while True:
+        try:
+            async with governor.slot(priority):
+                return await asyncio.wait_for(provider.complete(user_prompt, system_prompt, max_tokens), TIMEOUT)
+        except QueueTimeout:
+            raise
+        except Exception as exc:
+            retryable = isinstance(exc, asyncio.TimeoutError) or provider.is_retryable(exc)
+            if not retryable or attempt >= MAX_RETRIES:
+                raise
+            # Back off without holding a slot
+            delay = _backoff(attempt)
+            attempt += 1
+            log.info(f"AI call attempt {attempt} failed ({type(exc).__name__}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+
+def ai_stats() -> dict:
+    return {
+        "provider": provider.name,
+        "model": MODEL,
+        "governor": governor.stats(),
+        "single_flight": single_flight.stats(),
+        "response_store": response_store.stats() if response_store is not None else None,
+    }
@@ -0,0 +1,263 @@
+"""Persistent LLM response store shared by every worker on the host.
+
+Responses are kept in a SQLite database under ``ANGELA_CACHE_DIR`` and
+keyed by provider, model, token budget and the hashes of the normalized
+system and user prompts. Prompts embed the evidence they describe, so a
+narrative for unchanged evidence is reused across restarts, redeploys
+and dataset reloads, while changed evidence simply misses.
+
+Entries expire after ``ANGELA_AI_CACHE_TTL_HOURS``. When the stored
+responses exceed ``ANGELA_AI_CACHE_MB``, the least recently used ones are
+evicted. Hit and miss counts and the running byte total are kept in the
+database, so ``stats()`` covers all workers.
+
+Reads only read: access times and hit/miss counts are buffered per
+process and written in one transaction every ``_FLUSH_EVERY`` reads or
+``_FLUSH_SECONDS``, and before any put, eviction or ``stats()``. Calls are
+blocking; async callers run them on an executor. Any SQLite error is
+logged and treated as a miss; the store never fails an LLM call.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from ..config import CACHE_DIR
+
+log = logging.getLogger(__name__)
+
+AI_CACHE_BYTES = max(0, int(os.getenv("ANGELA_AI_CACHE_MB", "256"))) * 1024 * 1024
+AI_CACHE_TTL_SECONDS = max(0.0, float(os.getenv("ANGELA_AI_CACHE_TTL_HOURS", "168"))) * 3600
+
+# Evict down to this share of the budget so eviction is not run on every put
+_EVICT_TARGET = 0.9
+# Buffered access times and counts are written after this many reads or seconds
+_FLUSH_EVERY = 64
+_FLUSH_SECONDS = 5.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    provider TEXT NOT NULL,
+    model TEXT NOT NULL,
+    max_tokens INTEGER NOT NULL,
+    system_hash TEXT NOT NULL,
+    user_hash TEXT NOT NULL,
+    response TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+ResponseKey = tuple[str, str, int, str, str]  # provider, model, max_tokens, system hash, user hash
+
+
+class LLMResponseStore:
+    """SQLite table of LLM responses with TTL and a byte budget."""
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = AI_CACHE_BYTES,
+        ttl_seconds: float = AI_CACHE_TTL_SECONDS,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._pending_lock = threading.Lock()
+        self._pending_access: dict[str, float] = {}
+        self._pending_counts = {"hits": 0, "misses": 0}
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMResponseStore"]:
+        """Store under ``ANGELA_CACHE_DIR``; ``ANGELA_AI_CACHE=0`` disables it."""
+        if os.getenv("ANGELA_AI_CACHE", "1").strip().lower() in {"0", "false", "off"}:
+            return None
+        return cls(CACHE_DIR / "llm" / "responses.sqlite3")
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets workers read while one writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(_SCHEMA)
+                    # Databases from before the running total start from one scan
+                    conn.execute(
+                        "INSERT OR IGNORE INTO counters (name, value) "
+                        "SELECT 'bytes', COALESCE(SUM(size), 0) FROM responses"
+                    )
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(key: ResponseKey) -> str:
+        return "|".join(str(part) for part in key)
+
+    def _add(self, conn: sqlite3.Connection, name: str, delta: int) -> None:
+        conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, delta),
+        )
+
+    def _total(self, conn: sqlite3.Connection) -> int:
+        row = conn.execute("SELECT value FROM counters WHERE name = 'bytes'").fetchone()
+        return row[0] if row else 0
+
+    def _note(self, outcome: str, key: Optional[str], now: float) -> None:
+        with self._pending_lock:
+            self._pending_counts[outcome] += 1
+            if key is not None:
+                self._pending_access[key] = now
+            due = (
+                sum(self._pending_counts.values()) >= _FLUSH_EVERY
+                or time.monotonic() - self._last_flush >= _FLUSH_SECONDS
+            )
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write buffered access times and hit/miss counts."""
+        with self._pending_lock:
+            access, self._pending_access = self._pending_access, {}
+            counts, self._pending_counts = self._pending_counts, {"hits": 0, "misses": 0}
+            self._last_flush = time.monotonic()
+        if not access and not any(counts.values()):
+            return
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "UPDATE responses SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                    [(at, key) for key, at in access.items()],
+                )
+                for name, n in counts.items():
+                    if n:
+                        self._add(conn, name, n)
+        except sqlite3.Error as exc:
+            log.warning(f"LLM response store flush failed: {exc}")
+
+    def get(self, key: ResponseKey) -> Optional[str]:
+        now = time.time()
+        skey = self._key(key)
+        try:
+            row = self._conn().execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (skey,)
+            ).fetchone()
+        except sqlite3.Error as exc:
+            log.warning(f"LLM response store read failed: {exc}")
+            return None
+        # Expired rows are left for the next eviction or overwrite
+        if row is None or (self.ttl_seconds and row[1] + self.ttl_seconds <= now):
+            self._note("misses", None, now)
+            return None
+        self._note("hits", skey, now)
+        return row[0]
+
+    def put(self, key: ResponseKey, response: str) -> None:
+        size = len(response.encode("utf-8"))
+        if not response or size > self.max_bytes:
+            return
+        self.flush()
+        now = time.time()
+        skey = self._key(key)
+        provider, model, max_tokens, system_hash, user_hash = key
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                old = conn.execute("SELECT size FROM responses WHERE key = ?", (skey,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses "
+                    "(key, provider, model, max_tokens, system_hash, user_hash, response, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (skey, provider, model, max_tokens, system_hash, user_hash, response, size, now, now),
+                )
+                self._add(conn, "bytes", size - (old[0] if old else 0))
+                total = self._total(conn)
+            if total > self.max_bytes:
+                self._evict(conn, now)
+        except sqlite3.Error as exc:
+            log.warning(f"LLM response store write failed: {exc}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        victims: list[tuple[str]] = []
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if self.ttl_seconds:
+                expired = conn.execute(
+                    "SELECT COALESCE(SUM(size), 0) FROM responses WHERE created_at <= ?", (now - self.ttl_seconds,)
+                ).fetchone()[0]
+                conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl_seconds,))
+                self._add(conn, "bytes", -expired)
+            total = self._total(conn)
+            target = int(self.max_bytes * _EVICT_TARGET)
+            freed = 0
+            for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+                if total - freed <= target:
+                    break
+                victims.append((key,))
+                freed += size
+            conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+            self._add(conn, "bytes", -freed)
+        if victims:
+            log.info(f"LLM response store: evicted {len(victims)} least recently used entries")
+
+    def clear(self) -> None:
+        with self._pending_lock:
+            self._pending_access = {}
+            self._pending_counts = {"hits": 0, "misses": 0}
+        try:
+            conn = self._conn()
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("DELETE FROM responses")
+                conn.execute("DELETE FROM counters")
+                conn.execute("INSERT INTO counters (name, value) VALUES ('bytes', 0)")
+        except sqlite3.Error as exc:
+            log.warning(f"LLM response store clear failed: {exc}")
+
+    def stats(self) -> dict:
+        self.flush()
+        try:
+            conn = self._conn()
+            entries = conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            counters = dict(conn.execute("SELECT name, value FROM counters").fetchall())
+        except sqlite3.Error as exc:
+            log.warning(f"LLM response store stats failed: {exc}")
+            return {"path": str(self.path), "error": str(exc)}
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "bytes": counters.get("bytes", 0),
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+        }
+
+
+response_store = LLMResponseStore.from_env()
@@ -3,223 +3,216 @@
 Supports:
 - OpenAI-compatible endpoints (default)
 - Native AWS Bedrock Runtime via boto3
+
+Requests go through the async provider layer in ``providers``. Each
+generator has a blocking form for worker threads and an ``a``-prefixed
+coroutine for async callers; both share the same caches.
 """
 
 from __future__ import annotations
 
+import json
 import logging
 import os
-from functools import lru_cache
+from collections import OrderedDict
 from threading import Lock
-from typing import Any, Optional
-
-import openai
+from typing import Awaitable, Hashable, Optional
 
 from .prompts import SYSTEM_PROMPT, build_entity_prompt, build_cluster_prompt
 from .prompts_sar import SAR_SYSTEM_PROMPT, build_sar_prompt
+from .providers import Priority, ai_stats, complete, run_async, run_blocking
 
 log = logging.getLogger(__name__)
 
-PROVIDER = os.getenv("ANGELA_AI_PROVIDER", "openai_compat").strip().lower()
-MODEL = os.getenv("ANGELA_AI_MODEL", "gpt-5-mini")
-BASE_URL = os.getenv("ANGELA_AI_BASE_URL", "https://api.openai.com/v1")
-AWS_REGION = os.getenv("AWS_REGION", os.getenv("ANGELA_AWS_REGION", "us-east-1"))
 MAX_TOKENS = 200
 SAR_MAX_TOKENS = int(os.getenv("ANGELA_AI_SAR_MAX_TOKENS", "1200"))
-TIMEOUT = float(os.getenv("ANGELA_AI_TIMEOUT", "45.0"))
-
-_openai_client: Optional[openai.OpenAI] = None
-_bedrock_client: Any = None
-_sar_cache_lock = Lock()
-_sar_narrative_cache: dict[str, str] = {}
-
-
-def _get_openai_client() -> openai.OpenAI:
-    global _openai_client
-    if _openai_client is None:
-        api_key = os.getenv("ANGELA_AI_API_KEY") or os.getenv("OPENAI_API_KEY")
-        if not api_key:
-            raise RuntimeError("ANGELA_AI_API_KEY/OPENAI_API_KEY not set")
-        _openai_client = openai.OpenAI(
-            api_key=api_key,
-            base_url=BASE_URL,
-            timeout=TIMEOUT,
-        )
-    return _openai_client
-
-
-def _get_bedrock_client() -> Any:
-    global _bedrock_client
-    if _bedrock_client is None:
-        try:
-            import boto3
-        except Exception as exc:
-            raise RuntimeError(
-                "boto3 is required for ANGELA_AI_PROVIDER=bedrock_native. "
-                "Install with: pip install boto3"
-            ) from exc
-        _bedrock_client = boto3.client("bedrock-runtime", region_name=AWS_REGION)
-    return _bedrock_client
-
-
-def _extract_openai_chat_text(response: Any) -> str:
-    """Extract assistant text from OpenAI-compatible chat completion response."""
-    if not getattr(response, "choices", None):
-        return ""
-    message = response.choices[0].message
-    content = message.content
-
-    if isinstance(content, str):
-        return content.strip()
-
-    if isinstance(content, list):
-        parts: list[str] = []
-        for block in content:
-            text: Optional[str] = None
-            if isinstance(block, dict):
-                text = block.get("text")
-            else:
-                text = getattr(block, "text", None)
-            if isinstance(text, str) and text:
-                parts.append(text)
-        return "".join(parts).strip()
-
-    return ""
-
-
-def _call_openai_compat(user_prompt: str, system_prompt: str, max_tokens: int) -> str:
-    client = _get_openai_client()
-    response = client.chat.completions.create(
-        model=MODEL,
-        max_tokens=max_tokens,
-        timeout=TIMEOUT,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
-    )
-    text = _extract_openai_chat_text(response)
-    if text:
-        return text
-
-    # Some reasoning-enabled models may spend all budget on internal reasoning
-    # and return no assistant text when finish_reason is "length".
-    finish_reason = response.choices[0].finish_reason if response.choices else None
-    if finish_reason == "length":
-        retry_tokens = max(max_tokens * 3, 600)
-        retry = client.chat.completions.create(
-            model=MODEL,
-            max_tokens=retry_tokens,
-            timeout=TIMEOUT,
-            messages=[
-                {"role": "system", "content": f"{system_prompt}\nRespond with final answer only."},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        retry_text = _extract_openai_chat_text(retry)
-        if retry_text:
-            return retry_text
-
-    log.warning(
-        f"OpenAI-compatible model returned empty content (model={MODEL}, finish_reason={finish_reason})"
-    )
-    return ""
 
+UNAVAILABLE = "AI summary temporarily unavailable."
 
-def _call_bedrock_native(user_prompt: str, system_prompt: str, max_tokens: int) -> str:
-    client = _get_bedrock_client()
-    response = client.converse(
-        modelId=MODEL,
-        system=[{"text": system_prompt}],
-        messages=[{"role": "user", "content": [{"text": user_prompt}]}],
-        inferenceConfig={"maxTokens": max_tokens},
-    )
 
-    content = response.get("output", {}).get("message", {}).get("content", [])
-    parts: list[str] = []
-    for block in content:
-        if isinstance(block, dict):
-            text = block.get("text")
-            if isinstance(text, str) and text:
-                parts.append(text)
-    return "".join(parts)
+class _LRU:
+    """Thread-safe LRU of generated texts."""
 
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._entries: OrderedDict[Hashable, str] = OrderedDict()
+        self._lock = Lock()
 
-def _call_llm(user_prompt: str, system_prompt: str = SYSTEM_PROMPT, max_tokens: int = MAX_TOKENS) -> str:
-    """Call the LLM and return the text response."""
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: str) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Cache by prompt inputs — LRU for hackathon. Behind these, responses
+# persist across restarts in providers.response_store.
+_entity_summary_cache = _LRU(maxsize=256)
+_cluster_summary_cache = _LRU(maxsize=64)
+_sar_narrative_cache = _LRU(maxsize=128)
+
+
+async def _complete(user_prompt: str, system_prompt: str, max_tokens: int, priority: Priority) -> str:
+    """Run on the AI loop; failures become the fallback text."""
     try:
-        if PROVIDER == "bedrock_native":
-            return _call_bedrock_native(user_prompt, system_prompt, max_tokens)
-        if PROVIDER != "openai_compat":
-            log.warning(f"Unknown ANGELA_AI_PROVIDER '{PROVIDER}', falling back to openai_compat")
-        return _call_openai_compat(user_prompt, system_prompt, max_tokens)
+        return await complete(user_prompt, system_prompt, max_tokens, priority)
     except Exception as e:
         log.warning(f"AI call failed: {e}")
-        return "AI summary temporarily unavailable."
+        return UNAVAILABLE
 
 
-# Cache by (entity_id, bucket) — LRU for hackathon
-@lru_cache(maxsize=256)
-def generate_entity_summary(
+async def _cached(cache: _LRU, key: Hashable, user_prompt: str, system_prompt: str, max_tokens: int, priority: Priority) -> str:
+    cached = cache.get(key)
+    if cached:
+        return cached
+    text = await _complete(user_prompt, system_prompt, max_tokens, priority)
+    # Only successful texts are cached, so a failure is retried next time
+    if text and text != UNAVAILABLE:
+        cache.put(key, text)
+    return text
+
+
+def _call_llm(
+    user_prompt: str,
+    system_prompt: str = SYSTEM_PROMPT,
+    max_tokens: int = MAX_TOKENS,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    """Call the LLM and return the text response (blocking; for worker threads)."""
+    return run_blocking(_complete(user_prompt, system_prompt, max_tokens, priority))
+
+
+async def call_llm(
+    user_prompt: str,
+    system_prompt: str = SYSTEM_PROMPT,
+    max_tokens: int = MAX_TOKENS,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    """Call the LLM and return the text response."""
+    return await run_async(_complete(user_prompt, system_prompt, max_tokens, priority))
+
+
+def _entity_summary(
     entity_id: str,
     risk_score: float,
     reasons_key: str,  # JSON string for cache key
     evidence_key: str,  # JSON string for cache key
     activity_key: str,  # JSON string for cache key
     bucket: int,
-) -> str:
-    import json
+    priority: Priority,
+) -> Awaitable[str]:
     reasons = json.loads(reasons_key)
     evidence = json.loads(evidence_key)
     activity = json.loads(activity_key) if activity_key != "null" else None
 
     prompt = build_entity_prompt(entity_id, risk_score, reasons, evidence, activity, bucket)
-    return _call_llm(prompt)
+    key = (entity_id, risk_score, reasons_key, evidence_key, activity_key, bucket)
+    return _cached(_entity_summary_cache, key, prompt, SYSTEM_PROMPT, MAX_TOKENS, priority)
 
 
-@lru_cache(maxsize=64)
-def generate_cluster_summary(
+def generate_entity_summary(
+    entity_id: str,
+    risk_score: float,
+    reasons_key: str,
+    evidence_key: str,
+    activity_key: str,
+    bucket: int,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    return run_blocking(_entity_summary(entity_id, risk_score, reasons_key, evidence_key, activity_key, bucket, priority))
+
+
+async def agenerate_entity_summary(
+    entity_id: str,
+    risk_score: float,
+    reasons_key: str,
+    evidence_key: str,
+    activity_key: str,
+    bucket: int,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    return await run_async(
+        _entity_summary(entity_id, risk_score, reasons_key, evidence_key, activity_key, bucket, priority)
+    )
+
+
+def _cluster_summary(
     cluster_id: str,
     entity_ids_key: str,
     risk_score: float,
     size: int,
     bucket: int,
-) -> str:
-    import json
+    priority: Priority,
+) -> Awaitable[str]:
     entity_ids = json.loads(entity_ids_key)
 
     prompt = build_cluster_prompt(cluster_id, entity_ids, risk_score, size, bucket)
-    return _call_llm(prompt)
+    key = (cluster_id, entity_ids_key, risk_score, size, bucket)
+    return _cached(_cluster_summary_cache, key, prompt, SYSTEM_PROMPT, MAX_TOKENS, priority)
+
+
+def generate_cluster_summary(
+    cluster_id: str,
+    entity_ids_key: str,
+    risk_score: float,
+    size: int,
+    bucket: int,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    return run_blocking(_cluster_summary(cluster_id, entity_ids_key, risk_score, size, bucket, priority))
+
+
+async def agenerate_cluster_summary(
+    cluster_id: str,
+    entity_ids_key: str,
+    risk_score: float,
+    size: int,
+    bucket: int,
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    return await run_async(_cluster_summary(cluster_id, entity_ids_key, risk_score, size, bucket, priority))
+
+
+def _sar_narrative(entity_id: str, payload_key: str, priority: Priority) -> Awaitable[str]:
+    prompt = build_sar_prompt(json.loads(payload_key))
+    key = f"{entity_id}:{payload_key}"
+    return _cached(_sar_narrative_cache, key, prompt, SAR_SYSTEM_PROMPT, SAR_MAX_TOKENS, priority)
 
 
 def generate_sar_narrative(
     entity_id: str,
     payload_key: str,  # JSON string for cache key
+    priority: Priority = Priority.INTERACTIVE,
 ) -> str:
-    cache_key = f"{entity_id}:{payload_key}"
-    with _sar_cache_lock:
-        cached = _sar_narrative_cache.get(cache_key)
-    if cached:
-        return cached
+    return run_blocking(_sar_narrative(entity_id, payload_key, priority))
 
-    import json
-    payload = json.loads(payload_key)
-    prompt = build_sar_prompt(payload)
-    narrative = _call_llm(prompt, system_prompt=SAR_SYSTEM_PROMPT, max_tokens=SAR_MAX_TOKENS)
 
-    # Cache successful narratives to reduce repeated generation latency.
-    if narrative and narrative != "AI summary temporarily unavailable.":
-        with _sar_cache_lock:
-            _sar_narrative_cache[cache_key] = narrative
-    return narrative
+async def agenerate_sar_narrative(
+    entity_id: str,
+    payload_key: str,  # JSON string for cache key
+    priority: Priority = Priority.INTERACTIVE,
+) -> str:
+    return await run_async(_sar_narrative(entity_id, payload_key, priority))
 
 
 def clear_ai_caches() -> None:
     """Clear all in-process AI caches.
 
-    Called when a new dataset is loaded or warmup restarts.
+    Called when a new dataset is loaded or warmup restarts. The persistent
+    response store is keyed by prompt content and is left alone.
     """
-    generate_entity_summary.cache_clear()
-    generate_cluster_summary.cache_clear()
-    with _sar_cache_lock:
-        _sar_narrative_cache.clear()
+    _entity_summary_cache.clear()
+    _cluster_summary_cache.clear()
+    _sar_narrative_cache.clear()
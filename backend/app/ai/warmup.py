@@ -11,7 +11,7 @@ from uuid import uuid4
 
 from ..data_loader import store
 from .prompts_sar import build_sar_payload
-from .service import clear_ai_caches, generate_entity_summary, generate_sar_narrative
+from .service import Priority, clear_ai_caches, generate_entity_summary, generate_sar_narrative
 
 log = logging.getLogger(__name__)
 
@@ -96,6 +96,12 @@ def trigger_ai_warmup(
 
 
 def _run_warmup(run_id: str, bucket: int, top_entities: int, top_sar: int, max_seconds: int) -> None:
+    # Warm the generation that was current when the run started
+    with store.pinned():
+        _warm(run_id, bucket, top_entities, top_sar, max_seconds)
+
+
+def _warm(run_id: str, bucket: int, top_entities: int, top_sar: int, max_seconds: int) -> None:
     try:
         deadline = time.monotonic() + max_seconds
         entity_ids = _select_top_entities(bucket=bucket, limit=top_entities)
@@ -170,6 +176,7 @@ def _warm_entity_summary(entity_id: str, bucket: int) -> None:
         evidence_key=json.dumps(risk.get("evidence", {}), sort_keys=True, default=str),
         activity_key=json.dumps(activity, sort_keys=True, default=str) if activity else "null",
         bucket=bucket,
+        priority=Priority.BACKGROUND,
     )
 
 
@@ -180,6 +187,7 @@ def _warm_sar(entity_id: str, bucket: int) -> None:
     generate_sar_narrative(
         entity_id=entity_id,
         payload_key=json.dumps(payload, sort_keys=True, default=str),
+        priority=Priority.BACKGROUND,
     )
 
 
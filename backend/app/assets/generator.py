@@ -2,12 +2,26 @@
 
 Generates cluster blobs and beacon markers as GLB files
 for hot-loading in the 3D frontend.
+
+Meshes are assembled from template geometry built once per process: a
+cluster blob is N copies of one unit icosphere, scaled and translated in a
+single NumPy pass, and a beacon is a fixed cone-on-cylinder that only
+changes colour. Exported GLB bytes are kept in ``glb_cache``, an LRU
+bounded by size that ``/assets/{filename}`` serves from. Files are still
+written to ``ASSETS_DIR`` by a background writer so other workers and
+restarts can pick them up, but generation never waits for the disk.
 """
 
 import hashlib
 import logging
-import math
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
 from pathlib import Path
+from typing import Optional
 
 import numpy as np
 import trimesh
@@ -17,6 +31,114 @@ log = logging.getLogger(__name__)
 ASSETS_DIR = Path(__file__).resolve().parent.parent.parent / "assets"
 ASSETS_DIR.mkdir(exist_ok=True)
 
+GLB_CACHE_BYTES = max(0, int(os.getenv("ANGELA_GLB_CACHE_MB", "32"))) * 1024 * 1024
+PERSIST_ASSETS = os.getenv("ANGELA_PERSIST_ASSETS", "1").strip().lower() not in {"0", "false", "off"}
+
+MAX_SUB_SPHERES = 20
+
+
+@dataclass(frozen=True)
+class GLBAsset:
+    name: str
+    data: bytes
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @cached_property
+    def etag(self) -> str:
+        return f'"{hashlib.blake2b(self.data, digest_size=8).hexdigest()}"'
+
+
+class GLBCache:
+    """LRU of exported GLB bytes keyed by file name, bounded by total size."""
+
+    def __init__(self, max_bytes: int = GLB_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, GLBAsset] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name: str) -> Optional[GLBAsset]:
+        with self._lock:
+            asset = self._entries.get(name)
+            if asset is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return asset
+
+    def put(self, asset: GLBAsset) -> None:
+        with self._lock:
+            old = self._entries.pop(asset.name, None)
+            if old is not None:
+                self._bytes -= old.size
+            if asset.size > self.max_bytes:
+                return
+            self._entries[asset.name] = asset
+            self._bytes += asset.size
+            while self._bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self._bytes -= oldest.size
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+glb_cache = GLBCache()
+
+# One writer keeps disk persistence off the generation path and in order
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="angela-asset-writer")
+
+
+def _persist(asset: GLBAsset) -> None:
+    path = ASSETS_DIR / asset.name
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        tmp.write_bytes(asset.data)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning(f"Could not persist {asset.name}: {e}")
+        tmp.unlink(missing_ok=True)
+
+
+def _store(asset: GLBAsset) -> GLBAsset:
+    glb_cache.put(asset)
+    if PERSIST_ASSETS:
+        _writer.submit(_persist, asset)
+    return asset
+
+
+def read_asset(name: str) -> Optional[GLBAsset]:
+    """Read a persisted GLB from ``ASSETS_DIR`` into the cache."""
+    path = ASSETS_DIR / name
+    if path.suffix != ".glb" or path.parent != ASSETS_DIR or not path.is_file():
+        return None
+    asset = GLBAsset(name, path.read_bytes())
+    glb_cache.put(asset)
+    return asset
+
+
+def load_asset(name: str) -> Optional[GLBAsset]:
+    """GLB bytes for ``name`` from the cache, falling back to ``ASSETS_DIR``."""
+    return glb_cache.get(name) or read_asset(name)
+
 
 def _severity_color(risk_score: float) -> list[int]:
     """Map risk score [0,1] to RGBA color."""
@@ -28,97 +150,124 @@ def _severity_color(risk_score: float) -> list[int]:
         return [80, 140, 255, 255]  # blue
 
 
+@lru_cache(maxsize=None)
+def _unit_sphere() -> tuple[np.ndarray, np.ndarray]:
+    """Vertices and faces of the unit icosphere every sub-sphere is copied from."""
+    sphere = trimesh.creation.icosphere(subdivisions=2, radius=1.0)
+    vertices = np.asarray(sphere.vertices, dtype=np.float64)
+    faces = np.asarray(sphere.faces, dtype=np.int64)
+    return vertices, faces
+
+
+@lru_cache(maxsize=None)
+def _beacon_geometry() -> tuple[np.ndarray, np.ndarray]:
+    """Vertices and faces of the beacon: a cylinder base with a cone on top."""
+    cylinder = trimesh.creation.cylinder(radius=0.08, height=0.6, sections=8)
+    cylinder.apply_translation([0, 0.3, 0])
+    cone = trimesh.creation.cone(radius=0.15, height=0.3, sections=8)
+    cone.apply_translation([0, 0.75, 0])
+    vertices = np.vstack([cylinder.vertices, cone.vertices])
+    faces = np.vstack([cylinder.faces, np.asarray(cone.faces) + len(cylinder.vertices)])
+    return vertices, faces
+
+
+def _export(vertices: np.ndarray, faces: np.ndarray, color: list[int]) -> bytes:
+    colors = np.tile(np.asarray(color, dtype=np.uint8), (len(vertices), 1))
+    mesh = trimesh.Trimesh(vertices=vertices, faces=faces, vertex_colors=colors, process=False)
+    return mesh.export(file_type="glb")
+
+
+def _sphere_offsets(entity_ids: list[str]) -> np.ndarray:
+    """Deterministic (x, y, z) position per entity from its ID hash."""
+    h = np.array(
+        [int(hashlib.md5(eid.encode()).hexdigest()[:8], 16) for eid in entity_ids],
+        dtype=np.int64,
+    )
+    angle = (h % 360) * np.pi / 180
+    radius = 0.3 + (h % 100) / 200.0
+    y = ((h >> 8) % 100) / 200.0 - 0.25
+    return np.column_stack([np.cos(angle) * radius, y, np.sin(angle) * radius])
+
+
+@lru_cache(maxsize=8)
+def _beacon_glb(color: tuple[int, ...]) -> bytes:
+    # Beacons only differ by colour, so each colour is exported once
+    vertices, faces = _beacon_geometry()
+    return _export(vertices, faces, list(color))
+
+
+def cluster_blob_name(entity_ids: list[str], risk_score: float, cluster_id: str) -> str:
+    """File name of the cluster blob GLB for these inputs."""
+    cache_key = hashlib.md5(
+        f"{cluster_id}:{risk_score:.2f}:{len(entity_ids)}".encode()
+    ).hexdigest()[:12]
+    return f"cluster_{cache_key}.glb"
+
+
+def beacon_name(entity_id: str, risk_score: float) -> str:
+    """File name of the beacon GLB for these inputs."""
+    cache_key = hashlib.md5(
+        f"beacon:{entity_id}:{risk_score:.2f}".encode()
+    ).hexdigest()[:12]
+    return f"beacon_{cache_key}.glb"
+
+
 def make_cluster_blob(
     entity_ids: list[str],
     risk_score: float,
     cluster_id: str,
-) -> Path:
+) -> GLBAsset:
     """Generate a metaball-like cluster blob as GLB.
 
     Creates a merged mesh of overlapping spheres positioned
     based on entity ID hashes, with emissive-style coloring
     based on severity.
     """
-    cache_key = hashlib.md5(
-        f"{cluster_id}:{risk_score:.2f}:{len(entity_ids)}".encode()
-    ).hexdigest()[:12]
-    out_path = ASSETS_DIR / f"cluster_{cache_key}.glb"
-
-    if out_path.exists():
-        log.info(f"Cluster blob cache hit: {out_path.name}")
-        return out_path
+    name = cluster_blob_name(entity_ids, risk_score, cluster_id)
+    cached = load_asset(name)
+    if cached is not None:
+        log.info(f"Cluster blob cache hit: {name}")
+        return cached
 
     n = len(entity_ids)
     color = _severity_color(risk_score)
+    unit_vertices, unit_faces = _unit_sphere()
 
-    # Position spheres in a clustered arrangement
-    meshes = []
-    for i, eid in enumerate(entity_ids[:20]):  # cap at 20 sub-spheres
-        # Deterministic position from entity ID
-        h = int(hashlib.md5(eid.encode()).hexdigest()[:8], 16)
-        angle = (h % 360) * math.pi / 180
-        radius = 0.3 + (h % 100) / 200.0
-        x = math.cos(angle) * radius
-        z = math.sin(angle) * radius
-        y = ((h >> 8) % 100) / 200.0 - 0.25
-
+    members = entity_ids[:MAX_SUB_SPHERES]
+    if members:
         # Sphere size scales with cluster size
-        sphere_radius = 0.2 + min(n, 20) * 0.02
-        sphere = trimesh.creation.icosphere(subdivisions=2, radius=sphere_radius)
-        sphere.apply_translation([x, y, z])
-
-        # Apply vertex colors
-        sphere.visual.vertex_colors = np.tile(color, (len(sphere.vertices), 1))
-        meshes.append(sphere)
-
-    if not meshes:
+        scale = 0.2 + min(n, MAX_SUB_SPHERES) * 0.02
+        offsets = _sphere_offsets(members)
+    else:
         # Fallback: single sphere
-        sphere = trimesh.creation.icosphere(subdivisions=2, radius=0.5)
-        sphere.visual.vertex_colors = np.tile(color, (len(sphere.vertices), 1))
-        meshes.append(sphere)
+        scale = 0.5
+        offsets = np.zeros((1, 3))
 
-    # Merge all sub-spheres into one mesh
-    combined = trimesh.util.concatenate(meshes)
+    # Every sub-sphere in one pass: (k, V, 3) vertices, (k, F, 3) faces
+    k = len(offsets)
+    vertices = (unit_vertices * scale)[None, :, :] + offsets[:, None, :]
+    faces = unit_faces[None, :, :] + (np.arange(k) * len(unit_vertices))[:, None, None]
+    data = _export(vertices.reshape(-1, 3), faces.reshape(-1, 3), color)
 
-    # Export as GLB
-    combined.export(str(out_path), file_type="glb")
-    size_kb = out_path.stat().st_size / 1024
-    log.info(f"Generated cluster blob: {out_path.name} ({size_kb:.0f} KB, {n} entities)")
-    return out_path
+    asset = _store(GLBAsset(name, data))
+    log.info(f"Generated cluster blob: {name} ({asset.size / 1024:.0f} KB, {n} entities)")
+    return asset
 
 
 def make_beacon(
     entity_id: str,
     risk_score: float,
-) -> Path:
+) -> GLBAsset:
     """Generate a beacon marker (cone + cylinder) as GLB.
 
     Used for highlighting individual high-risk entities.
     """
-    cache_key = hashlib.md5(
-        f"beacon:{entity_id}:{risk_score:.2f}".encode()
-    ).hexdigest()[:12]
-    out_path = ASSETS_DIR / f"beacon_{cache_key}.glb"
-
-    if out_path.exists():
-        log.info(f"Beacon cache hit: {out_path.name}")
-        return out_path
-
-    color = _severity_color(risk_score)
-
-    # Cylinder base
-    cylinder = trimesh.creation.cylinder(radius=0.08, height=0.6, sections=8)
-    cylinder.apply_translation([0, 0.3, 0])
-    cylinder.visual.vertex_colors = np.tile(color, (len(cylinder.vertices), 1))
-
-    # Cone top
-    cone = trimesh.creation.cone(radius=0.15, height=0.3, sections=8)
-    cone.apply_translation([0, 0.75, 0])
-    cone.visual.vertex_colors = np.tile(color, (len(cone.vertices), 1))
-
-    combined = trimesh.util.concatenate([cylinder, cone])
-    combined.export(str(out_path), file_type="glb")
+    name = beacon_name(entity_id, risk_score)
+    cached = glb_cache.get(name)
+    if cached is not None:
+        log.info(f"Beacon cache hit: {name}")
+        return cached
 
-    size_kb = out_path.stat().st_size / 1024
-    log.info(f"Generated beacon: {out_path.name} ({size_kb:.0f} KB)")
-    return out_path
+    asset = _store(GLBAsset(name, _beacon_glb(tuple(_severity_color(risk_score)))))
+    log.info(f"Generated beacon: {name} ({asset.size / 1024:.0f} KB)")
+    return asset
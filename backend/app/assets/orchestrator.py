@@ -1,35 +1,72 @@
 """Asset orchestration: generates GLB assets when clusters are detected.
 
 Flow: CLUSTER_DETECTED → generate GLB → save → emit ASSET_READY
+
+Meshes are built and exported on a bounded thread pool so the event loop
+keeps serving requests and broadcasts meanwhile. Requests for an asset
+that is already being generated wait on the same job instead of building
+it again.
 """
 
 from __future__ import annotations
 
+import asyncio
 import logging
-from pathlib import Path
-from typing import Optional
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Optional
 
-from .generator import make_beacon, make_cluster_blob
+from .generator import GLBAsset, beacon_name, cluster_blob_name, make_beacon, make_cluster_blob
 
 log = logging.getLogger(__name__)
 
+Broadcast = Callable[[str, dict], Awaitable[None]]
+
+ASSET_WORKERS = max(1, int(os.getenv("ANGELA_ASSET_WORKERS", str(min(4, os.cpu_count() or 1)))))
+
+_executor = ThreadPoolExecutor(max_workers=ASSET_WORKERS, thread_name_prefix="angela-asset")
+# Output file name -> job building it
+_inflight: dict[str, asyncio.Future] = {}
+# Background generation tasks started by schedule_assets
+_tasks: set[asyncio.Task] = set()
+
+
+async def _generate(name: str, build: Callable[..., GLBAsset], *args) -> GLBAsset:
+    """Run ``build(*args)`` on the asset pool, sharing a job already in flight for ``name``."""
+    loop = asyncio.get_running_loop()
+    job = _inflight.get(name)
+    if job is None or job.get_loop() is not loop:
+        job = loop.run_in_executor(_executor, build, *args)
+        _inflight[name] = job
+
+        def _forget(done: asyncio.Future) -> None:
+            if _inflight.get(name) is done:
+                del _inflight[name]
+
+        job.add_done_callback(_forget)
+    # One cancelled waiter must not cancel the job for the others
+    return await asyncio.shield(job)
+
 
 async def handle_cluster_asset(
     cluster: dict,
     bucket: int,
-    broadcast_fn,
+    broadcast_fn: Broadcast,
 ) -> Optional[dict]:
     """Generate a cluster blob GLB and broadcast ASSET_READY.
 
     Returns asset metadata or None on failure.
     """
     try:
-        glb_path = make_cluster_blob(
-            entity_ids=cluster["entity_ids"],
-            risk_score=cluster["risk_score"],
-            cluster_id=cluster["cluster_id"],
+        name = cluster_blob_name(cluster["entity_ids"], cluster["risk_score"], cluster["cluster_id"])
+        asset = await _generate(
+            name,
+            make_cluster_blob,
+            cluster["entity_ids"],
+            cluster["risk_score"],
+            cluster["cluster_id"],
         )
-        asset_info = _asset_metadata(glb_path, cluster["cluster_id"], "cluster_blob", bucket)
+        asset_info = _asset_metadata(asset, cluster["cluster_id"], "cluster_blob", bucket)
 
         await broadcast_fn("ASSET_READY", asset_info)
         log.info(f"Asset ready: {asset_info['asset_id']}")
@@ -52,12 +89,12 @@ async def handle_beacon_asset(
     entity_id: str,
     risk_score: float,
     bucket: int,
-    broadcast_fn,
+    broadcast_fn: Broadcast,
 ) -> Optional[dict]:
     """Generate a beacon GLB and broadcast ASSET_READY."""
     try:
-        glb_path = make_beacon(entity_id=entity_id, risk_score=risk_score)
-        asset_info = _asset_metadata(glb_path, f"beacon_{entity_id}", "beacon", bucket)
+        asset = await _generate(beacon_name(entity_id, risk_score), make_beacon, entity_id, risk_score)
+        asset_info = _asset_metadata(asset, f"beacon_{entity_id}", "beacon", bucket)
 
         await broadcast_fn("ASSET_READY", asset_info)
         log.info(f"Beacon ready: {asset_info['asset_id']}")
@@ -75,11 +112,47 @@ async def handle_beacon_asset(
         return None
 
 
-def _asset_metadata(glb_path: Path, asset_id: str, asset_type: str, bucket: int) -> dict:
+async def generate_assets(
+    clusters: list[dict],
+    beacons: list[tuple[str, float]],
+    bucket: int,
+    broadcast_fn: Broadcast,
+) -> int:
+    """Generate cluster blobs and ``(entity_id, risk_score)`` beacons in parallel.
+
+    Each ASSET_READY is broadcast as soon as its mesh is done. Returns the
+    number of assets generated.
+    """
+    results = await asyncio.gather(
+        *(handle_cluster_asset(cluster, bucket, broadcast_fn) for cluster in clusters),
+        *(handle_beacon_asset(eid, risk, bucket, broadcast_fn) for eid, risk in beacons),
+    )
+    return sum(1 for r in results if r is not None)
+
+
+def schedule_assets(
+    clusters: list[dict],
+    beacons: list[tuple[str, float]],
+    bucket: int,
+    broadcast_fn: Broadcast,
+) -> int:
+    """Start ``generate_assets`` in the background; must be called from the event loop.
+
+    Returns the number of assets queued.
+    """
+    n = len(clusters) + len(beacons)
+    if n:
+        task = asyncio.get_running_loop().create_task(generate_assets(clusters, beacons, bucket, broadcast_fn))
+        _tasks.add(task)
+        task.add_done_callback(_tasks.discard)
+    return n
+
+
+def _asset_metadata(asset: GLBAsset, asset_id: str, asset_type: str, bucket: int) -> dict:
     return {
         "asset_id": asset_id,
         "asset_type": asset_type,
         "bucket": bucket,
-        "url": f"/api/assets/{glb_path.name}",
-        "size_bytes": glb_path.stat().st_size,
+        "url": f"/api/assets/{asset.name}",
+        "size_bytes": asset.size,
     }
@@ -0,0 +1,399 @@
+"""Memory-mapped binary snapshot format.
+
+Layout::
+
+    8 bytes   magic  b"ANGELA\\x00\\x01"
+    8 bytes   little-endian uint64 header length
+    N bytes   UTF-8 JSON header (metadata, string tables, array directory)
+    padding   to a 64-byte boundary
+    arrays    raw little-endian arrays, each 64-byte aligned
+
+Every array is described in the header as ``{"dtype", "shape", "offset"}``
+with offsets relative to the start of the array section, so a reader can
+``np.memmap`` the file once and slice zero-copy views out of it. Forked
+workers mapping the same file share its pages.
+
+Sections:
+
+- ``tx_*``: columnar transactions (see ``columnar.TransactionTable``) and
+  tx IDs as a packed string column.
+- ``bucket_rows`` / ``bucket_offsets``: row indices grouped by bucket;
+  bucket ``b`` owns ``bucket_rows[bucket_offsets[b]:bucket_offsets[b + 1]]``.
+- ``entity_*``: entity ID table and attributes, in entity-code order.
+- ``activity_*``: per-bucket entity activity aggregates, grouped the same way.
+- ``risk_*``: per-bucket risk scores plus a JSON blob per bucket holding the
+  reasons/evidence of entities that have any.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+from collections.abc import MutableMapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+
+from .columnar import IdTable, StringColumn, TransactionTable
+from .risk.scoring import compute_risk_for_bucket
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"ANGELA\x00\x01"
+FORMAT_VERSION = 1
+SNAPSHOT_SUFFIX = ".angela"
+_ALIGN = 64
+
+
+def is_binary_snapshot(path: Path) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _pad(n: int) -> int:
+    return (-n) % _ALIGN
+
+
+class BucketTableMap(MutableMapping):
+    """Dict-like per-bucket table that decodes buckets on first access.
+
+    Keys are produced by ``key_fn(b)`` for ``b in range(n_buckets)`` so the
+    map can stand in for both ``risk_by_bucket`` (int keys) and
+    ``entity_activity`` (str keys). Assignments override the mapped data.
+    """
+
+    def __init__(self, n_buckets: int, loader: Callable[[int], dict], key_fn: Callable[[int], Any] = int) -> None:
+        self._loader = loader
+        self._bucket_of = {key_fn(b): b for b in range(n_buckets)}
+        self._cache: dict[Any, dict] = {}
+
+    def __getitem__(self, key: Any) -> dict:
+        if key in self._cache:
+            return self._cache[key]
+        b = self._bucket_of.get(key)
+        if b is None:
+            raise KeyError(key)
+        value = self._loader(b)
+        self._cache[key] = value
+        return value
+
+    def __setitem__(self, key: Any, value: dict) -> None:
+        self._cache[key] = value
+
+    def __delitem__(self, key: Any) -> None:
+        # Deleting a mapped bucket would resurrect it on next access
+        self._cache[key] = {}
+
+    def __iter__(self) -> Iterator[Any]:
+        yield from self._bucket_of
+        for key in self._cache:
+            if key not in self._bucket_of:
+                yield key
+
+    def __len__(self) -> int:
+        return len(self._bucket_of) + sum(1 for k in self._cache if k not in self._bucket_of)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._bucket_of or key in self._cache
+
+
+@dataclass
+class BinarySnapshot:
+    """A mapped snapshot: header plus zero-copy array views."""
+
+    path: Path
+    header: dict
+    arrays: dict[str, np.ndarray]
+
+    @property
+    def metadata(self) -> dict:
+        return self.header["metadata"]
+
+    @property
+    def n_buckets(self) -> int:
+        return int(self.metadata.get("n_buckets", 0))
+
+    def strings(self, name: str) -> StringColumn:
+        return StringColumn(self.arrays[f"{name}_blob"], self.arrays[f"{name}_offsets"])
+
+    def grouped(self, name: str, b: int) -> slice:
+        offsets = self.arrays[f"{name}_offsets"]
+        return slice(int(offsets[b]), int(offsets[b + 1]))
+
+    # -- Decoded views used by DataStore --
+
+    def entity_ids(self) -> IdTable:
+        return IdTable.from_list(self.strings("entity_id").tolist())
+
+    def entities(self, ids: IdTable) -> list[dict]:
+        a = self.arrays
+        banks = self.strings("entity_bank").tolist()
+        kyc_levels = self.header["kyc_levels"]
+        entity_types = self.header["entity_types"]
+        return [
+            {
+                "id": ids[i],
+                "type": entity_types[t],
+                "bank": banks[i],
+                "jurisdiction_bucket": j,
+                "kyc_level": kyc_levels[k],
+            }
+            for i, (t, j, k, has_record) in enumerate(zip(
+                a["entity_type"].tolist(),
+                a["entity_jurisdiction"].tolist(),
+                a["entity_kyc"].tolist(),
+                a["entity_has_record"].tolist(),
+            ))
+            if has_record
+        ]
+
+    def transactions(self, ids: IdTable) -> TransactionTable:
+        a = self.arrays
+        columns = {name: a[f"tx_{name}"] for name in _TX_COLUMNS}
+        return TransactionTable.from_columns(
+            ids=ids,
+            columns=columns,
+            tx_ids=self.strings("tx_id"),
+            currencies=self.header["currencies"],
+            payment_formats=self.header["payment_formats"],
+        )
+
+    def bucket_index(self) -> dict[str, np.ndarray]:
+        rows = self.arrays["bucket_rows"]
+        return {str(b): rows[self.grouped("bucket", b)] for b in range(self.n_buckets)}
+
+    def activity_loader(self, ids: IdTable) -> Callable[[int], dict]:
+        a = self.arrays
+
+        def load(b: int) -> dict:
+            sl = self.grouped("activity", b)
+            return {
+                ids[code]: {
+                    "in_count": in_count,
+                    "out_count": out_count,
+                    "in_sum": in_sum,
+                    "out_sum": out_sum,
+                }
+                for code, in_count, out_count, in_sum, out_sum in zip(
+                    a["activity_code"][sl].tolist(),
+                    a["activity_in_count"][sl].tolist(),
+                    a["activity_out_count"][sl].tolist(),
+                    a["activity_in_sum"][sl].tolist(),
+                    a["activity_out_sum"][sl].tolist(),
+                )
+            }
+
+        return load
+
+    @property
+    def has_risk(self) -> bool:
+        return "risk_code" in self.arrays
+
+    def risk_loader(self, ids: IdTable) -> Callable[[int], dict]:
+        a = self.arrays
+        details = self.strings("risk_detail")
+
+        def load(b: int) -> dict:
+            sl = self.grouped("risk", b)
+            detail = json.loads(details[b] or "{}")
+            result: dict[str, dict] = {}
+            for code, score in zip(a["risk_code"][sl].tolist(), a["risk_score"][sl].tolist()):
+                eid = ids[code]
+                reasons, evidence = detail.get(eid) or ([], {})
+                result[eid] = {"risk_score": score, "reasons": reasons, "evidence": evidence}
+            return result
+
+        return load
+
+
+_TX_COLUMNS = (
+    "from", "to", "amount", "timestamp", "bucket",
+    "currency", "payment_format", "is_laundering",
+)
+
+_ENTITY_TYPES_DEFAULT = ["account"]
+
+
+def read_binary_snapshot(path: Path) -> BinarySnapshot:
+    """Map a binary snapshot without copying its arrays."""
+    with open(path, "rb") as f:
+        magic = f.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an ANGELA binary snapshot")
+        header_len = int.from_bytes(f.read(8), "little")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {header.get('version')} in {path}")
+
+    data_start = len(MAGIC) + 8 + header_len
+    data_start += _pad(data_start)
+    mapped = np.memmap(path, dtype=np.uint8, mode="r")
+
+    arrays: dict[str, np.ndarray] = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = data_start + spec["offset"]
+        arrays[name] = mapped[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+
+    return BinarySnapshot(path=Path(path), header=header, arrays=arrays)
+
+
+def _group_by_bucket(bucket_rows: dict[int, np.ndarray], n_buckets: int) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(n_buckets + 1, dtype=np.int64)
+    for b in range(n_buckets):
+        offsets[b + 1] = offsets[b] + len(bucket_rows.get(b, ()))
+    flat = (
+        np.concatenate([np.asarray(bucket_rows.get(b, ()), dtype=np.int64) for b in range(n_buckets)])
+        if n_buckets else np.empty(0, dtype=np.int64)
+    )
+    return flat, offsets
+
+
+def write_binary_snapshot(
+    path: Path,
+    snapshot: dict,
+    risk_by_bucket: Optional[dict[int, dict[str, dict]]] = None,
+    compute_risk: bool = True,
+) -> Path:
+    """Write a snapshot dict (the ``DataStore.load_from_dict`` format) as binary.
+
+    If ``risk_by_bucket`` is not given and ``compute_risk`` is set, risk is
+    computed here so loading the file needs no scoring pass.
+    """
+    metadata = snapshot["metadata"]
+    entities = snapshot["entities"]
+    n_buckets = int(metadata.get("n_buckets", 0))
+    bucket_size = metadata.get("bucket_size_seconds", 86400)
+
+    ids = IdTable(e["id"] for e in entities)
+    table = TransactionTable.from_records(snapshot["transactions"], ids=ids)
+    bucket_index = {
+        int(b): np.asarray(rows, dtype=np.int64)
+        for b, rows in snapshot.get("bucket_index", {}).items()
+    }
+
+    if risk_by_bucket is None and compute_risk:
+        risk_by_bucket = {
+            b: compute_risk_for_bucket(table.rows(bucket_index.get(b, ())), bucket_size)
+            for b in range(n_buckets)
+        }
+
+    arrays: dict[str, np.ndarray] = {}
+    for name, column in table.column_arrays().items():
+        arrays[f"tx_{name}"] = column
+    tx_ids = StringColumn.pack(table.tx_id(i) for i in range(len(table)))
+    arrays["tx_id_blob"], arrays["tx_id_offsets"] = tx_ids.blob, tx_ids.offsets
+
+    arrays["bucket_rows"], arrays["bucket_offsets"] = _group_by_bucket(bucket_index, n_buckets)
+
+    # Entity activity grouped by bucket
+    activity = snapshot.get("entity_activity", {})
+    act_codes: list[int] = []
+    act_fields: dict[str, list] = {"in_count": [], "out_count": [], "in_sum": [], "out_sum": []}
+    act_offsets = np.zeros(n_buckets + 1, dtype=np.int64)
+    for b in range(n_buckets):
+        bucket_activity = activity.get(str(b), {})
+        for eid, agg in bucket_activity.items():
+            act_codes.append(ids.intern(eid))
+            for field, values in act_fields.items():
+                values.append(agg.get(field, 0))
+        act_offsets[b + 1] = len(act_codes)
+    arrays["activity_code"] = np.array(act_codes, dtype=np.int32)
+    arrays["activity_in_count"] = np.array(act_fields["in_count"], dtype=np.int64)
+    arrays["activity_out_count"] = np.array(act_fields["out_count"], dtype=np.int64)
+    arrays["activity_in_sum"] = np.array(act_fields["in_sum"], dtype=np.float64)
+    arrays["activity_out_sum"] = np.array(act_fields["out_sum"], dtype=np.float64)
+    arrays["activity_offsets"] = act_offsets
+
+    # Risk tables grouped by bucket
+    if risk_by_bucket is not None:
+        risk_codes: list[int] = []
+        risk_scores: list[float] = []
+        risk_offsets = np.zeros(n_buckets + 1, dtype=np.int64)
+        details: list[str] = []
+        for b in range(n_buckets):
+            bucket_risks = risk_by_bucket.get(b, {})
+            detail = {}
+            for eid, r in bucket_risks.items():
+                risk_codes.append(ids.intern(eid))
+                risk_scores.append(r["risk_score"])
+                if r.get("reasons") or r.get("evidence"):
+                    detail[eid] = [r.get("reasons", []), r.get("evidence", {})]
+            risk_offsets[b + 1] = len(risk_codes)
+            details.append(json.dumps(detail, separators=(",", ":")) if detail else "")
+        arrays["risk_code"] = np.array(risk_codes, dtype=np.int32)
+        arrays["risk_score"] = np.array(risk_scores, dtype=np.float64)
+        arrays["risk_offsets"] = risk_offsets
+        packed_details = StringColumn.pack(details)
+        arrays["risk_detail_blob"], arrays["risk_detail_offsets"] = packed_details.blob, packed_details.offsets
+
+    # Entity table in code order, after every section has interned its IDs
+    # (IDs seen only in transactions get defaults)
+    entity_ids = list(ids)
+    kyc_levels = sorted({e.get("kyc_level", "standard") for e in entities} | {"standard"})
+    entity_types = sorted({e.get("type", "account") for e in entities} | set(_ENTITY_TYPES_DEFAULT))
+    by_id = {e["id"]: e for e in entities}
+    packed_ids = StringColumn.pack(entity_ids)
+    packed_banks = StringColumn.pack(by_id.get(eid, {}).get("bank", "unknown") for eid in entity_ids)
+    arrays["entity_id_blob"], arrays["entity_id_offsets"] = packed_ids.blob, packed_ids.offsets
+    arrays["entity_bank_blob"], arrays["entity_bank_offsets"] = packed_banks.blob, packed_banks.offsets
+    arrays["entity_jurisdiction"] = np.array(
+        [by_id.get(eid, {}).get("jurisdiction_bucket", -1) for eid in entity_ids], dtype=np.int16
+    )
+    arrays["entity_kyc"] = np.array(
+        [kyc_levels.index(by_id.get(eid, {}).get("kyc_level", "standard")) for eid in entity_ids], dtype=np.int8
+    )
+    arrays["entity_type"] = np.array(
+        [entity_types.index(by_id.get(eid, {}).get("type", "account")) for eid in entity_ids], dtype=np.int8
+    )
+    arrays["entity_has_record"] = np.array([eid in by_id for eid in entity_ids], dtype=np.bool_)
+    missing = len(entity_ids) - len(by_id)
+    if missing > 0:
+        log.warning(f"Snapshot references {missing} IDs without entity records")
+
+    header_arrays: dict[str, dict] = {}
+    offset = 0
+    ordered = []
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        if arr.dtype.byteorder == ">":
+            arr = arr.astype(arr.dtype.newbyteorder("<"))
+        header_arrays[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        ordered.append(arr)
+        offset += arr.nbytes + _pad(arr.nbytes)
+
+    header = {
+        "version": FORMAT_VERSION,
+        "metadata": metadata,
+        "currencies": list(table.currencies),
+        "payment_formats": list(table.payment_formats),
+        "kyc_levels": kyc_levels,
+        "entity_types": entity_types,
+        "arrays": header_arrays,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(8, "little"))
+        f.write(header_bytes)
+        f.write(b"\x00" * _pad(len(MAGIC) + 8 + len(header_bytes)))
+        for arr in ordered:
+            f.write(memoryview(arr).cast("B"))
+            f.write(b"\x00" * _pad(arr.nbytes))
+    os.replace(tmp_path, path)
+
+    size_mb = path.stat().st_size / (1024 * 1024)
+    log.info(f"Wrote binary snapshot {path} ({size_mb:.1f} MB)")
+    return path
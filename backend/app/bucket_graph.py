@@ -0,0 +1,176 @@
+"""Per-bucket compressed transaction graph.
+
+``BucketGraph`` is built once per bucket from its columns and cached on the
+dataset. It holds:
+
+- the bucket's entity codes (sorted) and their total in + out volume,
+- one entry per directed (from, to) pair, numbered in order of first
+  occurrence, with the first row's amount plus the pair's count, total,
+  min/max amount and first/last timestamp,
+- an undirected CSR adjacency (``indptr`` / ``neighbors``, sorted per node)
+  and a CSR of each node's outgoing pair IDs.
+
+Neighborhood queries walk these arrays instead of the bucket's rows.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from .columnar import BucketColumns
+
+
+def _sorted_unique(values: np.ndarray) -> np.ndarray:
+    values = np.sort(values)
+    if len(values):
+        values = values[np.concatenate(([True], values[1:] != values[:-1]))]
+    return values
+
+
+def _csr_offsets(keys: np.ndarray, n: int) -> np.ndarray:
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=n), out=indptr[1:])
+    return indptr
+
+
+class BucketGraph:
+    """Compressed adjacency and pair aggregates for one bucket.
+
+    Nodes are bucket-local indices into ``codes``. Self-transfers count
+    towards volume but are not edges.
+    """
+
+    def __init__(self) -> None:
+        self.codes = np.empty(0, dtype=np.int64)
+        self.volume = np.empty(0, dtype=np.float64)
+        self.pair_from = np.empty(0, dtype=np.int64)
+        self.pair_to = np.empty(0, dtype=np.int64)
+        self.pair_first_amount = np.empty(0, dtype=np.float64)
+        self.pair_total = np.empty(0, dtype=np.float64)
+        self.pair_count = np.empty(0, dtype=np.int64)
+        self.pair_min = np.empty(0, dtype=np.float64)
+        self.pair_max = np.empty(0, dtype=np.float64)
+        self.pair_first_ts = np.empty(0, dtype=np.int64)
+        self.pair_last_ts = np.empty(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.neighbors = np.empty(0, dtype=np.int64)
+        self.out_indptr = np.zeros(1, dtype=np.int64)
+        self.out_pairs = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @property
+    def n_pairs(self) -> int:
+        return len(self.pair_from)
+
+    @classmethod
+    def from_columns(cls, cols: BucketColumns) -> "BucketGraph":
+        graph = cls()
+        if not len(cols):
+            return graph
+
+        # Entity codes are dense, so a lookup table beats sorting them
+        present = np.zeros(int(max(cols.from_code.max(), cols.to_code.max())) + 1, dtype=bool)
+        present[cols.from_code] = True
+        present[cols.to_code] = True
+        graph.codes = np.flatnonzero(present)
+        n = len(graph.codes)
+        to_local = np.empty(len(present), dtype=np.int64)
+        to_local[graph.codes] = np.arange(n)
+        src = to_local[cols.from_code]
+        dst = to_local[cols.to_code]
+        graph.volume = (
+            np.bincount(src, weights=cols.amount, minlength=n)
+            + np.bincount(dst, weights=cols.amount, minlength=n)
+        )
+
+        edge = src != dst
+        src, dst, amount, timestamp = src[edge], dst[edge], cols.amount[edge], cols.timestamp[edge]
+        if not len(src):
+            graph.indptr = np.zeros(n + 1, dtype=np.int64)
+            graph.out_indptr = np.zeros(n + 1, dtype=np.int64)
+            return graph
+
+        # Directed pairs, numbered by first occurrence in row order
+        _, first, inverse, counts = np.unique(
+            src * n + dst, return_index=True, return_inverse=True, return_counts=True,
+        )
+        order = np.argsort(first, kind="stable")
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        first = first[order]
+        graph.pair_from = src[first]
+        graph.pair_to = dst[first]
+        graph.pair_first_amount = amount[first]
+        graph.pair_count = counts[order].astype(np.int64)
+        graph.pair_total = np.bincount(rank[inverse], weights=amount, minlength=len(order))
+
+        # Rows grouped by pair for the min/max reductions
+        by_pair = np.argsort(rank[inverse], kind="stable")
+        starts = np.zeros(len(order), dtype=np.int64)
+        np.cumsum(graph.pair_count[:-1], out=starts[1:])
+        grouped_amount = amount[by_pair]
+        grouped_ts = timestamp[by_pair]
+        graph.pair_min = np.minimum.reduceat(grouped_amount, starts)
+        graph.pair_max = np.maximum.reduceat(grouped_amount, starts)
+        graph.pair_first_ts = np.minimum.reduceat(grouped_ts, starts)
+        graph.pair_last_ts = np.maximum.reduceat(grouped_ts, starts)
+
+        # Outgoing pair IDs per node, ascending (= first-occurrence order)
+        graph.out_pairs = np.argsort(graph.pair_from, kind="stable")
+        graph.out_indptr = _csr_offsets(graph.pair_from, n)
+
+        # Undirected adjacency, neighbors sorted per node
+        links = _sorted_unique(np.concatenate([
+            graph.pair_from * n + graph.pair_to,
+            graph.pair_to * n + graph.pair_from,
+        ]))
+        graph.neighbors = links % n
+        graph.indptr = _csr_offsets(links // n, n)
+        return graph
+
+    def local(self, code: int) -> int:
+        """Bucket-local index of an entity code, or -1 if it is not active."""
+        i = int(np.searchsorted(self.codes, code))
+        return i if i < len(self.codes) and self.codes[i] == code else -1
+
+    def k_hop(self, center: int, k: int, max_nodes: int) -> list[int]:
+        """Local nodes within ``k`` undirected hops of ``center``, BFS order.
+
+        Stops adding nodes once ``max_nodes`` are collected (center included).
+        """
+        visited = [center]
+        seen = {center}
+        frontier = [center]
+        for _ in range(k):
+            next_frontier: list[int] = []
+            for node in frontier:
+                room = max_nodes - len(visited)
+                if room <= 0:
+                    return visited
+                start, end = int(self.indptr[node]), int(self.indptr[node + 1])
+                # At most len(seen) of these are already seen, so this many
+                # leading entries always contain ``room`` new ones if they exist
+                end = min(end, start + room + len(seen))
+                for neighbor in self.neighbors[start:end].tolist():
+                    if neighbor not in seen:
+                        seen.add(neighbor)
+                        visited.append(neighbor)
+                        next_frontier.append(neighbor)
+                        if len(visited) >= max_nodes:
+                            return visited
+            frontier = next_frontier
+        return visited
+
+    def pairs_within(self, nodes: list[int], limit: int) -> np.ndarray:
+        """IDs of pairs with both ends in ``nodes``, first ``limit`` by occurrence."""
+        if not nodes or not self.n_pairs:
+            return np.empty(0, dtype=np.int64)
+        members = np.zeros(len(self.codes), dtype=bool)
+        members[nodes] = True
+        candidates = np.concatenate([
+            self.out_pairs[self.out_indptr[node]:self.out_indptr[node + 1]] for node in nodes
+        ])
+        inside = np.sort(candidates[members[self.pair_to[candidates]]])
+        return inside[:limit]
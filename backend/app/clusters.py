@@ -1,6 +1,22 @@
-"""Cluster detection: find connected components of high-risk entities."""
+"""Cluster detection: find connected components of high-risk entities.
 
+``detect_clusters`` computes them from scratch. ``ClusterIndex`` keeps the
+same result for one (bucket, threshold) and updates it as transactions are
+appended and risk scores change; the dataset caches one per pair (see
+``Dataset.get_clusters``).
+"""
+
+from __future__ import annotations
+
+import math
 from collections import deque
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from .columnar import BucketColumns
+    from .data_loader import Dataset
 
 
 def detect_clusters(
@@ -48,7 +64,8 @@ def detect_clusters(
                     queue.append(neighbor)
 
         if len(component) >= 2:  # only report clusters of 2+
-            avg_risk = sum(risk_data[eid]["risk_score"] for eid in component) / len(component)
+            # fsum: the average must not depend on BFS (set iteration) order
+            avg_risk = math.fsum(risk_data[eid]["risk_score"] for eid in component) / len(component)
             clusters.append({
                 "cluster_id": f"cluster_{cluster_idx}",
                 "entity_ids": sorted(component),
@@ -58,3 +75,155 @@ def detect_clusters(
             cluster_idx += 1
 
     return clusters
+
+
+class ClusterIndex:
+    """Connected components of one bucket's entities scored at or above ``threshold``.
+
+    Nodes are entity codes; edges are non-self transfers between two such
+    nodes. Components live in a union-find forest with a member set per
+    root. New edges and entities rising above the threshold are unioned in.
+    An entity dropping below it splits only its own component, which is
+    re-walked over the high-risk adjacency. Cluster payloads are rebuilt
+    only for components that changed.
+    """
+
+    def __init__(self, threshold: float) -> None:
+        self.threshold = threshold
+        self._parent: dict[int, int] = {}
+        self._members: dict[int, set[int]] = {}
+        # Adjacency among high-risk nodes only
+        self._adj: dict[int, set[int]] = {}
+        self._risk: dict[int, float] = {}
+        # root -> cluster payload without its ID, for components of 2+
+        self._payloads: dict[int, dict] = {}
+        self._dirty: set[int] = set()
+        self._clusters: Optional[list[dict]] = None
+
+    @classmethod
+    def build(cls, dataset: "Dataset", bucket: int, threshold: float) -> "ClusterIndex":
+        index = cls(threshold)
+        risk_data = dataset.risk_by_bucket.get(bucket, {})
+        codes = dataset.ids.codes(risk_data.keys()).tolist()
+        for code, entry in zip(codes, risk_data.values()):
+            if entry["risk_score"] >= threshold:
+                index._add_node(code, entry["risk_score"])
+        if index._risk:
+            graph = dataset.get_bucket_graph(bucket)
+            index._add_edges(len(dataset.ids), graph.codes[graph.pair_from], graph.codes[graph.pair_to])
+        return index
+
+    def apply(self, dataset: "Dataset", bucket: int, appended: "BucketColumns", changed: dict[str, dict]) -> None:
+        """Fold appended rows and changed risk entries (entity ID -> entry) in."""
+        rising: list[int] = []
+        dropped: dict[int, list[int]] = {}
+        for eid, entry in changed.items():
+            code = dataset.ids.code(eid)
+            score = entry["risk_score"]
+            if score >= self.threshold:
+                if code in self._risk:
+                    self._risk[code] = score
+                    self._dirty.add(self._find(code))
+                else:
+                    self._add_node(code, score)
+                    rising.append(code)
+            elif code in self._risk:
+                dropped.setdefault(self._find(code), []).append(code)
+
+        for root, codes in dropped.items():
+            self._split(root, codes)
+
+        n_codes = len(dataset.ids)
+        if rising:
+            # Edges of newly risky entities anywhere in the bucket
+            cols = dataset.get_bucket_columns(bucket)
+            is_rising = np.zeros(n_codes, dtype=bool)
+            is_rising[rising] = True
+            touches = is_rising[cols.from_code] | is_rising[cols.to_code]
+            self._add_edges(n_codes, cols.from_code[touches], cols.to_code[touches])
+        self._add_edges(n_codes, appended.from_code, appended.to_code)
+
+    def clusters(self, dataset: "Dataset") -> list[dict]:
+        """Clusters in ``detect_clusters`` format and order (dicts are shared)."""
+        if self._clusters is None or self._dirty:
+            for root in self._dirty:
+                members = self._members.get(root)
+                if members is None or len(members) < 2:
+                    self._payloads.pop(root, None)
+                    continue
+                entity_ids = sorted(dataset.ids.lookup(members))
+                codes = dataset.ids.codes(entity_ids).tolist()
+                self._payloads[root] = {
+                    "entity_ids": entity_ids,
+                    "risk_score": round(math.fsum(self._risk[c] for c in codes) / len(codes), 4),
+                    "size": len(entity_ids),
+                }
+            self._dirty.clear()
+            ordered = sorted(self._payloads.values(), key=lambda p: p["entity_ids"][0])
+            self._clusters = [{"cluster_id": f"cluster_{i}", **payload} for i, payload in enumerate(ordered)]
+        return list(self._clusters)
+
+    def _add_node(self, code: int, score: float) -> None:
+        self._risk[code] = score
+        self._parent[code] = code
+        self._members[code] = {code}
+        self._adj[code] = set()
+
+    def _add_edges(self, n_codes: int, from_code: np.ndarray, to_code: np.ndarray) -> None:
+        high = np.zeros(n_codes, dtype=bool)
+        high[list(self._risk)] = True
+        keep = (from_code != to_code) & high[from_code] & high[to_code]
+        for f, t in zip(from_code[keep].tolist(), to_code[keep].tolist()):
+            self._adj[f].add(t)
+            self._adj[t].add(f)
+            self._union(f, t)
+
+    def _find(self, code: int) -> int:
+        parent = self._parent
+        root = code
+        while parent[root] != root:
+            root = parent[root]
+        while parent[code] != root:
+            parent[code], code = root, parent[code]
+        return root
+
+    def _union(self, a: int, b: int) -> None:
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            return
+        if len(self._members[ra]) < len(self._members[rb]):
+            ra, rb = rb, ra
+        self._parent[rb] = ra
+        self._members[ra] |= self._members.pop(rb)
+        self._payloads.pop(rb, None)
+        self._dirty.discard(rb)
+        self._dirty.add(ra)
+
+    def _split(self, root: int, removed: list[int]) -> None:
+        """Drop ``removed`` from the component at ``root`` and re-walk the rest."""
+        members = self._members.pop(root)
+        self._payloads.pop(root, None)
+        self._dirty.discard(root)
+        # Every member may be gone, leaving nothing dirty to trigger a rebuild
+        self._clusters = None
+        for code in removed:
+            members.discard(code)
+            for neighbor in self._adj.pop(code):
+                self._adj[neighbor].discard(code)
+            del self._risk[code]
+            del self._parent[code]
+
+        while members:
+            start = members.pop()
+            component = {start}
+            queue = deque([start])
+            while queue:
+                for neighbor in self._adj[queue.popleft()]:
+                    if neighbor not in component:
+                        component.add(neighbor)
+                        queue.append(neighbor)
+            members -= component
+            for code in component:
+                self._parent[code] = start
+            self._members[start] = component
+            self._dirty.add(start)
@@ -0,0 +1,355 @@
+"""Columnar transaction storage backing DataStore.
+
+Transactions are held as parallel NumPy arrays instead of one dict per row:
+entity IDs are interned to int32 codes, amounts are float64, timestamps int64
+and bucket indices int32. Low-cardinality string fields (currency, payment
+format) are interned the same way. Dict views are built on demand for legacy
+callers that still expect ``{"from_id": ..., "to_id": ..., ...}`` rows.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Iterable, Iterator, Optional, Sequence
+
+import numpy as np
+
+_INITIAL_CAPACITY = 1024
+
+# Numeric column attributes of TransactionTable; names without the leading
+# underscore are the keys used by ``from_columns`` and binary snapshots.
+_COLUMN_ATTRS = (
+    "_from", "_to", "_amount", "_timestamp", "_bucket",
+    "_currency", "_payment_format", "_is_laundering",
+)
+
+
+class StringColumn(Sequence[str]):
+    """Read-only UTF-8 strings packed into one byte blob plus int64 offsets.
+
+    Used for string tables mapped straight from a binary snapshot: items
+    are decoded on access instead of materializing millions of ``str``.
+    """
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray) -> None:
+        self._blob = blob
+        self._offsets = offsets
+
+    @classmethod
+    def pack(cls, values: Iterable[str]) -> "StringColumn":
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    @property
+    def blob(self) -> np.ndarray:
+        return self._blob
+
+    @property
+    def offsets(self) -> np.ndarray:
+        return self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):  # type: ignore[override]
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return self._blob[start:end].tobytes().decode("utf-8")
+
+    def tolist(self) -> list[str]:
+        text = self._blob.tobytes()
+        bounds = self._offsets.tolist()
+        return [text[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+
+
+class IdTable:
+    """Interned string table mapping IDs to dense int32 codes."""
+
+    def __init__(self, ids: Iterable[str] = ()) -> None:
+        self._ids: list[str] = []
+        self._codes: dict[str, int] = {}
+        for value in ids:
+            self.intern(value)
+
+    @classmethod
+    def from_list(cls, ids: list[str]) -> "IdTable":
+        """Build from already-unique IDs without re-interning one by one."""
+        table = cls()
+        table._ids = ids
+        table._codes = dict(zip(ids, range(len(ids))))
+        return table
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __getitem__(self, code: int) -> str:
+        return self._ids[code]
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._codes
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def intern(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = len(self._ids)
+            self._ids.append(value)
+            self._codes[value] = code
+        return code
+
+    def code(self, value: str) -> int:
+        """Return the code for ``value``, or -1 if it has never been interned."""
+        return self._codes.get(value, -1)
+
+    def codes(self, values: Iterable[str]) -> np.ndarray:
+        return np.fromiter((self._codes.get(v, -1) for v in values), dtype=np.int32)
+
+    def lookup(self, codes: Iterable[int]) -> list[str]:
+        ids = self._ids
+        return [ids[int(c)] for c in codes]
+
+
+@dataclass(frozen=True)
+class BucketColumns:
+    """Column slices for the transactions of a single bucket.
+
+    ``rows`` holds the global row indices (in bucket order); the other arrays
+    are aligned with it.
+    """
+
+    rows: np.ndarray
+    from_code: np.ndarray
+    to_code: np.ndarray
+    amount: np.ndarray
+    timestamp: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def entity_volume(self, n_codes: int) -> np.ndarray:
+        """Total in + out amount per entity code (length ``n_codes``)."""
+        if not len(self.rows):
+            return np.zeros(n_codes, dtype=np.float64)
+        return (
+            np.bincount(self.from_code, weights=self.amount, minlength=n_codes)
+            + np.bincount(self.to_code, weights=self.amount, minlength=n_codes)
+        )
+
+    def non_self(self) -> np.ndarray:
+        """Boolean mask of rows that are not self-transfers."""
+        return self.from_code != self.to_code
+
+    def first_pairs(self, mask: np.ndarray, limit: int) -> list[tuple[int, int, float]]:
+        """First occurrence of each (from, to) pair among masked rows.
+
+        Returns up to ``limit`` ``(from_code, to_code, amount)`` tuples in row order.
+        """
+        pairs: list[tuple[int, int, float]] = []
+        seen: set[tuple[int, int]] = set()
+        for f, t, amount in zip(
+            self.from_code[mask].tolist(),
+            self.to_code[mask].tolist(),
+            self.amount[mask].tolist(),
+        ):
+            if (f, t) in seen:
+                continue
+            seen.add((f, t))
+            pairs.append((f, t, amount))
+            if len(pairs) >= limit:
+                break
+        return pairs
+
+
+class TransactionTable:
+    """Append-friendly columnar table of transactions.
+
+    Behaves like a read-only sequence of dicts (``len``, indexing, iteration)
+    so existing callers keep working, while hot paths read the typed columns
+    directly.
+    """
+
+    def __init__(self, ids: Optional[IdTable] = None, capacity: int = _INITIAL_CAPACITY) -> None:
+        self.ids = ids if ids is not None else IdTable()
+        self.currencies = IdTable()
+        self.payment_formats = IdTable()
+        self._n = 0
+        capacity = max(1, capacity)
+        self._from = np.empty(capacity, dtype=np.int32)
+        self._to = np.empty(capacity, dtype=np.int32)
+        self._amount = np.empty(capacity, dtype=np.float64)
+        self._timestamp = np.empty(capacity, dtype=np.int64)
+        self._bucket = np.empty(capacity, dtype=np.int32)
+        self._currency = np.empty(capacity, dtype=np.int16)
+        self._payment_format = np.empty(capacity, dtype=np.int16)
+        self._is_laundering = np.empty(capacity, dtype=np.int8)
+        # tx_ids: an immutable base (possibly a mapped StringColumn) plus appended rows
+        self._tx_id_base: Sequence[str] = ()
+        self._tx_id_tail: list[str] = []
+
+    @classmethod
+    def from_columns(
+        cls,
+        ids: IdTable,
+        columns: dict[str, np.ndarray],
+        tx_ids: Sequence[str],
+        currencies: list[str],
+        payment_formats: list[str],
+    ) -> "TransactionTable":
+        """Wrap existing (possibly memory-mapped, read-only) column arrays.
+
+        The arrays are used as-is; the first append copies them into
+        growable private buffers.
+        """
+        table = cls(ids=ids, capacity=1)
+        for name in _COLUMN_ATTRS:
+            setattr(table, name, columns[name.lstrip("_")])
+        table._n = len(table._from)
+        table._tx_id_base = tx_ids
+        table.currencies = IdTable.from_list(list(currencies))
+        table.payment_formats = IdTable.from_list(list(payment_formats))
+        return table
+
+    @classmethod
+    def from_records(cls, records: Sequence[dict], ids: Optional[IdTable] = None) -> "TransactionTable":
+        table = cls(ids=ids, capacity=len(records))
+        table.extend(records)
+        return table
+
+    # -- Sequence protocol (dict views) --
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __bool__(self) -> bool:
+        return self._n > 0
+
+    def __getitem__(self, index: int) -> dict:
+        if index < 0:
+            index += self._n
+        if index < 0 or index >= self._n:
+            raise IndexError("transaction index out of range")
+        return self.row(index)
+
+    def __iter__(self) -> Iterator[dict]:
+        for i in range(self._n):
+            yield self.row(i)
+
+    # -- Columns --
+
+    @property
+    def from_code(self) -> np.ndarray:
+        return self._from[: self._n]
+
+    @property
+    def to_code(self) -> np.ndarray:
+        return self._to[: self._n]
+
+    @property
+    def amount(self) -> np.ndarray:
+        return self._amount[: self._n]
+
+    @property
+    def timestamp(self) -> np.ndarray:
+        return self._timestamp[: self._n]
+
+    @property
+    def bucket(self) -> np.ndarray:
+        return self._bucket[: self._n]
+
+    @property
+    def is_laundering(self) -> np.ndarray:
+        return self._is_laundering[: self._n]
+
+    def column_arrays(self) -> dict[str, np.ndarray]:
+        """Numeric columns keyed by name (see ``from_columns``)."""
+        return {name.lstrip("_"): getattr(self, name)[: self._n] for name in _COLUMN_ATTRS}
+
+    def tx_id(self, i: int) -> str:
+        base = self._tx_id_base
+        if i < len(base):
+            return base[i]
+        return self._tx_id_tail[i - len(base)]
+
+    def tx_ids(self, rows: Iterable[int]) -> list[str]:
+        return [self.tx_id(int(i)) for i in rows]
+
+    def columns(self, rows: np.ndarray) -> BucketColumns:
+        """Gather column values for ``rows``."""
+        return BucketColumns(
+            rows=rows,
+            from_code=self._from[rows],
+            to_code=self._to[rows],
+            amount=self._amount[rows],
+            timestamp=self._timestamp[rows],
+        )
+
+    # -- Dict views --
+
+    def row(self, i: int) -> dict:
+        ids = self.ids
+        return {
+            "tx_id": self.tx_id(i),
+            "from_id": ids[int(self._from[i])],
+            "to_id": ids[int(self._to[i])],
+            "amount": float(self._amount[i]),
+            "currency": self.currencies[int(self._currency[i])],
+            "timestamp": int(self._timestamp[i]),
+            "payment_format": self.payment_formats[int(self._payment_format[i])],
+            "is_laundering": int(self._is_laundering[i]),
+            "bucket_index": int(self._bucket[i]),
+        }
+
+    def rows(self, indices: Iterable[int]) -> list[dict]:
+        return [self.row(int(i)) for i in indices]
+
+    # -- Mutation --
+
+    def _reserve(self, extra: int) -> None:
+        needed = self._n + extra
+        capacity = len(self._from)
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2)
+        for name in _COLUMN_ATTRS:
+            old = getattr(self, name)
+            grown = np.empty(new_capacity, dtype=old.dtype)
+            grown[: self._n] = old[: self._n]
+            setattr(self, name, grown)
+
+    def extend(self, records: Sequence[dict]) -> np.ndarray:
+        """Append dict records and return their new row indices."""
+        count = len(records)
+        self._reserve(count)
+        start = self._n
+        intern = self.ids.intern
+        intern_currency = self.currencies.intern
+        intern_format = self.payment_formats.intern
+        for offset, tx in enumerate(records):
+            i = start + offset
+            self._from[i] = intern(tx["from_id"])
+            self._to[i] = intern(tx["to_id"])
+            self._amount[i] = tx["amount"]
+            self._timestamp[i] = tx["timestamp"]
+            self._bucket[i] = tx.get("bucket_index", 0)
+            self._currency[i] = intern_currency(tx.get("currency") or "USD")
+            self._payment_format[i] = intern_format(tx.get("payment_format") or "")
+            self._is_laundering[i] = tx.get("is_laundering", 0)
+            self._tx_id_tail.append(str(tx.get("tx_id") or f"tx_{i:06d}"))
+        self._n = start + count
+        return np.arange(start, self._n, dtype=np.int64)
+
+    def append(self, record: dict) -> int:
+        return int(self.extend([record])[0])
+
+    def nbytes(self) -> int:
+        """Approximate memory held by the numeric columns."""
+        return sum(getattr(self, name).nbytes for name in _COLUMN_ATTRS)
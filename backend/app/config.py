@@ -8,3 +8,6 @@ DATA_DIR = Path(os.getenv("ANGELA_DATA_DIR", str(PROJECT_ROOT / "data" / "proces
 DATA_FILE = os.getenv("ANGELA_DATA_FILE", "sample_small.json")
 
 DATA_PATH = DATA_DIR / DATA_FILE
+
+# Derived data that is safe to delete (risk tables, etc.)
+CACHE_DIR = Path(os.getenv("ANGELA_CACHE_DIR", str(PROJECT_ROOT / ".angela_cache")))
@@ -1,22 +1,112 @@
-"""Executive dashboard aggregations."""
+"""Executive dashboard aggregations.
+
+Figures are materialized per dataset generation in ``DashboardAggregates``:
+each bucket's trend point, and the KPIs and heatmap of each bucket that was
+asked for, are computed once. They are recomputed only after an append,
+activity update or new entity touches the buckets they read (see
+``Dataset.version_of``), so a dashboard read with no changes in between
+does no per-bucket work.
+"""
+
+from __future__ import annotations
+
+import weakref
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
 
 from .data_loader import store
-from .clusters import detect_clusters
+
+if TYPE_CHECKING:
+    from .data_loader import Dataset
+
+
+class DashboardAggregates:
+    """Cached dashboard figures of one dataset generation."""
+
+    def __init__(self) -> None:
+        # bucket -> (bucket version, trend point)
+        self._points: dict[int, tuple[int, dict]] = {}
+        # bucket -> (version of buckets t - 1, t and the entity table, figures)
+        self._figures: dict[int, tuple[int, dict]] = {}
+        # (revision, n_buckets) the trend list was assembled at
+        self._trend_key: Optional[tuple[int, int]] = None
+        self._trend: list[dict] = []
+
+    def trend(self, dataset: "Dataset") -> list[dict]:
+        """Risk trend across all buckets; only changed buckets are recomputed."""
+        key = (dataset.revision, dataset.n_buckets)
+        if key != self._trend_key:
+            self._trend = [self._point(dataset, b) for b in range(dataset.n_buckets)]
+            self._trend_key = key
+        return self._trend
+
+    def figures(self, dataset: "Dataset", bucket: int) -> dict:
+        """KPIs and jurisdiction heatmap of ``bucket``."""
+        version = dataset.version_of((bucket - 1, bucket), entities=True)
+        cached = self._figures.get(bucket)
+        if cached is None or cached[0] != version:
+            cached = (version, _bucket_figures(dataset, bucket))
+            self._figures[bucket] = cached
+        return cached[1]
+
+    def _point(self, dataset: "Dataset", bucket: int) -> dict:
+        version = dataset.version_of((bucket,))
+        cached = self._points.get(bucket)
+        if cached is None or cached[0] != version:
+            cached = (version, _trend_point(bucket, dataset.risk_by_bucket.get(bucket, {})))
+            self._points[bucket] = cached
+        return cached[1]
+
+
+_aggregates: "weakref.WeakKeyDictionary[Dataset, DashboardAggregates]" = weakref.WeakKeyDictionary()
+
+
+def get_aggregates(dataset: "Dataset") -> DashboardAggregates:
+    aggregates = _aggregates.get(dataset)
+    if aggregates is None:
+        aggregates = _aggregates.setdefault(dataset, DashboardAggregates())
+    return aggregates
 
 
 def compute_dashboard(bucket: int) -> dict:
-    """Compute executive KPIs for a given bucket."""
-    risk_data = store.risk_by_bucket.get(bucket, {})
-    bucket_tx = store.get_bucket_transactions(bucket)
+    """Executive KPIs for a given bucket, read from the materialized aggregates."""
+    dataset = store.current
+    aggregates = get_aggregates(dataset)
+    figures = aggregates.figures(dataset, bucket)
+    return {
+        "bucket": bucket,
+        "kpis": figures["kpis"],
+        "trend": aggregates.trend(dataset),
+        "heatmap": figures["heatmap"],
+    }
+
+
+def _trend_point(bucket: int, b_risk: dict[str, dict]) -> dict:
+    if not b_risk:
+        return {"bucket": bucket, "total_risk": 0, "high_risk_count": 0, "entity_count": 0}
+    total_risk = sum(d["risk_score"] for d in b_risk.values())
+    hr = sum(1 for d in b_risk.values() if d["risk_score"] > 0.5)
+    return {
+        "bucket": bucket,
+        "total_risk": round(total_risk, 2),
+        "high_risk_count": hr,
+        "entity_count": len(b_risk),
+    }
+
+
+def _bucket_figures(dataset: "Dataset", bucket: int) -> dict:
+    risk_data = dataset.risk_by_bucket.get(bucket, {})
+    cols = dataset.get_bucket_columns(bucket)
 
     # KPI: high-risk entities (risk > 0.5)
     high_risk_count = sum(1 for d in risk_data.values() if d["risk_score"] > 0.5)
-    total_entities = len(risk_data) or len(store.entities)
+    total_entities = len(risk_data) or len(dataset.entities)
 
     # KPI: new anomalies (entities that became high-risk vs previous bucket)
     new_anomalies = 0
     if bucket > 0:
-        prev_risk = store.risk_by_bucket.get(bucket - 1, {})
+        prev_risk = dataset.risk_by_bucket.get(bucket - 1, {})
         for eid, data in risk_data.items():
             if data["risk_score"] > 0.5:
                 prev_score = prev_risk.get(eid, {}).get("risk_score", 0.0)
@@ -24,52 +114,27 @@ def compute_dashboard(bucket: int) -> dict:
                     new_anomalies += 1
 
     # KPI: cluster count
-    clusters = detect_clusters(risk_data, bucket_tx, threshold=0.3)
+    clusters = dataset.get_clusters(bucket, threshold=0.3)
     cluster_count = len(clusters)
 
     # KPI: cross-border risk ratio
     # Entities with risk > 0.3 that have counterparties in different jurisdiction buckets
-    cross_border = 0
-    entity_jurisdictions: dict[str, int] = {}
-    for ent in store.entities:
-        entity_jurisdictions[ent["id"]] = ent["jurisdiction_bucket"]
-
-    for tx in bucket_tx:
-        f_jur = entity_jurisdictions.get(tx["from_id"], -1)
-        t_jur = entity_jurisdictions.get(tx["to_id"], -1)
-        if f_jur != t_jur and f_jur >= 0 and t_jur >= 0:
-            f_risk = risk_data.get(tx["from_id"], {}).get("risk_score", 0)
-            t_risk = risk_data.get(tx["to_id"], {}).get("risk_score", 0)
-            if f_risk > 0.3 or t_risk > 0.3:
-                cross_border += 1
-
-    total_risky_tx = sum(
-        1 for tx in bucket_tx
-        if risk_data.get(tx["from_id"], {}).get("risk_score", 0) > 0.3
-        or risk_data.get(tx["to_id"], {}).get("risk_score", 0) > 0.3
-    )
-    cross_border_ratio = cross_border / max(total_risky_tx, 1)
+    jurisdictions = dataset.jurisdiction_by_code
+    risk_by_code = dataset.get_risk_array(bucket)
 
-    # Risk trend (across all buckets)
-    trend: list[dict] = []
-    for b in range(store.n_buckets):
-        b_risk = store.risk_by_bucket.get(b, {})
-        if not b_risk:
-            trend.append({"bucket": b, "total_risk": 0, "high_risk_count": 0, "entity_count": 0})
-            continue
-        total_risk = sum(d["risk_score"] for d in b_risk.values())
-        hr = sum(1 for d in b_risk.values() if d["risk_score"] > 0.5)
-        trend.append({
-            "bucket": b,
-            "total_risk": round(total_risk, 2),
-            "high_risk_count": hr,
-            "entity_count": len(b_risk),
-        })
+    f_jur = jurisdictions[cols.from_code]
+    t_jur = jurisdictions[cols.to_code]
+    risky_tx = (risk_by_code[cols.from_code] > 0.3) | (risk_by_code[cols.to_code] > 0.3)
+    cross_border = int(np.count_nonzero((f_jur != t_jur) & (f_jur >= 0) & (t_jur >= 0) & risky_tx))
+
+    total_risky_tx = int(np.count_nonzero(risky_tx))
+    cross_border_ratio = cross_border / max(total_risky_tx, 1)
 
     # Jurisdiction heatmap
     jurisdiction_risk: dict[int, dict] = {}
     for eid, data in risk_data.items():
-        jur = entity_jurisdictions.get(eid, 0)
+        entity = dataset.get_entity(eid)
+        jur = entity["jurisdiction_bucket"] if entity else 0
         if jur not in jurisdiction_risk:
             jurisdiction_risk[jur] = {"total_risk": 0, "count": 0, "high_risk": 0}
         jurisdiction_risk[jur]["total_risk"] += data["risk_score"]
@@ -88,15 +153,13 @@ def compute_dashboard(bucket: int) -> dict:
     ]
 
     return {
-        "bucket": bucket,
         "kpis": {
             "high_risk_entities": high_risk_count,
             "new_anomalies": new_anomalies,
             "cluster_count": cluster_count,
             "cross_border_ratio": round(cross_border_ratio, 4),
             "total_entities": total_entities,
-            "total_transactions": len(bucket_tx),
+            "total_transactions": len(cols),
         },
-        "trend": trend,
         "heatmap": heatmap,
     }
@@ -1,84 +1,188 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
+import threading
+from collections.abc import Iterable, MutableMapping
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from collections import defaultdict
-from typing import Optional
+from typing import Any, Iterator, Optional
 
-from .risk.scoring import compute_risk_for_bucket
+import numpy as np
+
+from .binary_snapshot import SNAPSHOT_SUFFIX, BucketTableMap, is_binary_snapshot, read_binary_snapshot
+from .bucket_graph import BucketGraph
+from .clusters import ClusterIndex
+from .columnar import BucketColumns, IdTable, TransactionTable
+from .risk.cache import RiskCache, compute_risk_tables
+from .risk.incremental import BucketRiskState
+from .risk.parallel import ProgressCallback, risk_workers_from_env
+from .snapshot_lod import BucketRanking
 
 log = logging.getLogger(__name__)
 
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
 
-class DataStore:
-    """In-memory store for processed AML snapshot data."""
+
+class Dataset:
+    """One loaded generation of snapshot data and its runtime indices.
+
+    Transactions live in a columnar ``TransactionTable`` (interned int32
+    entity codes, float64 amounts, int64 timestamps); ``bucket_index`` maps
+    each bucket to an int64 array of row indices into it.
+
+    A generation is fully built before ``DataStore.publish`` makes it
+    visible and is never reloaded in place. Appends (injection, streaming
+    ingestion) extend the published generation in place, on the event loop
+    and one at a time under ``append_lock``, so loop readers never see one
+    half-applied. Only ``build_risk_state``, which reads the dataset without
+    changing it, runs on a worker thread while the lock is held.
+    """
 
     def __init__(self) -> None:
+        # Set by DataStore.publish; 0 = never published
+        self.generation = 0
+        # Counts in-place changes (appends, activity, new entities) to this
+        # generation; bucket_versions[b] / entity_version hold the revision
+        # that last changed bucket b / the entity table
+        self.revision = 0
+        self.bucket_versions: dict[int, int] = {}
+        self.entity_version = 0
+
         self.metadata: dict = {}
         self.entities: list[dict] = []
-        self.transactions: list[dict] = []
-        self.bucket_index: dict[str, list[int]] = {}
-        self.entity_activity: dict[str, dict[str, dict]] = {}
+        self.ids: IdTable = IdTable()
+        self.transactions: TransactionTable = TransactionTable(self.ids)
+        self.bucket_index: dict[str, np.ndarray] = {}
+        self.entity_activity: MutableMapping[str, dict[str, dict]] = {}
 
         # Runtime indices
         self.entities_by_id: dict[str, dict] = {}
-        self.adjacency: dict[str, set[str]] = defaultdict(set)
+        self.jurisdiction_by_code: np.ndarray = np.empty(0, dtype=np.int16)
         self.n_buckets: int = 0
 
         # Risk scores per bucket: bucket -> entity_id -> {risk_score, reasons, evidence}
-        self.risk_by_bucket: dict[int, dict[str, dict]] = {}
+        self.risk_by_bucket: MutableMapping[int, dict[str, dict]] = {}
+        # Detector accumulators for buckets rescored incrementally (built lazily)
+        self.risk_states: dict[int, BucketRiskState] = {}
+        # Compressed per-bucket graphs for neighborhood queries (built lazily)
+        self.bucket_graphs: dict[int, BucketGraph] = {}
+        # Snapshot node sets ranked by risk and volume (built lazily)
+        self.bucket_rankings: dict[int, BucketRanking] = {}
+        # High-risk cluster indexes per (bucket, threshold), kept current on
+        # append; the lock covers agent threads building them concurrently
+        self.cluster_indexes: dict[tuple[int, float], ClusterIndex] = {}
+        self._cluster_lock = threading.Lock()
+        # Serializes in-place appends (ingest batches, /inject), including
+        # the off-loop detector state build that precedes them
+        self.append_lock = asyncio.Lock()
 
     @property
     def is_loaded(self) -> bool:
         return len(self.entities) > 0
 
-    def load(self, path: Path) -> None:
-        """Load snapshot JSON and build runtime indices."""
-        log.info(f"Loading data from {path}...")
+    @classmethod
+    def from_binary(
+        cls,
+        path: Path,
+        risk_cache: Optional[RiskCache] = None,
+        risk_workers: int = 1,
+    ) -> "Dataset":
+        """Map a binary snapshot instead of parsing and rescoring it.
 
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        Column arrays stay memory-mapped; per-bucket activity and risk tables
+        are decoded lazily on first access. Risk is only recomputed if the
+        file was written without risk tables.
+        """
+        ds = cls()
+        snap = read_binary_snapshot(path)
+        ds.metadata = snap.metadata
+        ds.n_buckets = snap.n_buckets
+        ds.ids = snap.entity_ids()
+        ds.entities = snap.entities(ds.ids)
+        ds.transactions = snap.transactions(ds.ids)
+        ds.bucket_index = snap.bucket_index()
+        ds.entity_activity = BucketTableMap(ds.n_buckets, snap.activity_loader(ds.ids), key_fn=str)
+
+        ds._build_indices()
+        if snap.has_risk:
+            ds.risk_by_bucket = BucketTableMap(ds.n_buckets, snap.risk_loader(ds.ids))
+        else:
+            ds._compute_risk(risk_cache, risk_workers)
+
+        log.info(
+            f"Mapped: {len(ds.entities)} entities, "
+            f"{len(ds.transactions)} transactions, "
+            f"{ds.n_buckets} buckets from {path.name}"
+        )
+        return ds
 
-        self.load_from_dict(data)
+    @classmethod
+    def from_dict(
+        cls,
+        data: dict,
+        risk_cache: Optional[RiskCache] = None,
+        risk_workers: int = 1,
+        progress: Optional[ProgressCallback] = None,
+    ) -> "Dataset":
+        """Build a dataset from a snapshot dict, scoring every bucket.
 
-    def load_from_dict(self, data: dict) -> None:
-        """Load snapshot from a dict and build runtime indices."""
-        self.metadata = data["metadata"]
-        self.entities = data["entities"]
-        self.transactions = data["transactions"]
-        self.bucket_index = data.get("bucket_index", {})
-        self.entity_activity = data.get("entity_activity", {})
-        self.n_buckets = self.metadata.get("n_buckets", 0)
-        self.risk_by_bucket = {}
+        ``progress(done, total)`` is called as buckets are scored.
+        """
+        ds = cls()
+        ds.metadata = data["metadata"]
+        ds.entities = data["entities"]
+        ds.entity_activity = data.get("entity_activity", {})
+        ds.n_buckets = ds.metadata.get("n_buckets", 0)
 
-        self._build_indices()
-        self._compute_risk()
+        # Intern entity IDs in entity-table order so codes are stable
+        ds.ids = IdTable(e["id"] for e in ds.entities)
+        ds.transactions = TransactionTable.from_records(data["transactions"], ids=ds.ids)
+        ds.bucket_index = {
+            str(b): np.asarray(rows, dtype=np.int64)
+            for b, rows in data.get("bucket_index", {}).items()
+        }
+
+        ds._build_indices()
+        ds._compute_risk(risk_cache, risk_workers, progress)
 
         log.info(
-            f"Loaded: {len(self.entities)} entities, "
-            f"{len(self.transactions)} transactions, "
-            f"{self.n_buckets} buckets"
+            f"Loaded: {len(ds.entities)} entities, "
+            f"{len(ds.transactions)} transactions "
+            f"({ds.transactions.nbytes() / (1024 * 1024):.1f} MB columnar), "
+            f"{ds.n_buckets} buckets"
         )
+        return ds
 
     def _build_indices(self) -> None:
         """Build fast-lookup indices from loaded data."""
         # Entity by ID
         self.entities_by_id = {e["id"]: e for e in self.entities}
 
-        # Global adjacency (skip self-loops)
-        self.adjacency = defaultdict(set)
-        for tx in self.transactions:
-            if tx["from_id"] != tx["to_id"]:
-                self.adjacency[tx["from_id"]].add(tx["to_id"])
-                self.adjacency[tx["to_id"]].add(tx["from_id"])
+        # Jurisdiction per entity code (-1 for IDs without an entity record)
+        self.jurisdiction_by_code = np.full(len(self.ids), -1, dtype=np.int16)
+        for e in self.entities:
+            self.jurisdiction_by_code[self.ids.code(e["id"])] = e["jurisdiction_bucket"]
 
-    def _compute_risk(self) -> None:
-        """Precompute risk scores for all buckets."""
+    def _compute_risk(
+        self,
+        risk_cache: Optional[RiskCache],
+        risk_workers: int,
+        progress: Optional[ProgressCallback] = None,
+    ) -> None:
+        """Precompute risk scores for all buckets, reusing cached tables."""
         bucket_size = self.metadata.get("bucket_size_seconds", 86400)
-        for b in range(self.n_buckets):
-            bucket_tx = self.get_bucket_transactions(b)
-            self.risk_by_bucket[b] = compute_risk_for_bucket(bucket_tx, bucket_size)
+        self.risk_by_bucket = compute_risk_tables(
+            self.transactions,
+            self.bucket_index,
+            self.n_buckets,
+            bucket_size,
+            cache=risk_cache,
+            workers=risk_workers,
+            progress=progress,
+        )
 
         # Log risk distribution
         all_scores = [
@@ -103,12 +207,176 @@ class DataStore:
             "evidence": {},
         })
 
+    def version_of(self, buckets: Optional[Iterable[int]], entities: bool = False) -> int:
+        """Latest revision that changed any of ``buckets`` (None = any bucket).
+
+        With ``entities``, changes to the entity table count as well.
+        """
+        if buckets is None:
+            return self.revision
+        version = max((self.bucket_versions.get(b, 0) for b in buckets), default=0)
+        return max(version, self.entity_version) if entities else version
+
+    def _touch(self, bucket: int) -> None:
+        self.revision += 1
+        self.bucket_versions[bucket] = self.revision
+
     def get_entity(self, entity_id: str) -> Optional[dict]:
         return self.entities_by_id.get(entity_id)
 
+    def get_bucket_rows(self, bucket: int) -> np.ndarray:
+        """Global transaction row indices for a bucket."""
+        return self.bucket_index.get(str(bucket), _EMPTY_ROWS)
+
+    def get_bucket_columns(self, bucket: int) -> BucketColumns:
+        """Columnar view (array slices) of a bucket's transactions."""
+        return self.transactions.columns(self.get_bucket_rows(bucket))
+
+    def get_bucket_graph(self, bucket: int) -> BucketGraph:
+        """CSR adjacency and pair aggregates for a bucket, built on first use."""
+        graph = self.bucket_graphs.get(bucket)
+        if graph is None:
+            graph = BucketGraph.from_columns(self.get_bucket_columns(bucket))
+            self.bucket_graphs[bucket] = graph
+        return graph
+
+    def get_bucket_ranking(self, bucket: int) -> BucketRanking:
+        """Snapshot node set of a bucket ranked by risk and volume, built on first use."""
+        ranking = self.bucket_rankings.get(bucket)
+        if ranking is None:
+            ranking = BucketRanking.build(self, bucket)
+            self.bucket_rankings[bucket] = ranking
+        return ranking
+
+    def get_clusters(self, bucket: int, threshold: float = 0.3) -> list[dict]:
+        """High-risk clusters of a bucket (see ``detect_clusters``), built on first use."""
+        key = (bucket, float(threshold))
+        with self._cluster_lock:
+            index = self.cluster_indexes.get(key)
+            if index is None:
+                index = ClusterIndex.build(self, bucket, key[1])
+                self.cluster_indexes[key] = index
+            return index.clusters(self)
+
+    def _update_clusters(self, bucket: int, rows: np.ndarray, changed: dict[str, dict]) -> None:
+        with self._cluster_lock:
+            indexes = [index for (b, _), index in self.cluster_indexes.items() if b == bucket]
+            if indexes:
+                cols = self.transactions.columns(rows)
+                for index in indexes:
+                    index.apply(self, bucket, cols, changed)
+
+    def get_risk_array(self, bucket: int) -> np.ndarray:
+        """Risk score per entity code for a bucket (0.0 where unscored)."""
+        scores = np.zeros(len(self.ids), dtype=np.float64)
+        bucket_risks = self.risk_by_bucket.get(bucket, {})
+        if bucket_risks:
+            codes = self.ids.codes(bucket_risks.keys())
+            scores[codes] = [r["risk_score"] for r in bucket_risks.values()]
+        return scores
+
     def get_bucket_transactions(self, bucket: int) -> list[dict]:
-        indices = self.bucket_index.get(str(bucket), [])
-        return [self.transactions[i] for i in indices]
+        """Dict views of a bucket's transactions, for legacy callers."""
+        return self.transactions.rows(self.get_bucket_rows(bucket))
+
+    def append_transactions(self, bucket: int, records: list[dict]) -> np.ndarray:
+        """Append transactions to a bucket and return their row indices.
+
+        Risk is not updated; use ``append_and_rescore`` for that.
+        """
+        self.risk_states.pop(bucket, None)
+        rows = self._append(bucket, records)
+        self._update_clusters(bucket, rows, {})
+        return rows
+
+    def append_and_rescore(self, bucket: int, records: list[dict]) -> dict[str, dict]:
+        """Append transactions and incrementally update the bucket's risk table.
+
+        Only entities whose detector inputs changed are re-evaluated. Returns
+        the risk entries that changed, keyed by entity ID.
+        """
+        state = self.risk_states.get(bucket)
+        if state is None:
+            state = self.risk_states[bucket] = self.build_risk_state(bucket)
+
+        rows = self._append(bucket, records)
+        cols = self.transactions.columns(rows)
+        affected = state.apply(
+            cols.from_code.tolist(),
+            cols.to_code.tolist(),
+            cols.amount.tolist(),
+            cols.timestamp.tolist(),
+            self.transactions.tx_ids(rows),
+        )
+
+        risk = self.risk_by_bucket.get(bucket) or {}
+        changed = {
+            eid: entry
+            for eid, entry in state.score(affected, self.ids).items()
+            if risk.get(eid) != entry
+        }
+        risk.update(changed)
+        self.risk_by_bucket[bucket] = risk
+        self._update_clusters(bucket, rows, changed)
+        return changed
+
+    def build_risk_state(self, bucket: int) -> BucketRiskState:
+        """Detector accumulators over a bucket's current rows.
+
+        Only reads the dataset, so it can run on a worker thread as long as
+        no append runs meanwhile.
+        """
+        rows = self.get_bucket_rows(bucket)
+        return BucketRiskState.from_columns(self.transactions.columns(rows), self.transactions.tx_ids(rows))
+
+    def _append(self, bucket: int, records: list[dict]) -> np.ndarray:
+        self._touch(bucket)
+        self.bucket_graphs.pop(bucket, None)
+        self.bucket_rankings.pop(bucket, None)
+        for tx in records:
+            tx.setdefault("bucket_index", bucket)
+        rows = self.transactions.extend(records)
+        if bucket >= self.n_buckets:
+            self.n_buckets = bucket + 1
+            self.metadata["n_buckets"] = self.n_buckets
+        key = str(bucket)
+        self.bucket_index[key] = np.concatenate([self.bucket_index.get(key, _EMPTY_ROWS), rows])
+        # IDs first seen in appended rows have no entity record
+        missing = len(self.ids) - len(self.jurisdiction_by_code)
+        if missing > 0:
+            self.jurisdiction_by_code = np.concatenate([
+                self.jurisdiction_by_code, np.full(missing, -1, dtype=np.int16),
+            ])
+        return rows
+
+    def add_entities(self, records: list[dict]) -> None:
+        """Register entity records for IDs not seen before."""
+        for entity in records:
+            if entity["id"] in self.entities_by_id:
+                continue
+            self.revision += 1
+            self.entity_version = self.revision
+            self.entities.append(entity)
+            self.entities_by_id[entity["id"]] = entity
+            code = self.ids.intern(entity["id"])
+            if code >= len(self.jurisdiction_by_code):
+                self.jurisdiction_by_code = np.concatenate([
+                    self.jurisdiction_by_code,
+                    np.full(code + 1 - len(self.jurisdiction_by_code), -1, dtype=np.int16),
+                ])
+            self.jurisdiction_by_code[code] = entity.get("jurisdiction_bucket", -1)
+
+    def extend_activity(self, bucket: int, records: list[dict]) -> None:
+        """Add transactions to a bucket's per-entity in/out counts and sums."""
+        self._touch(bucket)
+        key = str(bucket)
+        activity = self.entity_activity.get(key) or {}
+        for tx in records:
+            for eid, direction in ((tx["from_id"], "out"), (tx["to_id"], "in")):
+                entry = activity.setdefault(eid, {"in_count": 0, "out_count": 0, "in_sum": 0.0, "out_sum": 0.0})
+                entry[f"{direction}_count"] += 1
+                entry[f"{direction}_sum"] = round(entry[f"{direction}_sum"] + tx["amount"], 2)
+        self.entity_activity[key] = activity
 
     def get_bucket_entities(self, bucket: int) -> list[str]:
         """Get entity IDs active in a given bucket."""
@@ -119,5 +387,102 @@ class DataStore:
         return self.entity_activity.get(str(bucket), {}).get(entity_id)
 
 
+class DataStore:
+    """Holds the published dataset generation behind a single reference.
+
+    Loading builds a complete ``Dataset`` off to the side and ``publish``
+    swaps it in with one assignment, so readers never see a half-loaded
+    mix. Attribute reads (``store.transactions``, ``store.get_entity(...)``)
+    go to the current generation; inside ``pinned()`` (every HTTP request,
+    see ``main.py``) they keep going to the generation that was current
+    when the pin was taken, including in ``asyncio.to_thread`` workers,
+    which inherit the context.
+    """
+
+    def __init__(self, risk_cache: Optional[RiskCache] = None, risk_workers: int = 1) -> None:
+        # Optional on-disk cache of per-bucket risk tables
+        self.risk_cache = risk_cache
+        # Processes used to score buckets (1 = in-process)
+        self.risk_workers = risk_workers
+
+        self._current = Dataset()
+        self._generations = 0
+        self._publish_lock = threading.Lock()
+        self._pinned: ContextVar[Optional[Dataset]] = ContextVar(f"angela_dataset_{id(self)}", default=None)
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for names not defined on the store itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.current, name)
+
+    @property
+    def current(self) -> Dataset:
+        """The pinned generation if any, else the latest published one."""
+        return self._pinned.get() or self._current
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped on every publish; caches can key on it."""
+        return self.current.generation
+
+    @contextmanager
+    def pinned(self) -> Iterator[Dataset]:
+        """Keep reading the current generation until the block exits."""
+        token = self._pinned.set(self.current)
+        try:
+            yield self._pinned.get()
+        finally:
+            self._pinned.reset(token)
+
+    def publish(self, dataset: Dataset) -> int:
+        """Make ``dataset`` the current generation and return its number.
+
+        A pinned caller (e.g. the request that loaded it) moves its own pin
+        to the new generation; other pins are unaffected.
+        """
+        with self._publish_lock:
+            self._generations += 1
+            dataset.generation = self._generations
+            self._current = dataset
+        if self._pinned.get() is not None:
+            self._pinned.set(dataset)
+        log.info(f"Published dataset generation {dataset.generation}")
+        return dataset.generation
+
+    def build(self, path: Path) -> Dataset:
+        """Build (but do not publish) a dataset from a binary or JSON file."""
+        log.info(f"Loading data from {path}...")
+        if is_binary_snapshot(path):
+            return Dataset.from_binary(path, self.risk_cache, self.risk_workers)
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return self.build_from_dict(data)
+
+    def build_from_dict(self, data: dict, progress: Optional[ProgressCallback] = None) -> Dataset:
+        """Build (but do not publish) a dataset from a snapshot dict."""
+        return Dataset.from_dict(data, self.risk_cache, self.risk_workers, progress)
+
+    def load(self, path: Path) -> None:
+        """Load a snapshot file (binary or JSON) and publish it."""
+        self.publish(self.build(path))
+
+    def load_binary(self, path: Path) -> None:
+        """Map a binary snapshot and publish it."""
+        self.publish(Dataset.from_binary(path, self.risk_cache, self.risk_workers))
+
+    def load_from_dict(self, data: dict, progress: Optional[ProgressCallback] = None) -> None:
+        """Build a dataset from a snapshot dict and publish it."""
+        self.publish(self.build_from_dict(data, progress))
+
+
+def preferred_snapshot_path(path: Path) -> Path:
+    """Return the binary sibling of a JSON snapshot if it is present and fresh."""
+    binary = path.with_suffix(SNAPSHOT_SUFFIX)
+    if binary.exists() and (not path.exists() or binary.stat().st_mtime >= path.stat().st_mtime):
+        return binary
+    return path
+
+
 # Singleton
-store = DataStore()
+store = DataStore(risk_cache=RiskCache.from_env(), risk_workers=risk_workers_from_env())
@@ -0,0 +1,279 @@
+"""Streaming transaction ingestion into the loaded DataStore.
+
+Records arrive as NDJSON (one transaction object per line) over HTTP or a
+WebSocket. They are validated, assigned to buckets from ``metadata.t0`` and
+``bucket_size_seconds``, and applied in micro-batches: each batch extends
+the transaction table, ``bucket_index`` and ``entity_activity`` and rescores
+only the affected entities, then pushes the risk changes to ``/stream``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from .csv_processor import jurisdiction_bucket, make_entity_id, parse_timestamp
+from .data_loader import Dataset, DataStore
+
+log = logging.getLogger(__name__)
+
+Broadcast = Callable[[str, dict], Awaitable[None]]
+
+INGEST_BATCH_SIZE = max(1, int(os.getenv("ANGELA_INGEST_BATCH_SIZE", "500")))
+INGEST_FLUSH_SECONDS = max(0.01, float(os.getenv("ANGELA_INGEST_FLUSH_MS", "250")) / 1000)
+# Records may open new buckets, but not arbitrarily far past the last one
+INGEST_MAX_BUCKET_GAP = int(os.getenv("ANGELA_INGEST_MAX_BUCKET_GAP", "31"))
+MAX_REPORTED_ERRORS = 20
+
+
+class IngestError(ValueError):
+    """A record that cannot be ingested."""
+
+
+@dataclass
+class IngestResult:
+    accepted: int = 0
+    rejected: int = 0
+    batches: int = 0
+    buckets: set[int] = field(default_factory=set)
+    errors: list[dict] = field(default_factory=list)
+
+    def reject(self, line: int, message: str) -> None:
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def to_dict(self, store: DataStore) -> dict:
+        return {
+            "status": "ok",
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "batches": self.batches,
+            "buckets": sorted(self.buckets),
+            "errors": self.errors,
+            "n_transactions": len(store.transactions),
+            "n_buckets": store.n_buckets,
+        }
+
+
+def _entity_id(record: dict, side: str) -> str:
+    eid = record.get(f"{side}_id")
+    if eid:
+        return str(eid)
+    bank, account = record.get(f"{side}_bank"), record.get(f"{side}_account")
+    if bank is not None and account is not None:
+        return make_entity_id(str(bank), str(account))
+    raise IngestError(f"missing {side}_id (or {side}_bank + {side}_account)")
+
+
+def normalize_record(record: Any, store: DataStore) -> dict:
+    """Validate one incoming transaction and assign its bucket."""
+    if not isinstance(record, dict):
+        raise IngestError("record must be a JSON object")
+
+    from_id = _entity_id(record, "from")
+    to_id = _entity_id(record, "to")
+
+    try:
+        amount = float(record["amount"])
+    except (KeyError, TypeError, ValueError):
+        raise IngestError("amount must be a number")
+    if amount < 0:
+        raise IngestError("amount must be non-negative")
+
+    raw_ts = record.get("timestamp")
+    if isinstance(raw_ts, (int, float)) and not isinstance(raw_ts, bool):
+        timestamp = int(raw_ts)
+    elif isinstance(raw_ts, str):
+        timestamp = int(raw_ts) if raw_ts.strip().isdigit() else parse_timestamp(raw_ts)
+    else:
+        timestamp = None
+    if timestamp is None:
+        raise IngestError("timestamp must be epoch seconds or a date string")
+
+    t0 = int(store.metadata.get("t0", 0))
+    bucket_size = int(store.metadata.get("bucket_size_seconds", 86400))
+    if timestamp < t0:
+        raise IngestError(f"timestamp {timestamp} is before dataset start t0={t0}")
+    bucket = (timestamp - t0) // bucket_size
+    if bucket >= store.n_buckets + INGEST_MAX_BUCKET_GAP:
+        raise IngestError(f"timestamp {timestamp} is too far past the last bucket")
+
+    tx = {
+        "from_id": from_id,
+        "to_id": to_id,
+        "amount": round(amount, 2),
+        "currency": str(record.get("currency") or "USD"),
+        "timestamp": timestamp,
+        "payment_format": str(record.get("payment_format") or ""),
+        "is_laundering": int(bool(record.get("is_laundering", 0))),
+        "bucket_index": bucket,
+    }
+    if record.get("tx_id"):
+        tx["tx_id"] = str(record["tx_id"])
+    return tx
+
+
+def _new_entities(ds: Dataset, records: list[dict]) -> list[dict]:
+    seed = ds.metadata.get("seed", 42)
+    seen: set[str] = set()
+    entities = []
+    for tx in records:
+        for eid in (tx["from_id"], tx["to_id"]):
+            if eid in seen or ds.get_entity(eid) is not None:
+                continue
+            seen.add(eid)
+            entities.append({
+                "id": eid,
+                "type": "account",
+                "bank": eid.split("_")[0] if "_" in eid else "unknown",
+                "jurisdiction_bucket": jurisdiction_bucket(eid, seed),
+                "kyc_level": "standard",
+            })
+    return entities
+
+
+async def prepare_risk_states(ds: Dataset, buckets: Iterable[int]) -> None:
+    """Build missing detector states for ``buckets`` on a worker thread.
+
+    The first append to a bucket builds its full state (cycle search
+    included), which would block the event loop on large buckets. The build
+    only reads the dataset; callers hold ``ds.append_lock`` so no append
+    lands in between.
+    """
+    missing = [b for b in buckets if b not in ds.risk_states]
+    if not missing:
+        return
+    states = await asyncio.to_thread(lambda: {b: ds.build_risk_state(b) for b in missing})
+    ds.risk_states.update(states)
+
+
+def _apply_records(
+    ds: Dataset,
+    records: list[dict],
+    by_bucket: dict[int, list[dict]],
+) -> dict[int, dict[str, dict]]:
+    """Append each bucket's records and rescore it, in one step on the loop."""
+    ds.add_entities(_new_entities(ds, records))
+    next_row = len(ds.transactions)
+
+    changes: dict[int, dict[str, dict]] = {}
+    for bucket in sorted(by_bucket):
+        batch = by_bucket[bucket]
+        for tx in batch:
+            if "tx_id" not in tx:
+                tx["tx_id"] = f"stream_{next_row:08d}"
+            next_row += 1
+        changes[bucket] = ds.append_and_rescore(bucket, batch)
+        ds.extend_activity(bucket, batch)
+    return changes
+
+
+async def apply_batch(
+    store: DataStore,
+    records: list[dict],
+    broadcast: Optional[Broadcast] = None,
+) -> dict[int, dict[str, dict]]:
+    """Append normalized records and rescore their buckets.
+
+    Returns bucket -> changed risk entries. Each bucket's changes are
+    broadcast as ``RISK_UPDATED``. The whole batch goes to the generation
+    that was current when it started, even if an upload publishes meanwhile.
+    """
+    by_bucket: dict[int, list[dict]] = {}
+    for tx in records:
+        by_bucket.setdefault(tx["bucket_index"], []).append(tx)
+
+    with store.pinned() as ds:
+        async with ds.append_lock:
+            await prepare_risk_states(ds, by_bucket)
+            changes = _apply_records(ds, records, by_bucket)
+        n_transactions, n_buckets = len(ds.transactions), ds.n_buckets
+
+    if broadcast is not None:
+        for bucket, changed in changes.items():
+            await broadcast("TRANSACTIONS_INGESTED", {
+                "bucket": bucket,
+                "count": len(by_bucket[bucket]),
+                "n_transactions": n_transactions,
+                "n_buckets": n_buckets,
+            })
+            if changed:
+                await broadcast("RISK_UPDATED", {
+                    "bucket": bucket,
+                    "entity_risks": {eid: entry["risk_score"] for eid, entry in changed.items()},
+                    "source": "ingest",
+                })
+    return changes
+
+
+class MicroBatcher:
+    """Buffers NDJSON lines and applies them to the store in batches."""
+
+    def __init__(
+        self,
+        store: DataStore,
+        broadcast: Optional[Broadcast] = None,
+        batch_size: int = INGEST_BATCH_SIZE,
+        on_flush: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.store = store
+        self.broadcast = broadcast
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.result = IngestResult()
+        self._pending: list[dict] = []
+        self._partial = ""
+        self._line = 0
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def feed_chunk(self, chunk: str) -> None:
+        """Feed NDJSON text that may end mid-line; the tail waits for more."""
+        text = self._partial + chunk
+        complete, _, self._partial = text.rpartition("\n")
+        if complete:
+            await self._feed_lines(complete)
+
+    async def finish(self) -> IngestResult:
+        """Process any trailing line and flush the last batch."""
+        if self._partial:
+            tail, self._partial = self._partial, ""
+            await self._feed_lines(tail)
+        await self.flush()
+        return self.result
+
+    async def _feed_lines(self, text: str) -> None:
+        for raw in text.split("\n"):
+            self._line += 1
+            raw = raw.strip()
+            if not raw:
+                continue
+            try:
+                self._pending.append(normalize_record(json.loads(raw), self.store))
+            except json.JSONDecodeError as e:
+                self.result.reject(self._line, f"invalid JSON: {e.msg}")
+                continue
+            except IngestError as e:
+                self.result.reject(self._line, str(e))
+                continue
+            if len(self._pending) >= self.batch_size:
+                await self.flush()
+
+    async def flush(self) -> None:
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        await apply_batch(self.store, batch, self.broadcast)
+        self.result.accepted += len(batch)
+        self.result.batches += 1
+        self.result.buckets.update(tx["bucket_index"] for tx in batch)
+        if self.on_flush is not None:
+            self.on_flush()
+        log.info(f"Ingested batch of {len(batch)} tx ({len(self.store.transactions)} total)")
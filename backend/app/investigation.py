@@ -1,6 +1,5 @@
 """Generate ranked investigation targets for autopilot camera tours."""
 
-from .clusters import detect_clusters
 from .data_loader import store
 
 
@@ -17,7 +16,6 @@ def generate_investigation_targets(bucket: int, max_targets: int = 8) -> list[di
     }
     """
     risk_data = store.risk_by_bucket.get(bucket, {})
-    bucket_tx = store.get_bucket_transactions(bucket)
 
     targets: list[dict] = []
 
@@ -45,7 +43,7 @@ def generate_investigation_targets(bucket: int, max_targets: int = 8) -> list[di
         })
 
     # 2. Clusters
-    clusters = detect_clusters(risk_data, bucket_tx, threshold=0.3)
+    clusters = store.get_clusters(bucket, threshold=0.3)
     clusters.sort(key=lambda c: c["risk_score"] * c["size"], reverse=True)
 
     for cluster in clusters[:3]:
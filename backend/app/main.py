@@ -1,5 +1,6 @@
 import logging
 import os
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -8,14 +9,53 @@ from fastapi import FastAPI
 load_dotenv(Path(__file__).resolve().parents[2] / ".env")
 from fastapi.middleware.cors import CORSMiddleware
 
+from .binary_snapshot import SNAPSHOT_SUFFIX
+from .config import DATA_PATH
+from .data_loader import store
 from .routes import router
 
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Drop risk tables of older detector versions and trim the cache to size
+    if store.risk_cache is not None:
+        store.risk_cache.prune()
+
+    # Map a prebuilt binary snapshot at startup; it is near-instant and the
+    # pages are shared between forked workers. JSON snapshots are still only
+    # loaded on demand via /load-sample.
+    binary_path = DATA_PATH.with_suffix(SNAPSHOT_SUFFIX)
+    preload = os.getenv("ANGELA_PRELOAD_BINARY", "1").strip().lower() not in {"0", "false", "off"}
+    if preload and binary_path.exists() and not store.is_loaded:
+        store.load(binary_path)
+    yield
+
+
+class DatasetPinMiddleware:
+    """Serve each HTTP request from the dataset generation current at its start.
+
+    A dataset published mid-request (upload, /load-sample) is only seen by
+    later requests. WebSockets are long-lived and always read the latest.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with store.pinned():
+            await self.app(scope, receive, send)
+
+
 app = FastAPI(
     title="ANGELA API",
     description="Anomaly Network Graph for Explainable Laundering Analysis",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 origins = [
@@ -38,6 +78,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(DatasetPinMiddleware)
+
 app.include_router(router)
 
 
@@ -29,6 +29,9 @@ class SnapshotMeta(BaseModel):
     n_entities: int
     n_transactions: int
     bucket_size_seconds: int
+    aggregated: bool = False
+    # Set when LOD parameters were given: total/kept/pruned counts, supernode sizes
+    lod: Optional[dict] = None
 
 
 class SnapshotOut(BaseModel):
@@ -37,6 +40,31 @@ class SnapshotOut(BaseModel):
     edges: list[dict]
 
 
+class NodeChange(BaseModel):
+    id: str
+    risk_score: float
+    volume: float
+
+
+class SnapshotDelta(BaseModel):
+    from_t: int
+    to_t: int
+    nodes_added: list[SnapshotNode]
+    nodes_removed: list[str]
+    nodes_changed: list[NodeChange]
+    # Aggregated edges (see /snapshot?aggregate=true)
+    edges_added: list[dict]
+    edges_removed: list[dict]
+    edges_changed: list[dict]
+
+
+class SnapshotDeltaOut(BaseModel):
+    from_t: int
+    to_t: int
+    mode: str
+    steps: list[SnapshotDelta]
+
+
 class ReasonOut(BaseModel):
     detector: str
     detail: str
@@ -4,13 +4,19 @@ Parses natural language into structured intents, then executes
 deterministic queries against the data store.
 """
 
+import difflib
 import json
 import logging
+import os
+import re
 from functools import lru_cache
+from typing import Any, Optional
 
-from .ai.service import _call_llm
+import numpy as np
+
+from .ai.service import Priority, _call_llm, call_llm
 from .data_loader import store
-from .clusters import detect_clusters
+from .semantic_cache import semantic_cache
 
 log = logging.getLogger(__name__)
 
@@ -52,10 +58,282 @@ If the user mentions "clusters", "groups", or "rings", use TOP_CLUSTERS.
 Return ONLY valid JSON, no markdown, no explanation."""
 
 
-def parse_query(query: str) -> dict:
-    """Parse a natural language query into a structured intent via LLM."""
-    raw = _call_llm(query, system_prompt=NLQ_SYSTEM_PROMPT, max_tokens=200)
+# ── Rule-based fast path ──────────────────────────────────────────────
+#
+# Most analyst queries are short, stock phrasings ("show high risk
+# entities", "top 5 clusters"). They are matched locally against keyword
+# and phrase rules for each intent, with fuzzy matching for typos, and
+# only queries the rules cannot settle confidently go to the LLM.
+
+LOCAL_MIN_CONFIDENCE = float(os.getenv("ANGELA_NLQ_LOCAL_MIN_CONFIDENCE", "0.6"))
+
+# Weight of a term that names an intent on its own, and of a supporting one
+_STRONG = 1.0
+_WEAK = 0.5
+# Fuzzy (typo) matches count for this share of the term's weight
+_FUZZY_SHARE = 0.75
+_FUZZY_CUTOFF = 0.85
+
+# Intent -> (term, weight); multi-word terms match consecutive tokens.
+# SHOW_HIGH_RISK is the generic intent: its terms ("high risk") also
+# qualify the specific ones, so it only wins when no specific intent does.
+_GENERIC_INTENT = "SHOW_HIGH_RISK"
+_INTENT_TERMS: dict[str, tuple[tuple[str, float], ...]] = {
+    "SHOW_HIGH_RISK": (
+        ("high risk", _STRONG), ("risky", _STRONG), ("riskiest", _STRONG), ("suspicious", _STRONG),
+        ("risk", _WEAK), ("flagged", _WEAK), ("dangerous", _WEAK), ("alert", _WEAK),
+    ),
+    "LARGE_INCOMING": (
+        ("large incoming", _STRONG), ("large transfer", _STRONG), ("big amount", _STRONG),
+        ("heavy volume", _STRONG), ("large volume", _STRONG), ("inflow", _STRONG),
+        ("large", _WEAK), ("big", _WEAK), ("heavy", _WEAK), ("incoming", _WEAK),
+        ("receiving", _WEAK), ("received", _WEAK), ("volume", _WEAK),
+    ),
+    "HIGH_RISK_JURISDICTION": (
+        ("jurisdiction", _STRONG), ("country", _STRONG), ("region", _STRONG), ("offshore", _WEAK),
+    ),
+    "STRUCTURING_NEAR_THRESHOLD": (
+        ("structuring", _STRONG), ("smurfing", _STRONG), ("below threshold", _STRONG),
+        ("near threshold", _STRONG), ("under threshold", _STRONG), ("just below", _STRONG),
+        ("threshold", _WEAK),
+    ),
+    "CIRCULAR_FLOW": (
+        ("circular", _STRONG), ("round trip", _STRONG), ("layering", _STRONG), ("cycle", _STRONG),
+        ("loop", _WEAK), ("roundtrip", _STRONG),
+    ),
+    "TOP_CLUSTERS": (
+        ("cluster", _STRONG), ("ring", _STRONG), ("group", _WEAK), ("network", _WEAK),
+    ),
+}
+
+_INTERPRETATIONS = {
+    "SHOW_HIGH_RISK": "Showing entities with risk at or above {min_risk:.0%}",
+    "LARGE_INCOMING": "Showing entities receiving at least ${min_amount:,.0f}",
+    "HIGH_RISK_JURISDICTION": "Showing risky entities in jurisdiction {jurisdiction}",
+    "STRUCTURING_NEAR_THRESHOLD": "Showing entities with transactions just below the $10,000 reporting threshold",
+    "CIRCULAR_FLOW": "Showing entities involved in circular transaction flows",
+    "TOP_CLUSTERS": "Showing the top {limit} risk clusters",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9$][a-z0-9$.,%]*")
+# Number with an optional unit; the lookahead keeps "3 months" from reading as 3M
+_NUMBER = r"(\d+(?:[.,]\d+)*)\s*(%|k|mm|m|thousand|million)?(?![a-z])"
+_RISK_RE = re.compile(r"(?:risk|score)\D{0,20}?" + _NUMBER)
+_AMOUNT_RE = re.compile(r"(\$)?\s*" + _NUMBER)
+_JURISDICTION_RE = re.compile(r"(?:jurisdiction|region|bucket|zone)\s*(?:#|no\.?|number)?\s*(\d+)")
+_LIMIT_RE = re.compile(r"(?:top|first|largest|biggest|worst)\s+(\d+)|(\d+)\s+(?:cluster|ring|group)")
+
+
+# "not involved in cycles" names an intent it excludes; such queries go to the LLM.
+# "no." before a number is an abbreviation ("jurisdiction no. 3"), not a negation.
+_NEGATION_RE = re.compile(r"\b(?:not|non|without|excluding|except|never|none)\b|\bno\b(?!\.?\s*\d)|n't\b")
+
+# An explicit parameter ("risk above 80%", "jurisdiction 3") supports its intent
+_PARAM_HINTS = {
+    "SHOW_HIGH_RISK": _RISK_RE,
+    "HIGH_RISK_JURISDICTION": _JURISDICTION_RE,
+}
+
+
+def _stem(token: str) -> str:
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def _tokens(text: str) -> list[str]:
+    return [_stem(t.strip(".,")) for t in _TOKEN_RE.findall(text.replace("-", " "))]
+
+
+# Terms are stemmed like the query tokens they are compared with
+_TERMS = {
+    intent: tuple((" ".join(_stem(word) for word in term.split()), weight) for term, weight in terms)
+    for intent, terms in _INTENT_TERMS.items()
+}
+_FUZZY_VOCAB = sorted({
+    term for terms in _TERMS.values() for term, _ in terms if " " not in term and len(term) >= 5
+})
+_FUZZY_TERMS = frozenset(_FUZZY_VOCAB)
+
+
+def _score_terms(tokens: list[str], terms: tuple[tuple[str, float], ...]) -> float:
+    joined = f" {' '.join(tokens)} "
+    token_set = set(tokens)
+    score = 0.0
+    for term, weight in terms:
+        if " " in term:
+            if f" {term} " in joined:
+                score += weight
+        elif term in token_set:
+            score += weight
+        elif term in _FUZZY_TERMS and any(_fuzzy_hit(t, term) for t in token_set):
+            score += weight * _FUZZY_SHARE
+    return score
+
+
+@lru_cache(maxsize=1024)
+def _closest_term(token: str) -> Optional[str]:
+    if len(token) < 5:
+        return None
+    match = difflib.get_close_matches(token, _FUZZY_VOCAB, n=1, cutoff=_FUZZY_CUTOFF)
+    return match[0] if match else None
+
+
+def _fuzzy_hit(token: str, term: str) -> bool:
+    return token != term and _closest_term(token) == term
+
+
+def _parse_number(value: str, unit: Optional[str]) -> float:
+    number = float(value.replace(",", ""))
+    if unit in {"k", "thousand"}:
+        number *= 1_000
+    elif unit in {"m", "mm", "million"}:
+        number *= 1_000_000
+    return number
+
+
+def _extract_params(intent: str, text: str) -> tuple[dict, bool]:
+    """Params for ``intent`` from ``text``, and whether the required ones were found."""
+    if intent == "SHOW_HIGH_RISK":
+        m = _RISK_RE.search(text)
+        min_risk = 0.6
+        if m and m.group(2) in {None, "%"}:
+            value = _parse_number(m.group(1), None)
+            min_risk = value / 100 if m.group(2) == "%" or value > 1 else value
+        elif re.search(r"\b(?:very high|critical|extreme(?:ly)?)\b", text):
+            min_risk = 0.8
+        return {"min_risk": round(min(max(min_risk, 0.0), 1.0), 4)}, True
+    if intent == "LARGE_INCOMING":
+        amounts = []
+        for m in _AMOUNT_RE.finditer(text):
+            dollar, value, unit = m.groups()
+            if unit == "%":
+                continue
+            amount = _parse_number(value, unit)
+            # Small bare numbers are counts or bucket indices, not amounts
+            if dollar or unit or amount >= 1000:
+                amounts.append(amount)
+        return {"min_amount": max(amounts) if amounts else 50000.0}, True
+    if intent == "HIGH_RISK_JURISDICTION":
+        m = _JURISDICTION_RE.search(text)
+        if m and 0 <= int(m.group(1)) <= 7:
+            return {"jurisdiction": int(m.group(1))}, True
+        # Country and region names need the LLM's mapping
+        return {}, False
+    if intent == "TOP_CLUSTERS":
+        m = _LIMIT_RE.search(text)
+        limit = int(m.group(1) or m.group(2)) if m else 5
+        return {"limit": max(1, min(limit, 50))}, True
+    return {}, True
+
+
+@lru_cache(maxsize=512)
+def _parse_local_cached(text: str) -> tuple[str, tuple[tuple[str, Any], ...], str, float]:
+    tokens = _tokens(text)
+    scores = {intent: _score_terms(tokens, terms) for intent, terms in _TERMS.items()}
+    for intent, pattern in _PARAM_HINTS.items():
+        if pattern.search(text):
+            scores[intent] += _WEAK
+    specific = sorted(
+        ((score, intent) for intent, score in scores.items() if intent != _GENERIC_INTENT),
+        reverse=True,
+    )
+    if specific[0][0] > 0:
+        best, intent = specific[0]
+        rival = specific[1][0]
+    else:
+        best, intent = scores[_GENERIC_INTENT], _GENERIC_INTENT
+        rival = 0.0
+
+    if best <= 0:
+        confidence = 0.0
+    else:
+        # Margin over the runner-up, scaled down when evidence is only weak terms
+        confidence = (best - rival) / best * min(1.0, best / _STRONG)
+
+    params, complete = _extract_params(intent, text)
+    if not complete:
+        confidence *= 0.5
+    if _NEGATION_RE.search(text):
+        confidence = min(confidence, LOCAL_MIN_CONFIDENCE * 0.5)
+    interpretation = _INTERPRETATIONS[intent].format(**params) if complete else "Showing risky entities by jurisdiction"
+    return intent, tuple(params.items()), interpretation, round(confidence, 3)
+
+
+def parse_query_local(query: str) -> dict:
+    """Rule-based intent parse with a confidence in [0, 1]; never calls the LLM."""
+    intent, params, interpretation, confidence = _parse_local_cached(" ".join(query.lower().split()))
+    return {
+        "intent": intent,
+        "params": dict(params),
+        "interpretation": interpretation,
+        "parser": "rules",
+        "confidence": confidence,
+    }
+
+
+def parse_query(query: str, priority: Priority = Priority.INTERACTIVE) -> dict:
+    """Parse a natural language query into a structured intent.
+
+    Confident rule-based matches are answered locally, then close
+    rephrasings of earlier LLM-parsed queries are answered from the
+    semantic cache; anything else goes to the LLM. ``parser`` in the
+    result says which one answered.
+    """
+    answered = _parse_without_llm(query)
+    if answered is not None:
+        return answered
+    raw = _call_llm(query, system_prompt=NLQ_SYSTEM_PROMPT, max_tokens=200, priority=priority)
+    return _parse_llm_output(query, raw)
+
+
+async def aparse_query(query: str, priority: Priority = Priority.INTERACTIVE) -> dict:
+    """Async ``parse_query``: waits on the LLM without holding a thread."""
+    answered = _parse_without_llm(query)
+    if answered is not None:
+        return answered
+    raw = await call_llm(query, system_prompt=NLQ_SYSTEM_PROMPT, max_tokens=200, priority=priority)
+    return _parse_llm_output(query, raw)
+
+
+def _parse_without_llm(query: str) -> Optional[dict]:
+    local = parse_query_local(query)
+    if local["confidence"] >= LOCAL_MIN_CONFIDENCE:
+        return local
+    hit = semantic_cache.lookup(query)
+    if hit is None:
+        return None
+    result, similarity, cached_query = hit
+    result["parser"] = "semantic"
+    result["confidence"] = round(similarity, 3)
+    result["matched_query"] = cached_query
+    return result
+
+
+def _parse_llm_output(query: str, raw: str) -> dict:
+    result = _validate_llm_output(raw)
+    if result is None:
+        result = {
+            "intent": "SHOW_HIGH_RISK",
+            "params": {"min_risk": 0.6},
+            "interpretation": "Showing high-risk entities (query could not be parsed precisely)",
+        }
+    elif result.get("intent") not in INTENTS:
+        result["intent"] = "SHOW_HIGH_RISK"
+        result.setdefault("params", {"min_risk": 0.6})
+        result["interpretation"] = result.get(
+            "interpretation",
+            "Showing high-risk entities (unknown intent)",
+        )
+    else:
+        # Only real parses are reused; the fallbacks above would stick otherwise
+        semantic_cache.add(query, result)
+    result["parser"] = "llm"
+    result["confidence"] = None
+    return result
+
 
+def _validate_llm_output(raw: str) -> Optional[dict]:
     # Strip markdown fences if present
     text = raw.strip()
     if text.startswith("```"):
@@ -68,20 +346,7 @@ def parse_query(query: str) -> dict:
         result = json.loads(text)
     except json.JSONDecodeError:
         log.warning(f"NLQ parse failed, raw LLM output: {raw}")
-        return {
-            "intent": "SHOW_HIGH_RISK",
-            "params": {"min_risk": 0.6},
-            "interpretation": "Showing high-risk entities (query could not be parsed precisely)",
-        }
-
-    # Validate intent
-    if result.get("intent") not in INTENTS:
-        result["intent"] = "SHOW_HIGH_RISK"
-        result.setdefault("params", {"min_risk": 0.6})
-        result["interpretation"] = result.get(
-            "interpretation",
-            "Showing high-risk entities (unknown intent)",
-        )
+        return None
 
     return result
 
@@ -127,18 +392,16 @@ def _handle_high_risk(params: dict, bucket: int) -> dict:
 
 def _handle_large_incoming(params: dict, bucket: int) -> dict:
     min_amount = float(params.get("min_amount", 50000))
-    bucket_tx = store.get_bucket_transactions(bucket)
+    cols = store.get_bucket_columns(bucket)
 
-    # Compute incoming volume per entity
-    incoming: dict[str, float] = {}
-    for tx in bucket_tx:
-        incoming[tx["to_id"]] = incoming.get(tx["to_id"], 0.0) + tx["amount"]
+    # Compute incoming volume per entity code
+    n_codes = len(store.ids)
+    incoming = np.bincount(cols.to_code, weights=cols.amount, minlength=n_codes)
+    receivers = np.bincount(cols.to_code, minlength=n_codes) > 0
 
-    matched = [
-        eid for eid, vol in incoming.items()
-        if vol >= min_amount
-    ]
-    matched.sort(key=lambda eid: incoming.get(eid, 0), reverse=True)
+    matched_codes = np.flatnonzero(receivers & (incoming >= min_amount))
+    matched_codes = matched_codes[np.argsort(-incoming[matched_codes], kind="stable")]
+    matched = store.ids.lookup(matched_codes)
 
     edges = _edges_involving(matched, bucket)
 
@@ -223,9 +486,7 @@ def _handle_circular_flow(params: dict, bucket: int) -> dict:
 
 def _handle_top_clusters(params: dict, bucket: int) -> dict:
     limit = int(params.get("limit", 5))
-    risk_data = store.risk_by_bucket.get(bucket, {})
-    bucket_tx = store.get_bucket_transactions(bucket)
-    clusters = detect_clusters(risk_data, bucket_tx, threshold=0.3)
+    clusters = store.get_clusters(bucket, threshold=0.3)
 
     # Sort by risk_score descending
     clusters.sort(key=lambda c: c["risk_score"], reverse=True)
@@ -251,32 +512,27 @@ def _handle_top_clusters(params: dict, bucket: int) -> dict:
 
 def _edges_between(entity_ids: list[str], bucket: int) -> list[dict]:
     """Get edges where both endpoints are in entity_ids."""
-    id_set = set(entity_ids)
-    bucket_tx = store.get_bucket_transactions(bucket)
-    edges = []
-    seen: set[tuple[str, str]] = set()
-    for tx in bucket_tx:
-        if tx["from_id"] in id_set and tx["to_id"] in id_set and tx["from_id"] != tx["to_id"]:
-            key = (tx["from_id"], tx["to_id"])
-            if key not in seen:
-                seen.add(key)
-                edges.append({"from_id": tx["from_id"], "to_id": tx["to_id"], "amount": tx["amount"]})
-    return edges[:200]
+    cols = store.get_bucket_columns(bucket)
+    codes = store.ids.codes(entity_ids)
+    mask = cols.non_self() & np.isin(cols.from_code, codes) & np.isin(cols.to_code, codes)
+    return _first_edges(cols, mask)
 
 
 def _edges_involving(entity_ids: list[str], bucket: int) -> list[dict]:
     """Get edges where at least one endpoint is in entity_ids."""
-    id_set = set(entity_ids)
-    bucket_tx = store.get_bucket_transactions(bucket)
-    edges = []
-    seen: set[tuple[str, str]] = set()
-    for tx in bucket_tx:
-        if (tx["from_id"] in id_set or tx["to_id"] in id_set) and tx["from_id"] != tx["to_id"]:
-            key = (tx["from_id"], tx["to_id"])
-            if key not in seen:
-                seen.add(key)
-                edges.append({"from_id": tx["from_id"], "to_id": tx["to_id"], "amount": tx["amount"]})
-    return edges[:200]
+    cols = store.get_bucket_columns(bucket)
+    codes = store.ids.codes(entity_ids)
+    mask = cols.non_self() & (np.isin(cols.from_code, codes) | np.isin(cols.to_code, codes))
+    return _first_edges(cols, mask)
+
+
+def _first_edges(cols, mask: np.ndarray, limit: int = 200) -> list[dict]:
+    """First transaction per (from, to) pair among the masked rows."""
+    ids = store.ids
+    return [
+        {"from_id": ids[f], "to_id": ids[t], "amount": amount}
+        for f, t, amount in cols.first_pairs(mask, limit)
+    ]
 
 
 _HANDLERS = {
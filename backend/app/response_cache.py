@@ -0,0 +1,174 @@
+"""Conditional GETs and a bounded cache of serialized responses.
+
+Bucket-scoped read endpoints (``/snapshot``, ``/clusters``, ``/dashboard``,
+``/autopilot/targets``, ``/entity/{id}``) describe what their response
+depends on with a ``Scope``: a set of buckets (or every bucket) and,
+optionally, the entity table. The strong ETag combines the dataset
+generation, the bucket count, the latest revision of that scope (see
+``Dataset.version_of``) and a hash of the request URL and media type.
+
+A request whose ``If-None-Match`` matches gets a 304. Otherwise the
+serialized body is served from ``ResponseCache`` when its tag is still
+current, and rendered and stored when it is not. Appending to a bucket
+only changes the tags of responses scoped to that bucket, so everything
+else stays cached.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+if TYPE_CHECKING:
+    from .data_loader import Dataset
+
+log = logging.getLogger(__name__)
+
+RESPONSE_CACHE_BYTES = max(0, int(os.getenv("ANGELA_RESPONSE_CACHE_MB", "64"))) * 1024 * 1024
+
+JSON_MEDIA_TYPE = "application/json"
+
+
+@dataclass(frozen=True)
+class Scope:
+    """What a response depends on: ``buckets`` (None = all) and maybe the entity table."""
+
+    buckets: Optional[tuple[int, ...]]
+    entities: bool = False
+
+    def version(self, dataset: "Dataset") -> str:
+        return f"{dataset.generation}.{dataset.n_buckets}.{dataset.version_of(self.buckets, self.entities)}"
+
+
+@dataclass
+class CachedResponse:
+    etag: str
+    body: bytes
+    media_type: str
+    scope: Scope
+    version: str
+
+    @property
+    def size(self) -> int:
+        return len(self.body)
+
+
+class ResponseCache:
+    """LRU of serialized responses bounded by total body size."""
+
+    def __init__(self, max_bytes: int = RESPONSE_CACHE_BYTES) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def get(self, key: str, etag: str) -> Optional[CachedResponse]:
+        """Entry for ``key`` if it was stored under ``etag``."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.etag != etag:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: CachedResponse) -> None:
+        with self._lock:
+            self._pop(key)
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while self._bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self._bytes -= oldest.size
+
+    def prune(self, dataset: "Dataset") -> int:
+        """Drop entries whose scope changed in ``dataset`` (or another generation)."""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry.version != entry.scope.version(dataset)]
+            for key in stale:
+                self._pop(key)
+        if stale:
+            log.debug(f"Response cache: dropped {len(stale)} stale entries")
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "not_modified": self.not_modified,
+            }
+
+    def _pop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+
+response_cache = ResponseCache()
+
+
+def json_body(value: Any) -> bytes:
+    """Serialize ``value`` exactly as a FastAPI JSON response would."""
+    return JSONResponse(jsonable_encoder(value)).body
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an ``If-None-Match`` header covers ``etag``."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def cached_response(
+    request: Request,
+    dataset: "Dataset",
+    scope: Scope,
+    render: Callable[[], bytes],
+    media_type: str = JSON_MEDIA_TYPE,
+    headers: Optional[dict[str, str]] = None,
+    cache: ResponseCache = response_cache,
+) -> Response:
+    """Answer a GET with a 304, a cached body or a freshly rendered one."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+    key = f"{request.url.path}?{query}|{media_type}"
+    version = scope.version(dataset)
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+    etag = f'"{version}-{digest}"'
+    # Clients may store the body but must revalidate before reusing it
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache"}
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+
+    entry = cache.get(key, etag)
+    if entry is None:
+        entry = CachedResponse(etag=etag, body=render(), media_type=media_type, scope=scope, version=version)
+        cache.put(key, entry)
+    return Response(content=entry.body, media_type=entry.media_type, headers=headers)
@@ -0,0 +1,185 @@
+"""On-disk cache of per-bucket risk tables.
+
+Entries are keyed by a content hash of the bucket's transactions (plus the
+bucket size) and live under a directory named after ``detector_fingerprint()``,
+so reloading unchanged data reuses the stored tables and only buckets whose
+transactions changed are rescored. Changing detector weights or thresholds
+moves to a fresh directory.
+
+``prune()`` (run once at app startup, see ``main.lifespan``) deletes the
+directories of other fingerprints, then the least recently used tables once
+the current directory exceeds ``ANGELA_RISK_CACHE_MB``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Mapping, Optional
+
+import numpy as np
+
+from ..columnar import TransactionTable
+from ..config import CACHE_DIR
+from .parallel import ProgressCallback, score_buckets_parallel
+from .scoring import compute_risk_for_bucket, detector_fingerprint
+
+log = logging.getLogger(__name__)
+
+_EMPTY_ROWS = np.empty(0, dtype=np.int64)
+
+RISK_CACHE_BYTES = max(1, int(os.getenv("ANGELA_RISK_CACHE_MB", "1024"))) * 1024 * 1024
+
+# Directory names written by detector_fingerprint(); nothing else is pruned
+_FINGERPRINT_RE = re.compile(r"[0-9a-f]{16}")
+
+
+def bucket_content_hash(table: TransactionTable, rows: np.ndarray, bucket_size: int) -> str:
+    """Hash everything the detectors read from a bucket's transactions.
+
+    Entity codes are remapped to bucket-local codes and hashed together with
+    the IDs they stand for, so the hash does not depend on global interning
+    order.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    from_code = table.from_code[rows]
+    to_code = table.to_code[rows]
+    unique, local = np.unique(np.concatenate([from_code, to_code]), return_inverse=True)
+
+    h = hashlib.sha256()
+    h.update(f"{bucket_size}:{len(rows)}".encode("utf-8"))
+    h.update(local.astype(np.int32).tobytes())
+    h.update(np.ascontiguousarray(table.amount[rows], dtype=np.float64).tobytes())
+    h.update(np.ascontiguousarray(table.timestamp[rows], dtype=np.int64).tobytes())
+    h.update("\x00".join(table.ids.lookup(unique)).encode("utf-8"))
+    h.update(b"\x01")
+    h.update("\x00".join(table.tx_ids(rows)).encode("utf-8"))
+    return h.hexdigest()
+
+
+class RiskCache:
+    """Directory of JSON risk tables, one file per bucket content hash."""
+
+    def __init__(self, directory: Path, fingerprint: Optional[str] = None, max_bytes: int = RISK_CACHE_BYTES) -> None:
+        self.root = Path(directory)
+        self.directory = self.root / (fingerprint or detector_fingerprint())
+        self.max_bytes = max_bytes
+
+    @classmethod
+    def from_env(cls) -> Optional["RiskCache"]:
+        """Cache under ``ANGELA_CACHE_DIR``; ``ANGELA_RISK_CACHE=0`` disables it."""
+        if os.getenv("ANGELA_RISK_CACHE", "1").strip().lower() in {"0", "false", "off"}:
+            return None
+        return cls(CACHE_DIR / "risk")
+
+    def prune(self) -> None:
+        """Drop other fingerprints' tables, then the least recently used past ``max_bytes``."""
+        try:
+            for child in self.root.iterdir():
+                if child != self.directory and child.is_dir() and _FINGERPRINT_RE.fullmatch(child.name):
+                    shutil.rmtree(child, ignore_errors=True)
+                    log.info(f"Removed risk cache of detector fingerprint {child.name}")
+            entries = []
+            for path in self.directory.glob("*.json"):
+                stat = path.stat()
+                entries.append((stat.st_mtime, stat.st_size, path))
+        except FileNotFoundError:
+            return
+        except OSError as exc:
+            log.warning(f"Could not prune risk cache: {exc}")
+            return
+
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            log.info(f"Risk cache: evicted {removed} least recently used tables")
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict[str, dict]]:
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as exc:
+            log.warning(f"Ignoring unreadable risk cache entry {key}: {exc}")
+            return None
+        if entry.get("key") != key:
+            return None
+        try:
+            # mtime doubles as last use for prune()
+            os.utime(self._path(key))
+        except OSError:
+            pass
+        return entry["risk"]
+
+    def put(self, key: str, risk: dict[str, dict]) -> None:
+        path = self._path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"key": key, "risk": risk}, f, separators=(",", ":"))
+            os.replace(tmp, path)
+        except OSError as exc:
+            log.warning(f"Could not write risk cache entry {key}: {exc}")
+            tmp.unlink(missing_ok=True)
+
+
+def compute_risk_tables(
+    table: TransactionTable,
+    bucket_index: Mapping[str, np.ndarray],
+    n_buckets: int,
+    bucket_size: int,
+    cache: Optional[RiskCache] = None,
+    workers: int = 1,
+    progress: Optional[ProgressCallback] = None,
+) -> dict[int, dict[str, dict]]:
+    """Risk tables for every bucket, reusing cached ones where content matches.
+
+    Stale buckets are scored on a process pool when ``workers`` > 1.
+    """
+    risk_by_bucket: dict[int, dict[str, dict]] = {}
+    pending: dict[int, np.ndarray] = {}
+    keys: dict[int, str] = {}
+    for b in range(n_buckets):
+        rows = bucket_index.get(str(b), _EMPTY_ROWS)
+        if cache is not None:
+            keys[b] = bucket_content_hash(table, rows, bucket_size)
+            cached = cache.get(keys[b])
+            if cached is not None:
+                risk_by_bucket[b] = cached
+                continue
+        pending[b] = rows
+
+    if cache is not None:
+        log.info(f"Risk cache: reused {n_buckets - len(pending)}/{n_buckets} buckets, recomputing {len(pending)}")
+
+    if workers > 1 and len(pending) > 1:
+        computed = score_buckets_parallel(table, pending, bucket_size, workers, progress=progress)
+    else:
+        computed = {}
+        for done, (b, rows) in enumerate(pending.items(), start=1):
+            computed[b] = compute_risk_for_bucket(table.rows(rows), bucket_size)
+            if progress is not None:
+                progress(done, len(pending))
+
+    for b, risk in computed.items():
+        risk_by_bucket[b] = risk
+        if cache is not None:
+            cache.put(keys[b], risk)
+
+    return {b: risk_by_bucket[b] for b in range(n_buckets)}
@@ -1,6 +1,8 @@
 """Risk detectors: velocity, structuring, circular flow."""
 
-from collections import defaultdict
+import numpy as np
+
+from .cycles import CSRGraph, CycleStats, find_short_cycles
 
 
 def velocity_detector(features: dict, all_features: dict[str, dict]) -> dict:
@@ -9,35 +11,59 @@ def velocity_detector(features: dict, all_features: dict[str, dict]) -> dict:
     Compares entity's tx count to population stats.
     Returns score in [0, 1] and evidence.
     """
-    total_tx = features["total_tx"]
-    tx_per_min = features["tx_per_minute"]
+    if not all_features:
+        return {"score": 0.0, "detail": "", "evidence": {}}
 
     # Compute population stats
-    all_totals = [f["total_tx"] for f in all_features.values()]
-    if not all_totals:
-        return {"score": 0.0, "detail": "", "evidence": {}}
+    all_totals = np.fromiter((f["total_tx"] for f in all_features.values()), dtype=np.int64, count=len(all_features))
+    p50, p95 = velocity_percentiles(np.sort(all_totals))
+    score = velocity_score_array([features["total_tx"]], p50, p95).tolist()[0]
+    return velocity_result(score, features["total_tx"], features["tx_per_minute"], p50, p95)
 
-    all_totals.sort()
-    p50 = all_totals[len(all_totals) // 2]
-    p95 = all_totals[int(len(all_totals) * 0.95)]
 
+def velocity_percentiles(ordered_totals: np.ndarray) -> tuple[int, int]:
+    """(p50, p95) of the sorted population ``total_tx`` values."""
+    return int(ordered_totals[len(ordered_totals) // 2]), int(ordered_totals[int(len(ordered_totals) * 0.95)])
+
+
+def velocity_score_array(totals: np.ndarray, p50: int, p95: int) -> np.ndarray:
+    """Velocity score for each ``total_tx`` in ``totals`` given population stats."""
     if p95 <= p50:
-        score = 0.0
-    else:
-        # Normalize: 0 at median, 1 at 2x the 95th percentile
-        score = max(0.0, min(1.0, (total_tx - p50) / max(p95 - p50, 1)))
+        return np.zeros(len(totals), dtype=np.float64)
+    return np.clip((np.asarray(totals, dtype=np.int64) - p50) / max(p95 - p50, 1), 0.0, 1.0)
+
 
+def velocity_result(score: float, total_tx: int, tx_per_minute: float, p50: int, p95: int) -> dict:
+    """Velocity score/detail/evidence for one entity; shared by every velocity path."""
     evidence = {
         "tx_count": total_tx,
-        "tx_per_minute": tx_per_min,
+        "tx_per_minute": tx_per_minute,
         "population_median": p50,
         "population_p95": p95,
     }
-
     detail = f"{total_tx} tx in bucket (p50={p50}, p95={p95})"
     return {"score": score, "detail": detail, "evidence": evidence}
 
 
+def velocity_scores(all_features: dict[str, dict]) -> dict[str, dict]:
+    """Bucket-level ``velocity_detector``: same output for every entity.
+
+    Sorts the population once and scores all entities in one NumPy pass
+    instead of re-sorting the population per entity.
+    """
+    if not all_features:
+        return {}
+
+    totals = np.fromiter((f["total_tx"] for f in all_features.values()), dtype=np.int64, count=len(all_features))
+    p50, p95 = velocity_percentiles(np.sort(totals))
+    scores = velocity_score_array(totals, p50, p95)
+
+    return {
+        entity_id: velocity_result(score, features["total_tx"], features["tx_per_minute"], p50, p95)
+        for (entity_id, features), score in zip(all_features.items(), scores.tolist())
+    }
+
+
 STRUCTURING_THRESHOLD = 10000.0
 STRUCTURING_DELTA = 1000.0
 
@@ -54,7 +80,12 @@ def structuring_detector(features: dict) -> dict:
 
     lower = STRUCTURING_THRESHOLD - STRUCTURING_DELTA
     near_threshold = [a for a in amounts if lower <= a < STRUCTURING_THRESHOLD]
-    count = len(near_threshold)
+    return structuring_result(len(near_threshold))
+
+
+def structuring_result(count: int) -> dict:
+    """Structuring score/evidence from the number of near-threshold amounts."""
+    lower = STRUCTURING_THRESHOLD - STRUCTURING_DELTA
 
     # Score: 0 for 0-1 hits, ramps to 1.0 at 5+ hits
     score = max(0.0, min(1.0, (count - 1) / 4)) if count > 0 else 0.0
@@ -69,64 +100,55 @@ def structuring_detector(features: dict) -> dict:
     return {"score": score, "detail": detail, "evidence": evidence}
 
 
-def circular_flow_detector(
-    entity_id: str,
+def circular_flow_scores(
     transactions: list[dict],
     max_depth: int = 4,
     max_visits: int = 500,
-) -> dict:
-    """Detect short cycles (potential layering loops) via depth-limited DFS.
+) -> dict[str, dict]:
+    """Detect short cycles (potential layering loops) for a whole bucket.
 
-    Returns score in [0, 1] and evidence.
+    Builds the bucket adjacency once and finds every cycle in a single
+    pass (see ``risk.cycles``). Returns entity_id -> score/detail/evidence
+    for entities on at least one cycle; all others score 0.
     """
-    # Build adjacency for this bucket's transactions
-    adj: dict[str, set[str]] = defaultdict(set)
-    for tx in transactions:
-        if tx["from_id"] != tx["to_id"]:
-            adj[tx["from_id"]].add(tx["to_id"])
-
-    cycles_found: list[list[str]] = []
-    visits = 0
-
-    def dfs(current: str, path: list[str], depth: int) -> None:
-        nonlocal visits
-        if visits >= max_visits:
-            return
-
-        for neighbor in adj.get(current, set()):
-            visits += 1
-            if visits >= max_visits:
-                return
-
-            if neighbor == entity_id and depth >= 2:
-                # Found a cycle back to start
-                cycles_found.append(path + [neighbor])
-                continue
-
-            if neighbor not in path and depth < max_depth:
-                dfs(neighbor, path + [neighbor], depth + 1)
-
-    dfs(entity_id, [entity_id], 1)
-
-    if not cycles_found:
-        return {"score": 0.0, "detail": "", "evidence": {}}
-
+    codes: dict[str, int] = {}
+    src = np.fromiter((codes.setdefault(tx["from_id"], len(codes)) for tx in transactions), dtype=np.int64, count=len(transactions))
+    dst = np.fromiter((codes.setdefault(tx["to_id"], len(codes)) for tx in transactions), dtype=np.int64, count=len(transactions))
+    if not codes:
+        return {}
+    ids = list(codes)
+
+    graph = CSRGraph.from_edges(src, dst, len(ids))
+    results: dict[str, dict] = {}
+    for code, stats in find_short_cycles(graph, max_depth=max_depth, max_visits=max_visits).items():
+        results[ids[code]] = circular_result(stats, [ids[c] for c in stats.counterparties])
+    return results
+
+
+def circular_result(stats: CycleStats, counterparties: list[str]) -> dict:
+    """Circular flow score/evidence from one entity's cycle stats."""
+    shortest = stats.shortest
     # Shorter cycles are more suspicious
-    shortest = min(len(c) for c in cycles_found)
     # Score: length 3 cycle = 1.0, length 4 = 0.7, length 5 = 0.4
     score = max(0.0, min(1.0, 1.0 - (shortest - 3) * 0.3))
-
-    # Collect unique counterparties in cycles
-    cycle_entities: set[str] = set()
-    for c in cycles_found:
-        cycle_entities.update(c)
-    cycle_entities.discard(entity_id)
-
     evidence = {
-        "cycle_count": len(cycles_found),
+        "cycle_count": stats.cycle_count,
         "shortest_cycle_length": shortest,
-        "counterparties": sorted(cycle_entities)[:10],
+        "counterparties": sorted(counterparties)[:10],
     }
-
-    detail = f"cycle of length {shortest} detected ({len(cycles_found)} total)"
+    detail = f"cycle of length {shortest} detected ({stats.cycle_count} total)"
     return {"score": score, "detail": detail, "evidence": evidence}
+
+
+def circular_flow_detector(
+    entity_id: str,
+    transactions: list[dict],
+    max_depth: int = 4,
+    max_visits: int = 500,
+) -> dict:
+    """Short cycles through one entity; prefer ``circular_flow_scores`` per bucket.
+
+    Returns score in [0, 1] and evidence.
+    """
+    scores = circular_flow_scores(transactions, max_depth=max_depth, max_visits=max_visits)
+    return scores.get(entity_id, {"score": 0.0, "detail": "", "evidence": {}})
@@ -0,0 +1,308 @@
+"""Incremental risk rescoring for transactions appended to a bucket.
+
+``BucketRiskState`` keeps the per-entity accumulators the detectors read
+(in/out counts, outgoing timestamp range, near-threshold hits), a histogram
+of ``total_tx`` for the velocity percentiles, the bucket adjacency and the
+short-cycle stats. Appending rows updates those in place and reports which
+entities need re-evaluating: the rows' endpoints, members of newly closed
+cycles and, when p50/p95 shift, entities whose velocity output depends on
+them.
+
+Velocity and structuring results match a full rescore of the bucket
+exactly, and so does everything while the cycle search stays within its
+``max_visits`` budget. On dense buckets it does not: full scoring spends
+the budget per start node over the whole bucket, while appended edges get
+a fresh budget each, so the two can find different sets of cycles and the
+``circular_flow`` evidence (and with it ``risk_score``) drifts for members
+of those cycles. A full rescore, i.e. the next dataset load, corrects it;
+the state itself starts from the same cycles as full scoring.
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+from ..columnar import BucketColumns, IdTable
+from .cycles import CSRGraph, CycleStats, find_short_cycles
+from .detectors import (
+    STRUCTURING_DELTA,
+    STRUCTURING_THRESHOLD,
+    circular_result,
+    structuring_result,
+    velocity_result,
+    velocity_score_array,
+)
+from .scoring import fuse_signals
+
+_NEAR_LOWER = STRUCTURING_THRESHOLD - STRUCTURING_DELTA
+_NO_SIGNAL = {"score": 0.0, "detail": "", "evidence": {}}
+
+
+def _grown(array: np.ndarray, size: int, fill: int = 0) -> np.ndarray:
+    if size <= len(array):
+        return array
+    grown = np.full(max(size, 2 * len(array)), fill, dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
+
+
+def _short_cycles(src: np.ndarray, dst: np.ndarray, n: int, max_depth: int, max_visits: int) -> dict[int, CycleStats]:
+    """``find_short_cycles`` numbered like ``circular_flow_scores``, keyed by local index.
+
+    Full scoring numbers senders first, then receivers; which cycles fit
+    in the visit budget depends on that order, so it is reproduced here.
+    """
+    order = np.concatenate([src, dst])
+    unique, first = np.unique(order, return_index=True)
+    local_of = unique[np.argsort(first, kind="stable")]  # full index -> local index
+    full_of = np.empty(n, dtype=np.int64)
+    full_of[local_of] = np.arange(n)
+    graph = CSRGraph.from_edges(full_of[src], full_of[dst], n)
+    cycles = find_short_cycles(graph, max_depth=max_depth, max_visits=max_visits)
+    local_list = local_of.tolist()
+    for stats in cycles.values():
+        stats.counterparties = {local_list[c] for c in stats.counterparties}
+    return {local_list[node]: stats for node, stats in cycles.items()}
+
+
+class BucketRiskState:
+    """Detector inputs for one bucket, keyed by bucket-local entity index.
+
+    Local indices follow first appearance in the bucket (sender before
+    receiver), which is also the order of the bucket's risk table.
+    """
+
+    def __init__(self, max_depth: int = 4, max_visits: int = 500) -> None:
+        self.max_depth = max_depth
+        self.max_visits = max_visits
+        self.codes: list[int] = []          # local -> global entity code
+        self.local: dict[int, int] = {}     # global entity code -> local
+        self.out_count = np.zeros(0, dtype=np.int64)
+        self.in_count = np.zeros(0, dtype=np.int64)
+        self.ts_min = np.zeros(0, dtype=np.int64)
+        self.ts_max = np.zeros(0, dtype=np.int64)
+        self.near_count = np.zeros(0, dtype=np.int64)
+        self.near_tx_ids: dict[int, list[str]] = {}
+        # Population histogram of total_tx (entities with total 0 are absent)
+        self.total_hist = np.zeros(1, dtype=np.int64)
+        self.adjacency: dict[int, set[int]] = {}
+        self.cycles: dict[int, CycleStats] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def from_columns(
+        cls,
+        cols: BucketColumns,
+        tx_ids: Sequence[str],
+        max_depth: int = 4,
+        max_visits: int = 500,
+    ) -> "BucketRiskState":
+        """Build the state for a bucket's current transactions in one pass."""
+        state = cls(max_depth=max_depth, max_visits=max_visits)
+        n_rows = len(cols)
+        if not n_rows:
+            return state
+
+        # Local indices in first-appearance order
+        interleaved = np.empty(2 * n_rows, dtype=np.int64)
+        interleaved[0::2] = cols.from_code
+        interleaved[1::2] = cols.to_code
+        unique, first = np.unique(interleaved, return_index=True)
+        order = np.argsort(first, kind="stable")
+        rank = np.empty(len(unique), dtype=np.int64)
+        rank[order] = np.arange(len(unique))
+        src = rank[np.searchsorted(unique, cols.from_code)]
+        dst = rank[np.searchsorted(unique, cols.to_code)]
+        n = len(unique)
+
+        state.codes = unique[order].tolist()
+        state.local = {code: i for i, code in enumerate(state.codes)}
+        state.out_count = np.bincount(src, minlength=n).astype(np.int64)
+        state.in_count = np.bincount(dst, minlength=n).astype(np.int64)
+        state.ts_min = np.full(n, np.iinfo(np.int64).max, dtype=np.int64)
+        state.ts_max = np.full(n, np.iinfo(np.int64).min, dtype=np.int64)
+        np.minimum.at(state.ts_min, src, cols.timestamp)
+        np.maximum.at(state.ts_max, src, cols.timestamp)
+
+        near = (cols.amount >= _NEAR_LOWER) & (cols.amount < STRUCTURING_THRESHOLD)
+        state.near_count = np.bincount(src[near], minlength=n).astype(np.int64)
+        for i in np.flatnonzero(near).tolist():
+            state.near_tx_ids.setdefault(int(src[i]), []).append(tx_ids[i])
+
+        state.total_hist = np.bincount(state.out_count + state.in_count).astype(np.int64)
+        state.total_hist[0] = 0
+
+        graph = CSRGraph.from_edges(src, dst, n)
+        indptr = graph.indptr.tolist()
+        targets = graph.indices.tolist()
+        state.adjacency = {
+            node: set(targets[indptr[node]:indptr[node + 1]])
+            for node in range(n) if indptr[node + 1] > indptr[node]
+        }
+        state.cycles = _short_cycles(src, dst, n, max_depth, max_visits)
+        return state
+
+    # -- Population stats --
+
+    def percentiles(self) -> tuple[int, int]:
+        """Velocity (p50, p95) over the bucket's entities."""
+        cumulative = np.cumsum(self.total_hist)
+        population = int(cumulative[-1])
+        if not population:
+            return 0, 0
+        p50 = int(np.searchsorted(cumulative, population // 2, side="right"))
+        p95 = int(np.searchsorted(cumulative, int(population * 0.95), side="right"))
+        return p50, p95
+
+    def totals(self) -> np.ndarray:
+        n = len(self.codes)
+        return self.out_count[:n] + self.in_count[:n]
+
+    # -- Updates --
+
+    def _intern(self, code: int) -> int:
+        local = self.local.get(code)
+        if local is None:
+            local = len(self.codes)
+            self.codes.append(code)
+            self.local[code] = local
+            size = local + 1
+            self.out_count = _grown(self.out_count, size)
+            self.in_count = _grown(self.in_count, size)
+            self.near_count = _grown(self.near_count, size)
+            self.ts_min = _grown(self.ts_min, size, np.iinfo(np.int64).max)
+            self.ts_max = _grown(self.ts_max, size, np.iinfo(np.int64).min)
+        return local
+
+    def _bump_total(self, local: int, counts: np.ndarray) -> None:
+        old_total = int(self.out_count[local] + self.in_count[local])
+        counts[local] += 1
+        if old_total:
+            self.total_hist[old_total] -= 1
+        self.total_hist = _grown(self.total_hist, old_total + 2)
+        self.total_hist[old_total + 1] += 1
+
+    def apply(
+        self,
+        from_codes: Sequence[int],
+        to_codes: Sequence[int],
+        amounts: Sequence[float],
+        timestamps: Sequence[int],
+        tx_ids: Sequence[str],
+    ) -> list[int]:
+        """Fold appended rows in; return local indices to re-evaluate (ascending)."""
+        p50_before, p95_before = self.percentiles()
+        touched: set[int] = set()
+        new_edges: list[tuple[int, int]] = []
+
+        for f, t, amount, ts, tx_id in zip(from_codes, to_codes, amounts, timestamps, tx_ids):
+            src = self._intern(int(f))
+            dst = self._intern(int(t))
+            touched.update((src, dst))
+
+            self._bump_total(src, self.out_count)
+            self._bump_total(dst, self.in_count)
+            self.ts_min[src] = min(int(self.ts_min[src]), int(ts))
+            self.ts_max[src] = max(int(self.ts_max[src]), int(ts))
+            if _NEAR_LOWER <= amount < STRUCTURING_THRESHOLD:
+                self.near_count[src] += 1
+                self.near_tx_ids.setdefault(src, []).append(tx_id)
+
+            if src != dst:
+                neighbors = self.adjacency.setdefault(src, set())
+                if dst not in neighbors:
+                    neighbors.add(dst)
+                    new_edges.append((src, dst))
+
+        touched.update(self._add_new_cycles(new_edges))
+
+        # When p50/p95 move, velocity output changes for entities whose score
+        # changed and for every entity that reports the stats (score > 0.05)
+        p50, p95 = self.percentiles()
+        if (p50, p95) != (p50_before, p95_before):
+            totals = self.totals()
+            before = velocity_score_array(totals, p50_before, p95_before)
+            after = velocity_score_array(totals, p50, p95)
+            moved = (before != after) | (before > 0.05) | (after > 0.05)
+            touched.update(np.flatnonzero(moved).tolist())
+
+        return sorted(touched)
+
+    def _add_new_cycles(self, new_edges: list[tuple[int, int]]) -> set[int]:
+        """Record cycles closed by ``new_edges``; return their members.
+
+        Every new cycle contains a new edge (u, v), so it is found as a
+        simple path v -> ... -> u of at most ``max_depth - 1`` edges.
+        ``max_visits`` bounds the edges examined per new edge, not per
+        start node as in full scoring; see the module docstring.
+        """
+        found: set[tuple[int, ...]] = set()
+        adjacency = self.adjacency
+        max_depth = self.max_depth
+
+        for u, v in new_edges:
+            path = [u, v]
+            visits = 0
+
+            def walk(current: int) -> None:
+                nonlocal visits
+                for nxt in sorted(adjacency.get(current, ())):
+                    if visits >= self.max_visits:
+                        return
+                    visits += 1
+                    if nxt == u:
+                        # Canonical rotation starts at the smallest node
+                        start = path.index(min(path))
+                        found.add(tuple(path[start:] + path[:start]))
+                    elif nxt not in path and len(path) < max_depth:
+                        path.append(nxt)
+                        walk(nxt)
+                        path.pop()
+
+            walk(v)
+
+        members: set[int] = set()
+        for cycle in found:
+            length = len(cycle) + 1
+            for node in cycle:
+                stats = self.cycles.get(node)
+                if stats is None:
+                    stats = self.cycles[node] = CycleStats(shortest=length)
+                stats.cycle_count += 1
+                stats.shortest = min(stats.shortest, length)
+                stats.counterparties.update(cycle)
+                stats.counterparties.discard(node)
+            members.update(cycle)
+        return members
+
+    # -- Scoring --
+
+    def score(self, locals_: Sequence[int], ids: IdTable) -> dict[str, dict]:
+        """Fused risk entries for ``locals_``, keyed by entity ID."""
+        p50, p95 = self.percentiles()
+        index = np.asarray(locals_, dtype=np.int64)
+        totals = (self.out_count[index] + self.in_count[index]).tolist()
+        velocity = velocity_score_array(np.asarray(totals, dtype=np.int64), p50, p95).tolist()
+
+        results: dict[str, dict] = {}
+        for local, total_tx, vel_score in zip(index.tolist(), totals, velocity):
+            out_count = int(self.out_count[local])
+            if out_count >= 2:
+                span = int(self.ts_max[local]) - int(self.ts_min[local])
+                tx_per_minute = round((out_count / max(span, 1)) * 60, 4)
+            else:
+                tx_per_minute = 0.0
+
+            vel = velocity_result(vel_score, total_tx, tx_per_minute, p50, p95)
+            struct = structuring_result(int(self.near_count[local])) if out_count else _NO_SIGNAL
+            stats = self.cycles.get(local)
+            circ = (
+                circular_result(stats, [ids[self.codes[c]] for c in stats.counterparties])
+                if stats is not None else _NO_SIGNAL
+            )
+            results[ids[self.codes[local]]] = fuse_signals(vel, struct, circ, self.near_tx_ids.get(local, []))
+        return results
@@ -0,0 +1,169 @@
+"""Fan per-bucket risk scoring out across a process pool.
+
+The transaction columns, tx/entity ID strings and the rows of the buckets
+to score are copied once into ``multiprocessing.shared_memory`` segments.
+Workers attach to them in their initializer and rebuild a read-only
+``TransactionTable`` over the shared buffers, so tasks only carry a bucket
+number and return that bucket's risk table.
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Mapping, Optional, Sequence
+
+import numpy as np
+
+from ..columnar import IdTable, StringColumn, TransactionTable
+from .scoring import compute_risk_for_bucket
+
+log = logging.getLogger(__name__)
+
+ProgressCallback = Callable[[int, int], None]
+
+# name -> (segment name, dtype, length)
+_Specs = dict[str, tuple[str, str, int]]
+
+_worker_state: dict = {}
+
+# Not fork: pools are started from upload worker threads of a multithreaded
+# server, and a forked child could inherit locks other threads hold
+# (logging, SQLite, append locks). Workers get all they need through
+# shared memory and initargs, so nothing has to be inherited.
+_MP_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+
+def risk_workers_from_env() -> int:
+    """``ANGELA_RISK_WORKERS``: process count for risk scoring ("auto" = all cores)."""
+    raw = os.getenv("ANGELA_RISK_WORKERS", "1").strip().lower()
+    if raw == "auto":
+        return os.cpu_count() or 1
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        log.warning(f"Invalid ANGELA_RISK_WORKERS={raw!r}; scoring serially")
+        return 1
+
+
+def _share(arrays: Mapping[str, np.ndarray]) -> tuple[list[SharedMemory], _Specs]:
+    segments: list[SharedMemory] = []
+    specs: _Specs = {}
+    try:
+        for name, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            shm = SharedMemory(create=True, size=max(array.nbytes, 1))
+            segments.append(shm)
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+            specs[name] = (shm.name, array.dtype.str, len(array))
+    except Exception:
+        _release(segments)
+        raise
+    return segments, specs
+
+
+def _release(segments: Sequence[SharedMemory]) -> None:
+    for shm in segments:
+        shm.close()
+        shm.unlink()
+
+
+def _attach(specs: _Specs) -> dict[str, np.ndarray]:
+    arrays: dict[str, np.ndarray] = {}
+    segments = []
+    for name, (shm_name, dtype, length) in specs.items():
+        # Pool workers share the parent's resource tracker, which unlinks
+        # the segments only if the parent dies without releasing them
+        shm = SharedMemory(name=shm_name)
+        segments.append(shm)
+        arrays[name] = np.ndarray((length,), dtype=np.dtype(dtype), buffer=shm.buf)
+    _worker_state["segments"] = segments
+    return arrays
+
+
+def _init_worker(specs: _Specs, currencies: list[str], payment_formats: list[str], bucket_size: int) -> None:
+    arrays = _attach(specs)
+    ids = IdTable.from_list(StringColumn(arrays.pop("id_blob"), arrays.pop("id_offsets")).tolist())
+    tx_ids = StringColumn(arrays.pop("tx_id_blob"), arrays.pop("tx_id_offsets"))
+    _worker_state["rows"] = arrays.pop("pending_rows")
+    _worker_state["offsets"] = arrays.pop("pending_offsets")
+    _worker_state["buckets"] = arrays.pop("pending_buckets")
+    _worker_state["table"] = TransactionTable.from_columns(ids, arrays, tx_ids, currencies, payment_formats)
+    _worker_state["bucket_size"] = bucket_size
+
+
+def _score_task(slot: int) -> tuple[int, dict[str, dict]]:
+    state = _worker_state
+    offsets = state["offsets"]
+    rows = state["rows"][offsets[slot]:offsets[slot + 1]]
+    risk = compute_risk_for_bucket(state["table"].rows(rows), state["bucket_size"])
+    return int(state["buckets"][slot]), risk
+
+
+def score_buckets_parallel(
+    table: TransactionTable,
+    bucket_rows: Mapping[int, np.ndarray],
+    bucket_size: int,
+    workers: int,
+    progress: Optional[ProgressCallback] = None,
+) -> dict[int, dict[str, dict]]:
+    """Score ``bucket_rows`` (bucket -> row indices) on ``workers`` processes.
+
+    Results are returned in ascending bucket order regardless of completion
+    order, so the output is identical to a serial run.
+    """
+    buckets = sorted(bucket_rows)
+    if not buckets:
+        return {}
+
+    # Largest buckets first keeps the pool busy until the end
+    slots = sorted(range(len(buckets)), key=lambda i: -len(bucket_rows[buckets[i]]))
+    offsets = np.zeros(len(buckets) + 1, dtype=np.int64)
+    np.cumsum([len(bucket_rows[b]) for b in buckets], out=offsets[1:])
+    tx_ids = StringColumn.pack(table.tx_id(i) for i in range(len(table)))
+    ids = StringColumn.pack(table.ids)
+
+    arrays = dict(table.column_arrays())
+    arrays.update({
+        "tx_id_blob": tx_ids.blob,
+        "tx_id_offsets": tx_ids.offsets,
+        "id_blob": ids.blob,
+        "id_offsets": ids.offsets,
+        "pending_rows": np.concatenate([np.asarray(bucket_rows[b], dtype=np.int64) for b in buckets]),
+        "pending_offsets": offsets,
+        "pending_buckets": np.asarray(buckets, dtype=np.int64),
+    })
+
+    segments, specs = _share(arrays)
+    results: dict[int, dict[str, dict]] = {}
+    try:
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(buckets)),
+            mp_context=_MP_CONTEXT,
+            initializer=_init_worker,
+            initargs=(specs, list(table.currencies), list(table.payment_formats), bucket_size),
+        ) as pool:
+            futures = [pool.submit(_score_task, slot) for slot in slots]
+            step = max(1, len(futures) // 10)
+            try:
+                for done, future in enumerate(as_completed(futures), start=1):
+                    b, risk = future.result()
+                    results[b] = risk
+                    if progress is not None:
+                        progress(done, len(futures))
+                    if done % step == 0 or done == len(futures):
+                        log.info(f"Risk scoring: {done}/{len(futures)} buckets")
+            except BaseException:
+                # A failing task or a progress callback aborting the run:
+                # drop queued buckets instead of scoring them on exit
+                pool.shutdown(wait=True, cancel_futures=True)
+                raise
+    finally:
+        _release(segments)
+
+    return {b: results[b] for b in buckets}
@@ -1,8 +1,16 @@
 """Risk score fusion: combine detector signals into final score + reasons."""
 
+import hashlib
+import json
 import logging
 from .features import extract_features
-from .detectors import velocity_detector, structuring_detector, circular_flow_detector
+from .detectors import (
+    STRUCTURING_DELTA,
+    STRUCTURING_THRESHOLD,
+    circular_flow_scores,
+    structuring_detector,
+    velocity_scores,
+)
 
 log = logging.getLogger(__name__)
 
@@ -11,6 +19,22 @@ W_VELOCITY = 0.4
 W_STRUCTURING = 0.3
 W_CIRCULAR = 0.3
 
+# Bump whenever detector or fusion logic changes in a way the parameters
+# below do not capture; cached risk tables from older versions are ignored.
+DETECTOR_VERSION = 2
+
+
+def detector_fingerprint() -> str:
+    """Stable hash of the detector version, weights and thresholds."""
+    params = {
+        "version": DETECTOR_VERSION,
+        "weights": [W_VELOCITY, W_STRUCTURING, W_CIRCULAR],
+        "structuring": [STRUCTURING_THRESHOLD, STRUCTURING_DELTA],
+        "circular": list(circular_flow_scores.__defaults__ or ()),
+    }
+    encoded = json.dumps(params, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
 
 def compute_risk_for_bucket(
     transactions: list[dict],
@@ -26,73 +50,85 @@ def compute_risk_for_bucket(
     # Step 1: Extract features
     all_features = extract_features(transactions, bucket_size_seconds)
 
+    # Population-relative detectors run once per bucket
+    velocity = velocity_scores(all_features)
+    circular = circular_flow_scores(transactions)
+    no_cycle = {"score": 0.0, "detail": "", "evidence": {}}
+
+    # Structuring evidence: near-threshold tx IDs per sender, in bucket order
+    lower = STRUCTURING_THRESHOLD - STRUCTURING_DELTA
+    near_threshold_tx: dict[str, list[str]] = {}
+    for tx in transactions:
+        if lower <= tx["amount"] < STRUCTURING_THRESHOLD:
+            near_threshold_tx.setdefault(tx["from_id"], []).append(tx["tx_id"])
+
     results: dict[str, dict] = {}
 
     for entity_id, features in all_features.items():
         # Step 2: Run detectors
-        vel = velocity_detector(features, all_features)
+        vel = velocity[entity_id]
         struct = structuring_detector(features)
-        circ = circular_flow_detector(entity_id, transactions)
-
-        # Step 3: Fuse scores
-        raw_score = (
-            W_VELOCITY * vel["score"]
-            + W_STRUCTURING * struct["score"]
-            + W_CIRCULAR * circ["score"]
-        )
-        risk_score = round(max(0.0, min(1.0, raw_score)), 4)
-
-        # Step 4: Build reasons (top signals only)
-        reasons = []
-        if vel["score"] > 0.05:
-            reasons.append({
-                "detector": "velocity",
-                "detail": vel["detail"],
-                "weight": round(W_VELOCITY * vel["score"], 4),
-            })
-        if struct["score"] > 0.05:
-            reasons.append({
-                "detector": "structuring",
-                "detail": struct["detail"],
-                "weight": round(W_STRUCTURING * struct["score"], 4),
-            })
-        if circ["score"] > 0.05:
-            reasons.append({
-                "detector": "circular_flow",
-                "detail": circ["detail"],
-                "weight": round(W_CIRCULAR * circ["score"], 4),
-            })
-
-        # Sort by weight descending, keep top 3
-        reasons.sort(key=lambda r: r["weight"], reverse=True)
-        reasons = reasons[:3]
-
-        # Step 5: Collect evidence
-        evidence: dict = {}
-        flagged_tx_ids = []
-        if struct["score"] > 0.05:
-            evidence["structuring"] = struct["evidence"]
-        if circ["score"] > 0.05:
-            evidence["circular_flow"] = circ["evidence"]
-        if vel["score"] > 0.05:
-            evidence["velocity"] = vel["evidence"]
-
-        # Flag transactions that contributed to structuring
-        if struct["score"] > 0.05:
-            threshold = struct["evidence"]["threshold"]
-            delta = struct["evidence"]["delta"]
-            lower = threshold - delta
-            for tx in transactions:
-                if tx["from_id"] == entity_id and lower <= tx["amount"] < threshold:
-                    flagged_tx_ids.append(tx["tx_id"])
-
-        if flagged_tx_ids:
-            evidence["flagged_tx_ids"] = flagged_tx_ids[:20]
-
-        results[entity_id] = {
-            "risk_score": risk_score,
-            "reasons": reasons,
-            "evidence": evidence,
-        }
+        circ = circular.get(entity_id, no_cycle)
+
+        results[entity_id] = fuse_signals(vel, struct, circ, near_threshold_tx.get(entity_id, []))
 
     return results
+
+
+def fuse_signals(vel: dict, struct: dict, circ: dict, near_threshold_tx_ids: list[str]) -> dict:
+    """Combine one entity's detector outputs into {risk_score, reasons, evidence}.
+
+    ``near_threshold_tx_ids`` are the entity's outgoing near-threshold
+    transactions in bucket order, flagged when structuring fires.
+    """
+    # Step 3: Fuse scores
+    raw_score = (
+        W_VELOCITY * vel["score"]
+        + W_STRUCTURING * struct["score"]
+        + W_CIRCULAR * circ["score"]
+    )
+    risk_score = round(max(0.0, min(1.0, raw_score)), 4)
+
+    # Step 4: Build reasons (top signals only)
+    reasons = []
+    if vel["score"] > 0.05:
+        reasons.append({
+            "detector": "velocity",
+            "detail": vel["detail"],
+            "weight": round(W_VELOCITY * vel["score"], 4),
+        })
+    if struct["score"] > 0.05:
+        reasons.append({
+            "detector": "structuring",
+            "detail": struct["detail"],
+            "weight": round(W_STRUCTURING * struct["score"], 4),
+        })
+    if circ["score"] > 0.05:
+        reasons.append({
+            "detector": "circular_flow",
+            "detail": circ["detail"],
+            "weight": round(W_CIRCULAR * circ["score"], 4),
+        })
+
+    # Sort by weight descending, keep top 3
+    reasons.sort(key=lambda r: r["weight"], reverse=True)
+    reasons = reasons[:3]
+
+    # Step 5: Collect evidence
+    evidence: dict = {}
+    if struct["score"] > 0.05:
+        evidence["structuring"] = struct["evidence"]
+    if circ["score"] > 0.05:
+        evidence["circular_flow"] = circ["evidence"]
+    if vel["score"] > 0.05:
+        evidence["velocity"] = vel["evidence"]
+
+    # Flag transactions that contributed to structuring
+    if struct["score"] > 0.05 and near_threshold_tx_ids:
+        evidence["flagged_tx_ids"] = near_threshold_tx_ids[:20]
+
+    return {
+        "risk_score": risk_score,
+        "reasons": reasons,
+        "evidence": evidence,
+    }
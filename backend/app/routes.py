@@ -1,38 +1,45 @@
 import asyncio
+import codecs
+import hashlib
 import json
 import random
-from collections import deque
 from enum import Enum
 from typing import Optional
 
-from fastapi import APIRouter, HTTPException, Query, UploadFile, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
+import numpy as np
+from fastapi import APIRouter, HTTPException, Query, Request, Response, UploadFile, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel
 
 from .agents.schemas import AgentInvestigateRequest
 from .agents.supervisor import supervisor
-from .ai.service import clear_ai_caches, generate_entity_summary, generate_sar_narrative
+from .ai.service import agenerate_entity_summary, agenerate_sar_narrative, ai_stats, clear_ai_caches
 from .ai.warmup import get_ai_warmup_status, trigger_ai_warmup
 from .ai.prompts_sar import build_sar_payload
-from .assets.generator import ASSETS_DIR
-from .assets.orchestrator import handle_beacon_asset, handle_cluster_asset
-from .clusters import detect_clusters
+from .assets.generator import glb_cache, read_asset
+from .assets.orchestrator import schedule_assets
 from .config import DATA_PATH
 from .counterfactual import compute_counterfactual
-from .nlq import parse_query, execute_intent
+from .nlq import aparse_query, execute_intent
 from .investigation import generate_investigation_targets
 from .input_memory import input_memory
+from .ingest import INGEST_FLUSH_SECONDS, MicroBatcher, prepare_risk_states
 from .csv_processor import process_csv, process_csv_mapped, preview_csv
 from .dashboard import compute_dashboard
-from .data_loader import store
+from .response_cache import JSON_MEDIA_TYPE, Scope, cached_response, etag_matches, json_body, response_cache
+from .semantic_cache import semantic_cache
+from .snapshot_delta import DeltaMode, snapshot_delta
+from .snapshot_lod import GroupBy, RankBy
+from .snapshot_wire import build_snapshot_columns, negotiate
+from .data_loader import preferred_snapshot_path, store
 from .models import (
     EntityDetailOut,
     NeighborhoodOut,
+    SnapshotDeltaOut,
     SnapshotMeta,
     SnapshotNode,
     SnapshotOut,
 )
-from .risk.scoring import compute_risk_for_bucket
+from .upload_jobs import upload_jobs
 from .ws import manager
 
 router = APIRouter()
@@ -53,6 +60,18 @@ def _dataset_stamp() -> str:
     return f"{sample_type}:{store.n_buckets}:{len(store.entities)}:{len(store.transactions)}:{tail_key}"
 
 
+def _on_dataset_replaced(reason: str) -> None:
+    clear_ai_caches()
+    input_memory.clear_cache()
+    response_cache.prune(store.current)
+    trigger_ai_warmup(reason=reason)
+
+
+def _on_dataset_appended() -> None:
+    input_memory.clear_cache()
+    response_cache.prune(store.current)
+
+
 # --- Status + Upload ---
 
 @router.get("/status")
@@ -62,10 +81,22 @@ async def get_status() -> dict:
         "n_entities": len(store.entities),
         "n_transactions": len(store.transactions),
         "n_buckets": store.n_buckets,
+        "response_cache": response_cache.stats(),
+        "glb_cache": glb_cache.stats(),
+        "ai": await asyncio.to_thread(ai_stats),
+        "nlq_semantic_cache": semantic_cache.stats(),
     }
 
 
-@router.post("/upload")
+def _upload_key(contents: bytes, *parts: str) -> str:
+    """Identity of an upload's parsed snapshot: its bytes plus whatever else parsing reads."""
+    digest = hashlib.blake2b(contents, digest_size=16)
+    for part in parts:
+        digest.update(b"\x00" + part.encode("utf-8"))
+    return digest.hexdigest()
+
+
+@router.post("/upload", status_code=202)
 async def upload_file(file: UploadFile) -> dict:
     fname = (file.filename or "").lower()
     if not fname.endswith(".csv") and not fname.endswith(".json"):
@@ -75,30 +106,27 @@ async def upload_file(file: UploadFile) -> dict:
     if len(contents) > MAX_UPLOAD_BYTES:
         raise HTTPException(status_code=413, detail="File too large (max 50 MB)")
 
-    if fname.endswith(".json"):
+    filename = file.filename or "upload.csv"
+
+    def parse() -> dict:
+        if not fname.endswith(".json"):
+            return process_csv(contents, filename=filename)
         try:
             snapshot = json.loads(contents)
         except json.JSONDecodeError as e:
-            raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+            raise ValueError(f"Invalid JSON: {e}")
         if not isinstance(snapshot, dict) or "entities" not in snapshot or "transactions" not in snapshot:
-            raise HTTPException(status_code=400, detail="JSON must contain 'entities' and 'transactions' keys")
-    else:
-        try:
-            snapshot = process_csv(contents, filename=file.filename)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
-
-    store.load_from_dict(snapshot)
-    clear_ai_caches()
-    input_memory.clear_cache()
-    trigger_ai_warmup(reason="upload")
-
-    return {
-        "status": "ok",
-        "n_entities": len(store.entities),
-        "n_transactions": len(store.transactions),
-        "n_buckets": store.n_buckets,
-    }
+            raise ValueError("JSON must contain 'entities' and 'transactions' keys")
+        return snapshot
+
+    job = upload_jobs.submit(
+        "upload",
+        filename,
+        parse,
+        on_swap=lambda: _on_dataset_replaced("upload"),
+        content_key=_upload_key(contents, filename),
+    )
+    return job.to_dict()
 
 
 @router.post("/upload/preview")
@@ -117,10 +145,8 @@ async def upload_preview(file: UploadFile) -> dict:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.post("/upload/mapped")
+@router.post("/upload/mapped", status_code=202)
 async def upload_mapped(file: UploadFile, mapping: str = Query(..., description="JSON column mapping")) -> dict:
-    import json as _json
-
     fname = (file.filename or "").lower()
     if not fname.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Mapped upload only supports CSV files")
@@ -130,40 +156,55 @@ async def upload_mapped(file: UploadFile, mapping: str = Query(..., description=
         raise HTTPException(status_code=413, detail="File too large (max 50 MB)")
 
     try:
-        col_mapping = _json.loads(mapping)
-    except _json.JSONDecodeError:
+        col_mapping = json.loads(mapping)
+    except json.JSONDecodeError:
         raise HTTPException(status_code=400, detail="Invalid mapping JSON")
 
     if not isinstance(col_mapping, dict):
         raise HTTPException(status_code=400, detail="Mapping must be a JSON object")
 
-    try:
-        snapshot = process_csv_mapped(contents, col_mapping, filename=file.filename or "upload.csv")
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
+    filename = file.filename or "upload.csv"
+    job = upload_jobs.submit(
+        "upload_mapped",
+        filename,
+        lambda: process_csv_mapped(contents, col_mapping, filename=filename),
+        on_swap=lambda: _on_dataset_replaced("upload_mapped"),
+        content_key=_upload_key(contents, filename, json.dumps(col_mapping, sort_keys=True)),
+    )
+    return job.to_dict()
 
-    store.load_from_dict(snapshot)
-    clear_ai_caches()
-    input_memory.clear_cache()
-    trigger_ai_warmup(reason="upload_mapped")
 
-    return {
-        "status": "ok",
-        "n_entities": len(store.entities),
-        "n_transactions": len(store.transactions),
-        "n_buckets": store.n_buckets,
-    }
+@router.get("/upload/jobs")
+async def list_upload_jobs() -> dict:
+    return {"jobs": [job.to_dict() for job in upload_jobs.recent()]}
+
+
+@router.get("/upload/jobs/{job_id}")
+async def get_upload_job(job_id: str) -> dict:
+    job = upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found")
+    return job.to_dict()
+
+
+@router.post("/upload/jobs/{job_id}/cancel")
+async def cancel_upload_job(job_id: str) -> dict:
+    job = upload_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Upload job '{job_id}' not found")
+    if job.done:
+        raise HTTPException(status_code=409, detail=f"Upload job already {job.status}")
+    return job.to_dict()
 
 
 @router.post("/load-sample")
 async def load_sample() -> dict:
-    if not DATA_PATH.exists():
+    sample_path = preferred_snapshot_path(DATA_PATH)
+    if not sample_path.exists():
         raise HTTPException(status_code=404, detail="Sample data not found on server")
 
-    store.load(DATA_PATH)
-    clear_ai_caches()
-    input_memory.clear_cache()
-    trigger_ai_warmup(reason="load_sample")
+    store.load(sample_path)
+    _on_dataset_replaced("load_sample")
 
     return {
         "status": "ok",
@@ -174,61 +215,68 @@ async def load_sample() -> dict:
 
 
 @router.get("/snapshot", response_model=SnapshotOut)
-async def get_snapshot(t: int = Query(..., description="Time bucket index")) -> SnapshotOut:
+async def get_snapshot(
+    request: Request,
+    t: int = Query(..., description="Time bucket index"),
+    aggregate: bool = Query(False, description="Collapse edges to one per (from_id, to_id) pair"),
+    max_nodes: Optional[int] = Query(None, ge=1, description="Keep at most this many entities, ranked by rank_by"),
+    min_risk: float = Query(0.0, ge=0.0, le=1.0, description="Drop entities below this risk score"),
+    rank_by: RankBy = Query(RankBy.risk, description="Ranking used by max_nodes"),
+    group_by: Optional[GroupBy] = Query(None, description="Collapse pruned entities into bank/jurisdiction supernodes"),
+) -> SnapshotOut:
     if t < 0 or t >= store.n_buckets:
         raise HTTPException(
             status_code=400,
             detail=f"Bucket t={t} out of range [0, {store.n_buckets - 1}]",
         )
 
-    # Get entities active in this bucket
-    active_ids = set(store.get_bucket_entities(t))
-
-    # If no activity in this bucket, return all entities (bucket may be sparse)
-    if not active_ids:
-        active_ids = {e["id"] for e in store.entities}
+    dataset = store.current
+    media_type = negotiate(request.headers.get("accept"))
+
+    def render() -> bytes:
+        columns = build_snapshot_columns(dataset, t, aggregate, max_nodes, min_risk, rank_by, group_by)
+        meta = SnapshotMeta(
+            t=t,
+            n_buckets=dataset.n_buckets,
+            n_entities=columns.n_nodes,
+            n_transactions=len(dataset.get_bucket_columns(t)),
+            bucket_size_seconds=dataset.metadata.get("bucket_size_seconds", 86400),
+            aggregated=columns.aggregated,
+            lod=columns.lod,
+        )
+        if media_type is not None:
+            return columns.encode(meta.model_dump(), media_type)
+        return json_body(SnapshotOut(meta=meta, nodes=columns.node_models(), edges=columns.edge_dicts()))
+
+    # A bucket without activity lists every entity, so it follows the entity table too
+    scope = Scope((t,), entities=not dataset.entity_activity.get(str(t)))
+    return cached_response(
+        request, dataset, scope, render,
+        media_type=media_type or JSON_MEDIA_TYPE,
+        headers={"Vary": "Accept"},
+    )
 
-    # Precompute per-entity volume for this bucket
-    bucket_tx = store.get_bucket_transactions(t)
-    entity_volume: dict[str, float] = {}
-    for tx in bucket_tx:
-        entity_volume[tx["from_id"]] = entity_volume.get(tx["from_id"], 0.0) + tx["amount"]
-        entity_volume[tx["to_id"]] = entity_volume.get(tx["to_id"], 0.0) + tx["amount"]
 
-    nodes = []
-    for eid in sorted(active_ids):
-        entity = store.get_entity(eid)
-        if entity:
-            risk = store.get_entity_risk(t, eid)
-            nodes.append(
-                SnapshotNode(
-                    id=entity["id"],
-                    jurisdiction_bucket=entity["jurisdiction_bucket"],
-                    kyc_level=entity["kyc_level"],
-                    risk_score=risk["risk_score"],
-                    entity_type=entity.get("type", "account"),
-                    volume=entity_volume.get(eid, 0.0),
-                )
+@router.get("/snapshot/delta", response_model=SnapshotDeltaOut)
+async def get_snapshot_delta(
+    from_t: int = Query(..., alias="from", description="Bucket the client currently shows"),
+    to_t: int = Query(..., alias="to", description="Bucket to move to"),
+    mode: DeltaMode = Query(DeltaMode.compact, description="compact: one direct diff; chain: one step per bucket"),
+) -> SnapshotDeltaOut:
+    for t in (from_t, to_t):
+        if t < 0 or t >= store.n_buckets:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Bucket t={t} out of range [0, {store.n_buckets - 1}]",
             )
-    edges = [
-        {"from_id": tx["from_id"], "to_id": tx["to_id"], "amount": tx["amount"]}
-        for tx in bucket_tx
-        if tx["from_id"] != tx["to_id"]
-    ]
-
-    meta = SnapshotMeta(
-        t=t,
-        n_buckets=store.n_buckets,
-        n_entities=len(nodes),
-        n_transactions=len(bucket_tx),
-        bucket_size_seconds=store.metadata.get("bucket_size_seconds", 86400),
-    )
 
-    return SnapshotOut(meta=meta, nodes=nodes, edges=edges)
+    steps = snapshot_delta(store.current, from_t, to_t, mode)
+    return SnapshotDeltaOut(from_t=from_t, to_t=to_t, mode=mode.value, steps=steps)
 
 
 @router.get("/entity/{entity_id}", response_model=EntityDetailOut)
 async def get_entity(
+    request: Request,
     entity_id: str,
     t: int = Query(None, description="Optional time bucket for activity context"),
 ) -> EntityDetailOut:
@@ -245,19 +293,23 @@ async def get_entity(
             )
         activity = store.get_entity_activity(t, entity_id)
 
-    risk = store.get_entity_risk(t if t is not None else 0, entity_id)
+    bucket = t if t is not None else 0
 
-    return EntityDetailOut(
-        id=entity["id"],
-        type=entity["type"],
-        bank=entity["bank"],
-        jurisdiction_bucket=entity["jurisdiction_bucket"],
-        kyc_level=entity["kyc_level"],
-        risk_score=risk["risk_score"],
-        reasons=risk["reasons"],
-        evidence=risk["evidence"],
-        activity=activity,
-    )
+    def render() -> bytes:
+        risk = store.get_entity_risk(bucket, entity_id)
+        return json_body(EntityDetailOut(
+            id=entity["id"],
+            type=entity["type"],
+            bank=entity["bank"],
+            jurisdiction_bucket=entity["jurisdiction_bucket"],
+            kyc_level=entity["kyc_level"],
+            risk_score=risk["risk_score"],
+            reasons=risk["reasons"],
+            evidence=risk["evidence"],
+            activity=activity,
+        ))
+
+    return cached_response(request, store.current, Scope((bucket,)), render)
 
 
 MAX_NEIGHBOR_NODES = 200
@@ -280,47 +332,28 @@ async def get_neighbors(
     if entity is None:
         raise HTTPException(status_code=404, detail=f"Entity '{id}' not found")
 
-    # BFS k-hop neighborhood using bucket-specific transactions
-    bucket_tx = store.get_bucket_transactions(t)
+    # BFS k-hop neighborhood over the bucket's CSR adjacency
+    graph = store.get_bucket_graph(t)
+    center = store.ids.code(id)
+    local = graph.local(center)
+    members = graph.k_hop(local, k, MAX_NEIGHBOR_NODES) if local >= 0 else []
+    visited = graph.codes[members].tolist() if members else [center]
 
-    # Build bucket-local adjacency
-    adj: dict[str, set[str]] = {}
-    for tx in bucket_tx:
-        if tx["from_id"] != tx["to_id"]:
-            adj.setdefault(tx["from_id"], set()).add(tx["to_id"])
-            adj.setdefault(tx["to_id"], set()).add(tx["from_id"])
-
-    visited: set[str] = {id}
-    queue: deque[tuple[str, int]] = deque([(id, 0)])
-
-    while queue:
-        current, depth = queue.popleft()
-        if depth >= k:
-            continue
-        for neighbor in adj.get(current, set()):
-            if neighbor not in visited and len(visited) < MAX_NEIGHBOR_NODES:
-                visited.add(neighbor)
-                queue.append((neighbor, depth + 1))
-
-    # Collect edges between visited nodes (deduplicated)
-    edges = []
-    seen_edges: set[tuple[str, str]] = set()
-    for tx in bucket_tx:
-        if tx["from_id"] in visited and tx["to_id"] in visited and tx["from_id"] != tx["to_id"]:
-            edge_key = (tx["from_id"], tx["to_id"])
-            if edge_key not in seen_edges and len(edges) < MAX_NEIGHBOR_EDGES:
-                seen_edges.add(edge_key)
-                edges.append({"from_id": tx["from_id"], "to_id": tx["to_id"], "amount": tx["amount"]})
-
-    # Compute per-entity volume from bucket transactions
-    entity_volume: dict[str, float] = {}
-    for tx in bucket_tx:
-        entity_volume[tx["from_id"]] = entity_volume.get(tx["from_id"], 0.0) + tx["amount"]
-        entity_volume[tx["to_id"]] = entity_volume.get(tx["to_id"], 0.0) + tx["amount"]
+    # Edges between visited nodes (one per directed pair, first transaction's amount)
+    pair_ids = graph.pairs_within(members, MAX_NEIGHBOR_EDGES)
+    edges = [
+        {"from_id": store.ids[f], "to_id": store.ids[to], "amount": amount}
+        for f, to, amount in zip(
+            graph.codes[graph.pair_from[pair_ids]].tolist(),
+            graph.codes[graph.pair_to[pair_ids]].tolist(),
+            graph.pair_first_amount[pair_ids].tolist(),
+        )
+    ]
+    volume_by_code = dict(zip(visited, graph.volume[members].tolist() if members else [0.0]))
 
     # Build node list
     nodes = []
-    for eid in sorted(visited):
+    for code, eid in sorted(zip(visited, store.ids.lookup(visited)), key=lambda item: item[1]):
         ent = store.get_entity(eid)
         if ent:
             risk = store.get_entity_risk(t, eid)
@@ -331,13 +364,71 @@ async def get_neighbors(
                     kyc_level=ent["kyc_level"],
                     risk_score=risk["risk_score"],
                     entity_type=ent.get("type", "account"),
-                    volume=entity_volume.get(eid, 0.0),
+                    volume=float(volume_by_code[code]),
                 )
             )
 
     return NeighborhoodOut(center_id=id, k=k, nodes=nodes, edges=edges)
 
 
+# --- Streaming Ingestion ---
+
+@router.post("/ingest")
+async def ingest_transactions(request: Request) -> dict:
+    """Append NDJSON transactions (one JSON object per line) to the loaded dataset."""
+    if not store.is_loaded:
+        raise HTTPException(status_code=409, detail="No dataset loaded")
+
+    batcher = MicroBatcher(store, manager.broadcast, on_flush=_on_dataset_appended)
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail="Request too large (max 50 MB)")
+        await batcher.feed_chunk(decoder.decode(chunk))
+    await batcher.feed_chunk(decoder.decode(b"", final=True))
+    result = await batcher.finish()
+    return result.to_dict(store)
+
+
+@router.websocket("/ingest/stream")
+async def ingest_stream(ws: WebSocket) -> None:
+    """WebSocket variant of /ingest: each text frame holds NDJSON lines.
+
+    Records are flushed when a batch fills or the connection goes idle for
+    the flush interval; each flush is acknowledged with ``INGEST_ACK``.
+    """
+    await ws.accept()
+    if not store.is_loaded:
+        await ws.close(code=1013, reason="No dataset loaded")
+        return
+
+    batcher = MicroBatcher(store, manager.broadcast, on_flush=_on_dataset_appended)
+    acked_batches = 0
+
+    async def ack() -> None:
+        nonlocal acked_batches
+        if batcher.result.batches != acked_batches or batcher.result.rejected:
+            acked_batches = batcher.result.batches
+            await ws.send_text(json.dumps({"event": "INGEST_ACK", "data": batcher.result.to_dict(store)}))
+            batcher.result.errors.clear()
+
+    try:
+        while True:
+            timeout = INGEST_FLUSH_SECONDS if batcher.pending else None
+            try:
+                frame = await asyncio.wait_for(ws.receive_text(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await batcher.flush()
+                await ack()
+                continue
+            await batcher.feed_chunk(frame + "\n")
+            await ack()
+    except WebSocketDisconnect:
+        await batcher.finish()
+
+
 # --- WebSocket ---
 
 @router.websocket("/stream")
@@ -369,27 +460,28 @@ async def inject_anomaly(
             detail=f"Bucket t={t} out of range [0, {store.n_buckets - 1}]",
         )
 
-    bucket_tx = store.get_bucket_transactions(t)
-    if not bucket_tx:
+    cols = store.get_bucket_columns(t)
+    if not len(cols):
         raise HTTPException(status_code=400, detail=f"No transactions in bucket {t}")
 
     # Pick a random entity from this bucket
     rng = random.Random(42 + t)
-    entity_ids = list({tx["from_id"] for tx in bucket_tx if tx["from_id"] != tx["to_id"]})
+    non_self = cols.non_self()
+    entity_ids = store.ids.lookup(np.unique(cols.from_code[non_self]))
     if not entity_ids:
         raise HTTPException(status_code=400, detail="No valid entities in bucket")
     target_id = rng.choice(entity_ids)
 
     # Get a few counterparties
-    counterparties = list({
-        tx["to_id"] for tx in bucket_tx
-        if tx["from_id"] == target_id and tx["to_id"] != target_id
-    })[:5]
+    target_code = store.ids.code(target_id)
+    counterparties = store.ids.lookup(
+        np.unique(cols.to_code[non_self & (cols.from_code == target_code)])
+    )[:5]
     if not counterparties:
         counterparties = [rng.choice(entity_ids)]
 
     # Inject synthetic transactions
-    base_ts = min(tx["timestamp"] for tx in bucket_tx)
+    base_ts = int(cols.timestamp.min())
     injected_tx: list[dict] = []
 
     if pattern == InjectPattern.velocity:
@@ -442,28 +534,18 @@ async def inject_anomaly(
                 "bucket_index": t,
             })
 
-    # Add injected transactions to the bucket
-    for tx in injected_tx:
-        store.transactions.append(tx)
-        bucket_key = str(t)
-        idx = len(store.transactions) - 1
-        store.bucket_index.setdefault(bucket_key, []).append(idx)
-
-    # Recompute risk for this bucket
-    all_bucket_tx = store.get_bucket_transactions(t)
-    bucket_size = store.metadata.get("bucket_size_seconds", 86400)
-    store.risk_by_bucket[t] = compute_risk_for_bucket(all_bucket_tx, bucket_size)
-    input_memory.clear_cache()
+    # Add injected transactions and rescore only the entities they affect
+    ds = store.current
+    async with ds.append_lock:
+        await prepare_risk_states(ds, (t,))
+        changed = ds.append_and_rescore(t, injected_tx)
+    _on_dataset_appended()
 
-    # Detect clusters
-    clusters = detect_clusters(store.risk_by_bucket[t], all_bucket_tx)
+    # Detect clusters (the bucket's cluster index was updated by the append)
+    clusters = store.get_clusters(t)
 
-    # Broadcast events
-    changed_risks = {
-        eid: data["risk_score"]
-        for eid, data in store.risk_by_bucket[t].items()
-        if data["risk_score"] > 0
-    }
+    # Broadcast events (only entities whose risk entry changed)
+    changed_risks = {eid: data["risk_score"] for eid, data in changed.items()}
 
     await manager.broadcast("RISK_UPDATED", {
         "bucket": t,
@@ -478,18 +560,11 @@ async def inject_anomaly(
             **cluster,
         })
 
-    # Generate GLB assets for detected clusters
-    assets_generated = 0
-    for cluster in clusters:
-        result = await handle_cluster_asset(cluster, t, manager.broadcast)
-        if result:
-            assets_generated += 1
-
-    # Generate beacon for the injected high-risk entity
+    # Build GLB assets for the clusters and the injected entity in the
+    # background; each ASSET_READY is broadcast as its mesh completes
     target_risk = store.risk_by_bucket[t].get(target_id, {}).get("risk_score", 0)
-    if target_risk > 0.5:
-        await handle_beacon_asset(target_id, target_risk, t, manager.broadcast)
-        assets_generated += 1
+    beacons = [(target_id, target_risk)] if target_risk > 0.5 else []
+    assets_queued = schedule_assets(clusters, beacons, t, manager.broadcast)
 
     return {
         "status": "injected",
@@ -498,18 +573,25 @@ async def inject_anomaly(
         "target_entity": target_id,
         "injected_count": len(injected_tx),
         "clusters_found": len(clusters),
-        "assets_generated": assets_generated,
+        "assets_queued": assets_queued,
     }
 
 
 # --- Asset Serving ---
 
 @router.get("/assets/{filename}")
-async def get_asset(filename: str) -> FileResponse:
-    path = ASSETS_DIR / filename
-    if not path.exists() or not path.suffix == ".glb":
+async def get_asset(filename: str, request: Request) -> Response:
+    asset = glb_cache.get(filename)
+    if asset is None:
+        # Evicted or built by another worker: fall back to the persisted file
+        asset = await asyncio.to_thread(read_asset, filename)
+    if asset is None:
         raise HTTPException(status_code=404, detail="Asset not found")
-    return FileResponse(path, media_type="model/gltf-binary")
+    # File names are derived from the asset inputs, so the bytes never change
+    headers = {"ETag": asset.etag, "Cache-Control": "public, max-age=31536000, immutable"}
+    if etag_matches(request.headers.get("if-none-match"), asset.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=asset.data, media_type="model/gltf-binary", headers=headers)
 
 
 # --- AI Copilot ---
@@ -553,8 +635,7 @@ async def ai_explain_entity(
     risk = store.get_entity_risk(t, entity_id)
     activity = store.get_entity_activity(t, entity_id)
 
-    summary = await asyncio.to_thread(
-        generate_entity_summary,
+    summary = await agenerate_entity_summary(
         entity_id=entity_id,
         risk_score=risk["risk_score"],
         reasons_key=json.dumps(risk["reasons"], sort_keys=True),
@@ -574,6 +655,7 @@ async def ai_explain_entity(
 
 @router.get("/autopilot/targets")
 async def get_autopilot_targets(
+    request: Request,
     t: int = Query(..., description="Time bucket index"),
 ) -> dict:
     if t < 0 or t >= store.n_buckets:
@@ -581,14 +663,19 @@ async def get_autopilot_targets(
             status_code=400,
             detail=f"Bucket t={t} out of range [0, {store.n_buckets - 1}]",
         )
-    targets = generate_investigation_targets(t)
-    return {"bucket": t, "targets": targets}
+
+    def render() -> bytes:
+        return json_body({"bucket": t, "targets": generate_investigation_targets(t)})
+
+    # Targets compare against the previous bucket
+    return cached_response(request, store.current, Scope((t - 1, t)), render)
 
 
 # --- Clusters ---
 
 @router.get("/clusters")
 async def get_clusters(
+    request: Request,
     t: int = Query(..., description="Time bucket index"),
 ) -> dict:
     if t < 0 or t >= store.n_buckets:
@@ -596,12 +683,12 @@ async def get_clusters(
             status_code=400,
             detail=f"Bucket t={t} out of range [0, {store.n_buckets - 1}]",
         )
-    risk_data = store.risk_by_bucket.get(t, {})
-    bucket_key = str(t)
-    tx_indices = store.bucket_index.get(bucket_key, [])
-    bucket_tx = [store.transactions[i] for i in tx_indices if i < len(store.transactions)]
-    clusters = detect_clusters(risk_data, bucket_tx, threshold=0.3)
-    return {"bucket": t, "clusters": clusters}
+
+    def render() -> bytes:
+        clusters = store.get_clusters(t, threshold=0.3)
+        return json_body({"bucket": t, "clusters": clusters})
+
+    return cached_response(request, store.current, Scope((t,)), render)
 
 
 # --- SAR Narrative ---
@@ -652,8 +739,7 @@ async def generate_sar(
         bucket_size_seconds=store.metadata.get("bucket_size_seconds", 86400),
     )
 
-    narrative = await asyncio.to_thread(
-        generate_sar_narrative,
+    narrative = await agenerate_sar_narrative(
         entity_id=entity_id,
         payload_key=json.dumps(payload, sort_keys=True, default=str),
     )
@@ -670,6 +756,7 @@ async def generate_sar(
 
 @router.get("/dashboard")
 async def get_dashboard(
+    request: Request,
     t: int = Query(..., description="Time bucket index"),
 ) -> dict:
     if t < 0 or t >= store.n_buckets:
@@ -677,7 +764,8 @@ async def get_dashboard(
             status_code=400,
             detail=f"Bucket t={t} out of range [0, {store.n_buckets - 1}]",
         )
-    return compute_dashboard(t)
+    # The risk trend covers every bucket
+    return cached_response(request, store.current, Scope(None), lambda: json_body(compute_dashboard(t)))
 
 
 # --- Natural Language Query ---
@@ -725,12 +813,15 @@ async def nlq_parse(req: NLQParseRequest) -> dict:
         )
         return cached
 
-    parsed = await asyncio.to_thread(parse_query, normalized_query)
+    parsed = await aparse_query(normalized_query)
     result = await asyncio.to_thread(execute_intent, parsed["intent"], parsed.get("params", {}), req.bucket)
     response = {
         "intent": parsed["intent"],
         "params": parsed.get("params", {}),
         "interpretation": parsed.get("interpretation", ""),
+        "parser": parsed.get("parser", "llm"),
+        "confidence": parsed.get("confidence"),
+        "matched_query": parsed.get("matched_query"),
         "entity_ids": result["entity_ids"],
         "edges": result["edges"],
         "summary": result["summary"],
@@ -743,6 +834,7 @@ async def nlq_parse(req: NLQParseRequest) -> dict:
         cache_hit=False,
         meta={
             "intent": parsed.get("intent"),
+            "parser": parsed.get("parser", "llm"),
             "matched_entities": len(result.get("entity_ids", [])),
         },
     )
@@ -0,0 +1,220 @@
+"""Semantic cache of parsed NLQ intents.
+
+The exact-match ``nlq.parse`` request cache misses on every rephrasing,
+so "accounts moving money through the cayman islands" and "entities
+routing funds via the cayman islands" each cost an LLM call. This cache
+keeps the parses the LLM returned in a small in-memory vector index and
+reuses one when a new query is close enough to a query seen before.
+
+Queries are embedded locally, without a model or network: tokens are
+mapped to canonical words (``accounts``/``customers`` -> ``entity``),
+then hashed character 3- and 4-grams of the result form a sparse-ish,
+L2-normalized vector. Lookup is one matrix-vector product over the index
+(cosine similarity).
+
+Similarity alone would let "registered in brazil" reuse the parse of
+"registered in chile", so a hit also requires the same key terms: the
+words that change what a query asks for must match exactly. Those are
+negation ("not", "without"), direction and comparison ("to"/"from",
+"over"/"under", "low"), place names (words after "in", "through", "to"...
+that are not in the vocabulary) and numbers, so "over $100k" never reuses
+the parse of "over $500k". Other words are left to the similarity.
+
+``ANGELA_NLQ_SEMANTIC_THRESHOLD`` sets the minimum similarity (``>1``
+disables reuse) and ``ANGELA_NLQ_SEMANTIC_CACHE_SIZE`` the number of
+queries kept; the least recently used one is replaced when full.
+"""
+
+from __future__ import annotations
+
+import copy
+import os
+import re
+import zlib
+from threading import Lock
+from typing import Optional
+
+import numpy as np
+
+SEMANTIC_THRESHOLD = float(os.getenv("ANGELA_NLQ_SEMANTIC_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_SIZE = max(1, int(os.getenv("ANGELA_NLQ_SEMANTIC_CACHE_SIZE", "512")))
+
+_DIMS = 4096
+_NGRAMS = (3, 4)
+
+_WORD_RE = re.compile(r"[a-z]+|\d+(?:[.,]\d+)*\s*(?:%|k|mm|m|thousand|million)?(?![a-z])")
+_NUMBER_RE = re.compile(r"\d+(?:[.,]\d+)*")
+
+# Words that carry no meaning for intent parsing. Direction ("to",
+# "from") and negation ("not", "without") do, so they are left out; "high"
+# only restates what "risky" or "large" already imply.
+_STOPWORDS = frozenset(
+    "a an the me my us our all any of for with in on at by and or that which who "
+    "are is be been being have has had do does please can could would you i we it its "
+    "there their them this these those what high highly very".split()
+)
+
+# Canonical word for each group of interchangeable ones
+_SYNONYMS: dict[str, tuple[str, ...]] = {
+    "show": ("display", "list", "find", "get", "give", "see", "view", "surface", "pull", "fetch", "return"),
+    "entity": ("entities", "account", "accounts", "customer", "customers", "client", "clients",
+               "party", "parties", "counterparty", "counterparties", "node", "nodes", "user", "users"),
+    "risk": ("risky", "riskiest", "suspicious", "suspect", "dangerous", "flagged", "highrisk"),
+    "transfer": ("transfers", "transaction", "transactions", "payment", "payments", "wire", "wires",
+                 "txn", "txns"),
+    "money": ("funds", "cash", "amount", "amounts", "volume", "volumes"),
+    "large": ("big", "huge", "heavy", "significant", "massive"),
+    "cluster": ("clusters", "ring", "rings", "group", "groups", "network", "networks"),
+    "jurisdiction": ("country", "countries", "region", "regions", "jurisdictions"),
+    "above": ("over", "exceeding", "more", "greater", "higher", "least"),
+    "below": ("under", "less", "low", "lower", "lowest", "beneath"),
+    "move": ("moving", "moved", "route", "routing", "routed", "send", "sending", "sent", "flow", "flows",
+             "flowing", "through", "via"),
+}
+_CANONICAL = {word: canon for canon, words in _SYNONYMS.items() for word in words}
+_VOCABULARY = _STOPWORDS | _CANONICAL.keys() | _SYNONYMS.keys()
+
+_NEGATORS = frozenset("not no non without excluding except never none nor".split())
+# Compared after canonicalization, so "over"/"more" count as "above"
+_DIRECTIONS = frozenset("to from into above below between incoming outgoing inbound outbound".split())
+# Words a place name follows ("registered in brazil", "through the cayman islands")
+_PLACE_PREPOSITIONS = frozenset("in at to from into through via within across".split())
+_CONTRACTED_NOT_RE = re.compile(r"n't\b")
+
+KeyTerms = tuple[frozenset[str], tuple[str, ...]]
+
+
+def _words(query: str) -> list[str]:
+    words = []
+    for word in _WORD_RE.findall(query.lower()):
+        if word in _STOPWORDS:
+            continue
+        words.append(_CANONICAL.get(word, word))
+    return words
+
+
+def numbers(query: str) -> tuple[str, ...]:
+    """The numbers a query mentions, separators dropped, in order."""
+    return tuple(n.replace(",", "") for n in _NUMBER_RE.findall(query))
+
+
+def key_terms(query: str) -> KeyTerms:
+    """Negation, direction, place and number terms a reused parse must share."""
+    terms: set[str] = set()
+    in_place = False
+    for word in _WORD_RE.findall(_CONTRACTED_NOT_RE.sub(" not", query.lower())):
+        canon = _CANONICAL.get(word, word)
+        if word in _NEGATORS:
+            terms.add("not")
+            in_place = False
+            continue
+        if canon in _DIRECTIONS:
+            terms.add(canon)
+        if word in _PLACE_PREPOSITIONS:
+            in_place = True
+        elif in_place and word not in _STOPWORDS:
+            # A place name runs until the next known word
+            if word in _VOCABULARY or word[0].isdigit():
+                in_place = False
+            else:
+                terms.add(word)
+    return frozenset(terms), numbers(query)
+
+
+def embed(query: str) -> np.ndarray:
+    """L2-normalized hashed character n-gram vector of the canonicalized query."""
+    text = " ".join(_words(query))
+    vector = np.zeros(_DIMS, dtype=np.float32)
+    padded = f" {text} "
+    for n in _NGRAMS:
+        for i in range(len(padded) - n + 1):
+            vector[zlib.crc32(padded[i:i + n].encode("utf-8")) % _DIMS] += 1.0
+    norm = float(np.linalg.norm(vector))
+    if norm:
+        vector /= norm
+    return vector
+
+
+class SemanticIntentCache:
+    """Fixed-capacity vector index of ``query -> parsed intent``."""
+
+    def __init__(
+        self,
+        capacity: int = SEMANTIC_CACHE_SIZE,
+        threshold: float = SEMANTIC_THRESHOLD,
+    ) -> None:
+        self.capacity = capacity
+        self.threshold = threshold
+        self._vectors = np.zeros((capacity, _DIMS), dtype=np.float32)
+        self._queries: list[str] = []
+        self._keys: list[KeyTerms] = []
+        self._parsed: list[dict] = []
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, query: str) -> Optional[tuple[dict, float, str]]:
+        """Return ``(parsed, similarity, cached query)`` of the closest match, or None."""
+        vector = embed(query)
+        keys = key_terms(query)
+        with self._lock:
+            n = len(self._queries)
+            if n and vector.any():
+                similarities = self._vectors[:n] @ vector
+                for i in np.argsort(similarities)[::-1]:
+                    similarity = float(similarities[i])
+                    if similarity < self.threshold:
+                        break
+                    if self._keys[i] == keys:
+                        self._clock += 1
+                        self._last_used[i] = self._clock
+                        self.hits += 1
+                        return copy.deepcopy(self._parsed[i]), similarity, self._queries[i]
+            self.misses += 1
+            return None
+
+    def add(self, query: str, parsed: dict) -> None:
+        vector = embed(query)
+        if not vector.any():
+            return
+        with self._lock:
+            if query in self._queries:
+                slot = self._queries.index(query)
+            elif len(self._queries) < self.capacity:
+                slot = len(self._queries)
+                self._queries.append(query)
+                self._keys.append((frozenset(), ()))
+                self._parsed.append({})
+            else:
+                slot = int(np.argmin(self._last_used))
+            self._vectors[slot] = vector
+            self._queries[slot] = query
+            self._keys[slot] = key_terms(query)
+            self._parsed[slot] = copy.deepcopy(parsed)
+            self._clock += 1
+            self._last_used[slot] = self._clock
+
+    def clear(self) -> None:
+        with self._lock:
+            self._vectors[:] = 0.0
+            self._queries.clear()
+            self._keys.clear()
+            self._parsed.clear()
+            self._last_used[:] = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._queries),
+                "capacity": self.capacity,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+semantic_cache = SemanticIntentCache()
@@ -0,0 +1,299 @@
+"""Level-of-detail selection for /snapshot payloads.
+
+``BucketRanking`` is built once per bucket (and cached on the dataset): the
+bucket's node set in ID order with risk and volume arrays and both
+descending orderings. A LOD request keeps the top ``max_nodes`` entities by
+risk or volume among those with ``risk >= min_risk``; the rest are dropped
+or, with ``group_by``, collapsed into one supernode per bank or
+jurisdiction. Edges are then restricted to (or remapped onto) the output
+nodes.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+
+from .models import SnapshotNode
+
+if TYPE_CHECKING:
+    from .bucket_graph import BucketGraph
+    from .data_loader import Dataset
+
+
+class RankBy(str, Enum):
+    risk = "risk"
+    volume = "volume"
+
+
+class GroupBy(str, Enum):
+    bank = "bank"
+    jurisdiction = "jurisdiction"
+
+
+def _encode_labels(values: list[str]) -> tuple[np.ndarray, list[str]]:
+    labels = sorted(set(values))
+    index = {label: i for i, label in enumerate(labels)}
+    return np.fromiter((index[v] for v in values), dtype=np.int64, count=len(values)), labels
+
+
+class BucketRanking:
+    """Snapshot node set of one bucket, ranked by risk and by volume.
+
+    Nodes are the bucket's active entities (all entities if the bucket has
+    no activity) that have an entity record, in ID order.
+    """
+
+    def __init__(self, ids: list[str], codes: np.ndarray, risk: np.ndarray, volume: np.ndarray) -> None:
+        self.ids = ids
+        self.codes = codes
+        self.risk = risk
+        self.volume = volume
+        # Descending; ties keep ID order
+        self.by_risk = np.argsort(-risk, kind="stable")
+        self.by_volume = np.argsort(-volume, kind="stable")
+        # group_by -> (group index per node, group labels), built on first use
+        self._groups: dict[GroupBy, tuple[np.ndarray, list[str]]] = {}
+        self._attributes: Optional[tuple[np.ndarray, np.ndarray, list[str], np.ndarray, list[str]]] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, dataset: "Dataset", bucket: int) -> "BucketRanking":
+        active = dataset.get_bucket_entities(bucket) or [e["id"] for e in dataset.entities]
+        ids = sorted(eid for eid in set(active) if eid in dataset.entities_by_id)
+        codes = dataset.ids.codes(ids).astype(np.int64)
+        risk_table = dataset.risk_by_bucket.get(bucket, {})
+        risk = np.array(
+            [risk_table[eid]["risk_score"] if eid in risk_table else 0.0 for eid in ids],
+            dtype=np.float64,
+        )
+        volume = dataset.get_bucket_columns(bucket).entity_volume(len(dataset.ids))[codes]
+        return cls(ids, codes, risk, np.asarray(volume, dtype=np.float64))
+
+    def select(self, max_nodes: Optional[int], min_risk: float, rank_by: RankBy) -> np.ndarray:
+        """Indices of the nodes to keep, in ID order."""
+        order = self.by_risk if rank_by == RankBy.risk else self.by_volume
+        if min_risk > 0:
+            order = order[self.risk[order] >= min_risk]
+        if max_nodes is not None:
+            order = order[:max_nodes]
+        return np.sort(order)
+
+    def groups(self, dataset: "Dataset", group_by: GroupBy) -> tuple[np.ndarray, list[str]]:
+        """Group index of every node and the sorted group labels."""
+        cached = self._groups.get(group_by)
+        if cached is None:
+            keys = [_group_key(dataset.entities_by_id[eid], group_by) for eid in self.ids]
+            cached = _encode_labels(keys)
+            self._groups[group_by] = cached
+        return cached
+
+    def attributes(self, dataset: "Dataset") -> tuple[np.ndarray, np.ndarray, list[str], np.ndarray, list[str]]:
+        """Jurisdiction of every node, plus KYC level and entity type as codes into sorted labels."""
+        if self._attributes is None:
+            entities = [dataset.entities_by_id[eid] for eid in self.ids]
+            jurisdiction = np.array([e["jurisdiction_bucket"] for e in entities], dtype=np.int64)
+            kyc, kyc_levels = _encode_labels([e["kyc_level"] for e in entities])
+            types, entity_types = _encode_labels([e.get("type", "account") for e in entities])
+            self._attributes = (jurisdiction, kyc, kyc_levels, types, entity_types)
+        return self._attributes
+
+    def jurisdictions(self, dataset: "Dataset") -> np.ndarray:
+        return dataset.jurisdiction_by_code[self.codes].astype(np.int64)
+
+    def node(self, dataset: "Dataset", i: int) -> SnapshotNode:
+        entity = dataset.entities_by_id[self.ids[i]]
+        return SnapshotNode(
+            id=entity["id"],
+            jurisdiction_bucket=entity["jurisdiction_bucket"],
+            kyc_level=entity["kyc_level"],
+            risk_score=float(self.risk[i]),
+            entity_type=entity.get("type", "account"),
+            volume=float(self.volume[i]),
+        )
+
+
+@dataclass
+class LodView:
+    """Output nodes of a LOD request and where each entity code maps to.
+
+    Output node ``i < kept`` is ranking node ``keep[i]``; the rest are
+    supernodes, in label order.
+    """
+
+    keep: np.ndarray
+    # Entity code -> output node index (-1 = not shown)
+    slot: np.ndarray
+    total_nodes: int
+    supernode_ids: list[str] = field(default_factory=list)
+    supernode_jurisdiction: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.int64))
+    supernode_risk: np.ndarray = field(default_factory=lambda: np.empty(0))
+    supernode_volume: np.ndarray = field(default_factory=lambda: np.empty(0))
+    groups: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def kept(self) -> int:
+        return len(self.keep)
+
+    @property
+    def n_nodes(self) -> int:
+        return len(self.keep) + len(self.supernode_ids)
+
+    def meta(self, rank_by: RankBy, group_by: Optional[GroupBy]) -> dict:
+        return {
+            "total_nodes": self.total_nodes,
+            "kept": self.kept,
+            "pruned": self.total_nodes - self.kept,
+            "rank_by": rank_by.value,
+            "group_by": group_by.value if group_by else None,
+            "groups": self.groups,
+        }
+
+
+def _group_key(entity: dict, group_by: GroupBy) -> str:
+    if group_by == GroupBy.bank:
+        return str(entity.get("bank") or "unknown")
+    return str(entity.get("jurisdiction_bucket", -1))
+
+
+def build_lod_view(
+    dataset: "Dataset",
+    ranking: BucketRanking,
+    max_nodes: Optional[int],
+    min_risk: float,
+    rank_by: RankBy,
+    group_by: Optional[GroupBy],
+) -> LodView:
+    keep = ranking.select(max_nodes, min_risk, rank_by)
+    slot = np.full(len(dataset.ids), -1, dtype=np.int64)
+    slot[ranking.codes[keep]] = np.arange(len(keep))
+    view = LodView(keep=keep, slot=slot, total_nodes=len(ranking))
+    if group_by is None:
+        return view
+
+    pruned = np.ones(len(ranking), dtype=bool)
+    pruned[keep] = False
+    pruned = np.flatnonzero(pruned)
+    if not len(pruned):
+        return view
+
+    group_of, labels = ranking.groups(dataset, group_by)
+    group = group_of[pruned]
+    n_groups = len(labels)
+    size = np.bincount(group, minlength=n_groups)
+    volume = np.bincount(group, weights=ranking.volume[pruned], minlength=n_groups)
+    risk = np.zeros(n_groups)
+    np.maximum.at(risk, group, ranking.risk[pruned])
+    jurisdiction = ranking.jurisdictions(dataset)[pruned]
+    j_min = np.full(n_groups, np.iinfo(np.int64).max, dtype=np.int64)
+    j_max = np.full(n_groups, np.iinfo(np.int64).min, dtype=np.int64)
+    np.minimum.at(j_min, group, jurisdiction)
+    np.maximum.at(j_max, group, jurisdiction)
+
+    present = np.flatnonzero(size)
+    group_slot = np.full(n_groups, -1, dtype=np.int64)
+    group_slot[present] = len(keep) + np.arange(len(present))
+    slot[ranking.codes[pruned]] = group_slot[group]
+    view.supernode_ids = [f"group:{group_by.value}:{labels[g]}" for g in present.tolist()]
+    view.supernode_jurisdiction = np.where(j_min == j_max, j_min, -1)[present]
+    view.supernode_risk = risk[present]
+    view.supernode_volume = volume[present]
+    view.groups = dict(zip(view.supernode_ids, size[present].tolist()))
+    return view
+
+
+def edge_dicts(
+    from_ids: list[str],
+    to_ids: list[str],
+    count: np.ndarray,
+    total: np.ndarray,
+    min_amount: np.ndarray,
+    max_amount: np.ndarray,
+    first_ts: np.ndarray,
+    last_ts: np.ndarray,
+) -> list[dict]:
+    """Aggregated edge dicts; ``amount`` is the total so styling still works."""
+    totals = np.round(total, 2).tolist()
+    return [
+        {
+            "from_id": f,
+            "to_id": to,
+            "amount": tot,
+            "count": n,
+            "total": tot,
+            "min_amount": lo,
+            "max_amount": hi,
+            "first_ts": first,
+            "last_ts": last,
+        }
+        for f, to, tot, n, lo, hi, first, last in zip(
+            from_ids,
+            to_ids,
+            totals,
+            count.tolist(),
+            min_amount.tolist(),
+            max_amount.tolist(),
+            first_ts.tolist(),
+            last_ts.tolist(),
+        )
+    ]
+
+
+def pair_edges(graph: "BucketGraph", names: list[str], pair_ids: Optional[np.ndarray] = None) -> list[dict]:
+    """Aggregated edges for ``pair_ids`` (default all), named by bucket-local node."""
+    if pair_ids is None:
+        pair_ids = np.arange(graph.n_pairs)
+    return edge_dicts(
+        [names[i] for i in graph.pair_from[pair_ids].tolist()],
+        [names[i] for i in graph.pair_to[pair_ids].tolist()],
+        graph.pair_count[pair_ids],
+        graph.pair_total[pair_ids],
+        graph.pair_min[pair_ids],
+        graph.pair_max[pair_ids],
+        graph.pair_first_ts[pair_ids],
+        graph.pair_last_ts[pair_ids],
+    )
+
+
+def grouped_pairs(graph: "BucketGraph", view: LodView) -> tuple[np.ndarray, ...]:
+    """Pair aggregates remapped onto the view's nodes and supernodes.
+
+    Pairs touching hidden entities and flows inside one supernode are
+    dropped; the rest are merged per (node, node) in first-occurrence order.
+    Returns output node indices ``src``, ``dst`` and the merged count, total,
+    min/max amount and first/last timestamp.
+    """
+    src = view.slot[graph.codes[graph.pair_from]]
+    dst = view.slot[graph.codes[graph.pair_to]]
+    keep = (src >= 0) & (dst >= 0) & (src != dst)
+    if not keep.any():
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty, np.empty(0), np.empty(0), np.empty(0), empty, empty
+    pair_ids = np.flatnonzero(keep)
+    src, dst = src[keep], dst[keep]
+
+    _, first, inverse = np.unique(src * view.n_nodes + dst, return_index=True, return_inverse=True)
+    order = np.argsort(first, kind="stable")
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    edge = rank[inverse]
+    n_edges = len(order)
+
+    count = np.bincount(edge, weights=graph.pair_count[pair_ids], minlength=n_edges).astype(np.int64)
+    total = np.bincount(edge, weights=graph.pair_total[pair_ids], minlength=n_edges)
+    min_amount = np.full(n_edges, np.inf)
+    max_amount = np.full(n_edges, -np.inf)
+    first_ts = np.full(n_edges, np.iinfo(np.int64).max, dtype=np.int64)
+    last_ts = np.full(n_edges, np.iinfo(np.int64).min, dtype=np.int64)
+    np.minimum.at(min_amount, edge, graph.pair_min[pair_ids])
+    np.maximum.at(max_amount, edge, graph.pair_max[pair_ids])
+    np.minimum.at(first_ts, edge, graph.pair_first_ts[pair_ids])
+    np.maximum.at(last_ts, edge, graph.pair_last_ts[pair_ids])
+
+    first = first[order]
+    return src[first], dst[first], count, total, min_amount, max_amount, first_ts, last_ts
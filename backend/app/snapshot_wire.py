@@ -0,0 +1,403 @@
+"""Columnar /snapshot assembly and binary encodings.
+
+``build_snapshot_columns`` gathers a snapshot as NumPy columns straight from
+the bucket's cached ``BucketRanking`` / ``BucketGraph`` / ``BucketColumns``.
+The JSON response materializes nodes and edges from it; binary responses
+write the columns out without creating per-row objects.
+
+``/snapshot`` picks the encoding from the ``Accept`` header:
+
+- ``application/vnd.angela.snapshot``: typed-array layout below
+- ``application/vnd.apache.arrow.stream``: Arrow IPC stream (needs pyarrow)
+- anything else: JSON
+
+Typed-array layout::
+
+    8 bytes   magic  b"ANGWIRE\\x01"
+    8 bytes   little-endian uint64 header length
+    N bytes   UTF-8 JSON header (meta, label tables, array directory)
+    padding   to an 8-byte boundary
+    arrays    raw little-endian arrays, each 8-byte aligned
+
+Every array is described in the header as ``{"dtype", "length", "offset"}``
+with offsets relative to the start of the array section, so a browser can
+wrap each one in a typed array view without copying.
+
+Columns:
+
+- ``id_blob`` / ``id_offsets``: packed UTF-8 IDs. The first ``n_nodes`` are
+  the nodes, in output order; any further ones are edge endpoints without
+  an entity record.
+- ``node_*``: ``jurisdiction``, ``kyc`` and ``entity_type`` (indices into
+  the header's ``kyc_levels`` / ``entity_types``), ``risk``, ``volume``.
+- ``edge_src`` / ``edge_dst`` (indices into the IDs) and ``edge_amount``.
+  Aggregated snapshots add ``edge_count``, ``edge_min_amount``,
+  ``edge_max_amount``, ``edge_first_ts`` and ``edge_last_ts``;
+  ``edge_amount`` is then the pair total.
+
+The Arrow stream holds a single record batch with one row: ``ids`` as a
+list of strings and every other column as a list of its values. The meta and
+label tables are stored in the schema metadata.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Optional
+
+import numpy as np
+
+from .columnar import StringColumn
+from .models import SnapshotNode
+from .snapshot_lod import GroupBy, LodView, RankBy, build_lod_view, edge_dicts, grouped_pairs
+
+if TYPE_CHECKING:
+    from .data_loader import Dataset
+
+COLUMNS_MEDIA_TYPE = "application/vnd.angela.snapshot"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+MAGIC = b"ANGWIRE\x01"
+WIRE_VERSION = 1
+_ALIGN = 8
+
+_JSON_TYPES = {"application/json", "application/*", "*/*"}
+
+# Wire dtype of each column
+_NODE_DTYPES = {
+    "node_jurisdiction": "<i4",
+    "node_kyc": "<u2",
+    "node_entity_type": "<u2",
+    "node_risk": "<f8",
+    "node_volume": "<f8",
+}
+_EDGE_DTYPES = {
+    "edge_src": "<i4",
+    "edge_dst": "<i4",
+    "edge_amount": "<f8",
+}
+_PAIR_DTYPES = {
+    "edge_count": "<i4",
+    "edge_min_amount": "<f8",
+    "edge_max_amount": "<f8",
+    "edge_first_ts": "<i8",
+    "edge_last_ts": "<i8",
+}
+
+
+def _pad(n: int) -> int:
+    return (-n) % _ALIGN
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError:
+        return None
+    return pyarrow
+
+
+def negotiate(accept: Optional[str]) -> Optional[str]:
+    """Binary media type to answer ``accept`` with, or None for JSON.
+
+    Media ranges are tried by descending ``q`` (ties keep header order);
+    Arrow is skipped when pyarrow is not installed.
+    """
+    if not accept:
+        return None
+    ranked = []
+    for position, part in enumerate(accept.split(",")):
+        media, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            ranked.append((-q, position, media.lower()))
+    for _, _, media in sorted(ranked):
+        if media == COLUMNS_MEDIA_TYPE:
+            return media
+        if media == ARROW_MEDIA_TYPE and _pyarrow() is not None:
+            return media
+        if media in _JSON_TYPES:
+            return None
+    return None
+
+
+@dataclass
+class SnapshotColumns:
+    """One snapshot as columns; see the module docstring for the layout."""
+
+    ids: list[str]
+    n_nodes: int
+    nodes: dict[str, np.ndarray]
+    kyc_levels: list[str]
+    entity_types: list[str]
+    edges: dict[str, np.ndarray]
+    aggregated: bool = False
+    lod: Optional[dict] = None
+
+    @property
+    def n_edges(self) -> int:
+        return len(self.edges["edge_src"])
+
+    # -- JSON --
+
+    def node_models(self) -> list[SnapshotNode]:
+        n = self.nodes
+        kyc_levels, entity_types = self.kyc_levels, self.entity_types
+        return [
+            SnapshotNode(
+                id=node_id,
+                jurisdiction_bucket=j,
+                kyc_level=kyc_levels[k],
+                risk_score=risk,
+                entity_type=entity_types[e],
+                volume=volume,
+            )
+            for node_id, j, k, e, risk, volume in zip(
+                self.ids[:self.n_nodes],
+                n["node_jurisdiction"].tolist(),
+                n["node_kyc"].tolist(),
+                n["node_entity_type"].tolist(),
+                n["node_risk"].tolist(),
+                n["node_volume"].tolist(),
+            )
+        ]
+
+    def edge_dicts(self) -> list[dict]:
+        e = self.edges
+        from_ids = [self.ids[i] for i in e["edge_src"].tolist()]
+        to_ids = [self.ids[i] for i in e["edge_dst"].tolist()]
+        if not self.aggregated:
+            return [
+                {"from_id": f, "to_id": to, "amount": amount}
+                for f, to, amount in zip(from_ids, to_ids, e["edge_amount"].tolist())
+            ]
+        return edge_dicts(
+            from_ids,
+            to_ids,
+            e["edge_count"],
+            e["edge_amount"],
+            e["edge_min_amount"],
+            e["edge_max_amount"],
+            e["edge_first_ts"],
+            e["edge_last_ts"],
+        )
+
+    # -- Binary --
+
+    def _arrays(self) -> dict[str, np.ndarray]:
+        dtypes = {**_NODE_DTYPES, **_EDGE_DTYPES, **(_PAIR_DTYPES if self.aggregated else {})}
+        columns = {**self.nodes, **self.edges}
+        return {name: np.ascontiguousarray(columns[name], dtype=dtype) for name, dtype in dtypes.items()}
+
+    def _header(self, meta: dict) -> dict:
+        return {
+            "version": WIRE_VERSION,
+            "meta": meta,
+            "n_nodes": self.n_nodes,
+            "n_edges": self.n_edges,
+            "kyc_levels": self.kyc_levels,
+            "entity_types": self.entity_types,
+        }
+
+    def encode(self, meta: dict, media_type: str) -> bytes:
+        if media_type == ARROW_MEDIA_TYPE:
+            return self.to_arrow(meta)
+        return self.to_columns(meta)
+
+    def to_columns(self, meta: dict) -> bytes:
+        ids = StringColumn.pack(self.ids)
+        arrays = {
+            "id_blob": ids.blob,
+            "id_offsets": ids.offsets.astype("<i4"),
+            **self._arrays(),
+        }
+        directory = {}
+        offset = 0
+        for name, arr in arrays.items():
+            directory[name] = {"dtype": arr.dtype.str, "length": len(arr), "offset": offset}
+            offset += arr.nbytes + _pad(arr.nbytes)
+
+        header = self._header(meta)
+        header["arrays"] = directory
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+
+        parts = [
+            MAGIC,
+            len(header_bytes).to_bytes(8, "little"),
+            header_bytes,
+            b"\x00" * _pad(len(MAGIC) + 8 + len(header_bytes)),
+        ]
+        for arr in arrays.values():
+            parts.append(arr.tobytes())
+            parts.append(b"\x00" * _pad(arr.nbytes))
+        return b"".join(parts)
+
+    def to_arrow(self, meta: dict) -> bytes:
+        pa = _pyarrow()
+        if pa is None:
+            raise RuntimeError("pyarrow is required for Arrow snapshots. Install with: pip install pyarrow")
+
+        def single_row(values: Any) -> Any:
+            return pa.ListArray.from_arrays(pa.array([0, len(values)], type=pa.int32()), values)
+
+        names = ["ids"]
+        columns = [single_row(pa.array(self.ids, type=pa.string()))]
+        for name, arr in self._arrays().items():
+            names.append(name)
+            columns.append(single_row(pa.array(arr)))
+        metadata = {f"angela.{key}": json.dumps(value) for key, value in self._header(meta).items()}
+        batch = pa.RecordBatch.from_arrays(columns, names=names)
+        batch = batch.replace_schema_metadata(metadata)
+
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, batch.schema) as writer:
+            writer.write_batch(batch)
+        return sink.getvalue().to_pybytes()
+
+
+def decode_columns(data: bytes) -> tuple[dict, dict[str, np.ndarray]]:
+    """Header and array views of a typed-array snapshot."""
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError("Not an Angela wire snapshot")
+    header_len = int.from_bytes(data[len(MAGIC):len(MAGIC) + 8], "little")
+    start = len(MAGIC) + 8
+    header = json.loads(data[start:start + header_len])
+    base = start + header_len
+    base += _pad(base)
+    arrays = {
+        name: np.frombuffer(data, dtype=np.dtype(spec["dtype"]), count=spec["length"], offset=base + spec["offset"])
+        for name, spec in header["arrays"].items()
+    }
+    return header, arrays
+
+
+def _add_label(labels: list[str], label: str) -> tuple[list[str], int]:
+    if label in labels:
+        return labels, labels.index(label)
+    return labels + [label], len(labels)
+
+
+def _with_supernodes(columns: SnapshotColumns, view: LodView) -> None:
+    k = len(view.supernode_ids)
+    columns.kyc_levels, kyc = _add_label(columns.kyc_levels, "aggregate")
+    columns.entity_types, entity_type = _add_label(columns.entity_types, "supernode")
+    extra = {
+        "node_jurisdiction": view.supernode_jurisdiction,
+        "node_kyc": np.full(k, kyc, dtype=np.int64),
+        "node_entity_type": np.full(k, entity_type, dtype=np.int64),
+        "node_risk": view.supernode_risk,
+        "node_volume": view.supernode_volume,
+    }
+    columns.nodes = {name: np.concatenate([arr, extra[name]]) for name, arr in columns.nodes.items()}
+    columns.ids = columns.ids + view.supernode_ids
+    columns.n_nodes += k
+
+
+def _endpoints(
+    columns: SnapshotColumns,
+    dataset: "Dataset",
+    slot: np.ndarray,
+    from_code: np.ndarray,
+    to_code: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Output indices of edge endpoints; codes without a node get an extra ID."""
+    src, dst = slot[from_code], slot[to_code]
+    missing = np.concatenate([from_code[src < 0], to_code[dst < 0]])
+    if len(missing):
+        extra = np.unique(missing)
+        slot = slot.copy()
+        slot[extra] = len(columns.ids) + np.arange(len(extra))
+        columns.ids = columns.ids + dataset.ids.lookup(extra)
+        src, dst = slot[from_code], slot[to_code]
+    return src, dst
+
+
+def build_snapshot_columns(
+    dataset: "Dataset",
+    t: int,
+    aggregate: bool = False,
+    max_nodes: Optional[int] = None,
+    min_risk: float = 0.0,
+    rank_by: RankBy = RankBy.risk,
+    group_by: Optional[GroupBy] = None,
+) -> SnapshotColumns:
+    """Snapshot of bucket ``t`` with the ``/snapshot`` query semantics."""
+    ranking = dataset.get_bucket_ranking(t)
+    jurisdiction, kyc, kyc_levels, entity_type, entity_types = ranking.attributes(dataset)
+
+    view: Optional[LodView] = None
+    lod = None
+    if max_nodes is None and min_risk <= 0 and group_by is None:
+        keep = np.arange(len(ranking))
+        slot = np.full(len(dataset.ids), -1, dtype=np.int64)
+        slot[ranking.codes] = keep
+    else:
+        view = build_lod_view(dataset, ranking, max_nodes, min_risk, rank_by, group_by)
+        keep, slot = view.keep, view.slot
+        lod = view.meta(rank_by, group_by)
+
+    columns = SnapshotColumns(
+        ids=[ranking.ids[i] for i in keep.tolist()],
+        n_nodes=len(keep),
+        nodes={
+            "node_jurisdiction": jurisdiction[keep],
+            "node_kyc": kyc[keep],
+            "node_entity_type": entity_type[keep],
+            "node_risk": ranking.risk[keep],
+            "node_volume": ranking.volume[keep],
+        },
+        kyc_levels=kyc_levels,
+        entity_types=entity_types,
+        edges={},
+        aggregated=aggregate,
+        lod=lod,
+    )
+    if view is not None and view.supernode_ids:
+        _with_supernodes(columns, view)
+
+    if group_by is not None:
+        # Supernode edges are always merged per (node, node)
+        columns.aggregated = True
+        src, dst, count, total, min_amount, max_amount, first_ts, last_ts = grouped_pairs(
+            dataset.get_bucket_graph(t), view,
+        )
+    elif aggregate:
+        graph = dataset.get_bucket_graph(t)
+        from_code, to_code = graph.codes[graph.pair_from], graph.codes[graph.pair_to]
+        pair_ids = slice(None)
+        if view is not None:
+            pair_ids = np.flatnonzero((slot[from_code] >= 0) & (slot[to_code] >= 0))
+            from_code, to_code = from_code[pair_ids], to_code[pair_ids]
+        src, dst = _endpoints(columns, dataset, slot, from_code, to_code)
+        count, total = graph.pair_count[pair_ids], graph.pair_total[pair_ids]
+        min_amount, max_amount = graph.pair_min[pair_ids], graph.pair_max[pair_ids]
+        first_ts, last_ts = graph.pair_first_ts[pair_ids], graph.pair_last_ts[pair_ids]
+    else:
+        cols = dataset.get_bucket_columns(t)
+        mask = cols.non_self()
+        if view is not None:
+            mask = mask & (slot[cols.from_code] >= 0) & (slot[cols.to_code] >= 0)
+        src, dst = _endpoints(columns, dataset, slot, cols.from_code[mask], cols.to_code[mask])
+        columns.edges = {"edge_src": src, "edge_dst": dst, "edge_amount": cols.amount[mask]}
+        return columns
+
+    columns.edges = {
+        "edge_src": src,
+        "edge_dst": dst,
+        # Rounded like the JSON ``amount`` / ``total``
+        "edge_amount": np.round(total, 2),
+        "edge_count": count,
+        "edge_min_amount": min_amount,
+        "edge_max_amount": max_amount,
+        "edge_first_ts": first_ts,
+        "edge_last_ts": last_ts,
+    }
+    return columns
@@ -0,0 +1,305 @@
+"""Background dataset upload jobs.
+
+Uploads are parsed, indexed and scored into a new ``Dataset`` generation
+on a worker thread while the current one keeps serving requests. Progress
+is published as ``UPLOAD_PROGRESS`` on ``/stream``. When a job finishes,
+the generation is published to the shared store; a job cancelled before
+that point leaves the current dataset untouched.
+
+After a swap, the generation is also written as a binary snapshot (see
+``binary_snapshot``) under ``ANGELA_CACHE_DIR/uploads``, keyed by the
+upload's content and the detector fingerprint and carrying the risk tables
+just computed. Uploading the same content again maps that file instead of
+parsing and rescoring it. The ``ANGELA_UPLOAD_SNAPSHOTS`` most recently
+used files are kept; ``0`` disables them.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional
+from uuid import uuid4
+
+from .binary_snapshot import SNAPSHOT_SUFFIX, write_binary_snapshot
+from .config import CACHE_DIR
+from .data_loader import Dataset, DataStore, store
+from .risk.scoring import detector_fingerprint
+from .ws import manager
+
+log = logging.getLogger(__name__)
+
+Broadcast = Callable[[str, dict], Awaitable[None]]
+# Turns the uploaded bytes into a snapshot dict; raises ValueError on bad input
+SnapshotParser = Callable[[], dict]
+
+MAX_UPLOAD_JOBS = max(1, int(os.getenv("ANGELA_UPLOAD_JOB_HISTORY", "20")))
+UPLOAD_SNAPSHOTS = max(0, int(os.getenv("ANGELA_UPLOAD_SNAPSHOTS", "4")))
+UPLOAD_SNAPSHOT_DIR = CACHE_DIR / "uploads"
+
+FINISHED = {"succeeded", "failed", "cancelled"}
+
+# Share of the progress bar given to each stage
+_PARSE_SHARE = 0.3
+_SCORE_SHARE = 0.65
+
+
+class UploadCancelled(Exception):
+    """Raised on the worker thread when a job's cancellation is noticed."""
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class UploadJob:
+    kind: str
+    filename: str
+    id: str = field(default_factory=lambda: uuid4().hex)
+    status: str = "queued"
+    stage: str = "queued"
+    progress: float = 0.0
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created_at: str = field(default_factory=_now_iso)
+    finished_at: Optional[str] = None
+    cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def done(self) -> bool:
+        return self.status in FINISHED
+
+    def check_cancelled(self) -> None:
+        if self.cancel_event.is_set():
+            raise UploadCancelled()
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "filename": self.filename,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "cancel_requested": self.cancel_event.is_set() and not self.done,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class UploadJobManager:
+    """Runs upload jobs one at a time and keeps the most recent ones."""
+
+    def __init__(
+        self,
+        store: DataStore,
+        broadcast: Optional[Broadcast] = None,
+        history: int = MAX_UPLOAD_JOBS,
+        snapshot_dir: Optional[Path] = None,
+        keep_snapshots: int = UPLOAD_SNAPSHOTS,
+    ) -> None:
+        self.store = store
+        self.broadcast = broadcast
+        self.history = history
+        self.snapshot_dir = snapshot_dir
+        self.keep_snapshots = keep_snapshots
+        self._jobs: OrderedDict[str, UploadJob] = OrderedDict()
+        self._lock = threading.Lock()
+        # One worker: uploads replace the whole dataset, so they apply in order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="angela-upload")
+        self._tasks: set[asyncio.Task] = set()
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def recent(self) -> list[UploadJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def submit(
+        self,
+        kind: str,
+        filename: str,
+        parse: SnapshotParser,
+        on_swap: Optional[Callable[[], None]] = None,
+        content_key: Optional[str] = None,
+    ) -> UploadJob:
+        """Queue a job; must be called from the event loop.
+
+        ``content_key`` identifies what ``parse`` would return (e.g. a hash
+        of the uploaded bytes and options); jobs without one are not
+        written as, or served from, binary snapshots.
+        """
+        job = UploadJob(kind=kind, filename=filename)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.history:
+                oldest = next(iter(self._jobs.values()))
+                if not oldest.done:
+                    break
+                self._jobs.popitem(last=False)
+
+        # A fresh context: the job must not inherit the submitting request's
+        # pinned dataset generation (see DataStore.pinned)
+        task = asyncio.get_running_loop().create_task(
+            self._run(job, parse, on_swap, self._snapshot_path(content_key)),
+            context=contextvars.Context(),
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        log.info(f"Upload job {job.id[:8]} queued ({kind}, {filename})")
+        return job
+
+    def cancel(self, job_id: str) -> Optional[UploadJob]:
+        """Request cancellation; a finished job is returned unchanged."""
+        job = self.get(job_id)
+        if job is not None and not job.done:
+            job.cancel_event.set()
+        return job
+
+    def _snapshot_path(self, content_key: Optional[str]) -> Optional[Path]:
+        if content_key is None or self.snapshot_dir is None or self.keep_snapshots <= 0:
+            return None
+        digest = hashlib.blake2b(f"{content_key}:{detector_fingerprint()}".encode("utf-8"), digest_size=16)
+        return self.snapshot_dir / f"{digest.hexdigest()}{SNAPSHOT_SUFFIX}"
+
+    async def _run(
+        self,
+        job: UploadJob,
+        parse: SnapshotParser,
+        on_swap: Optional[Callable[[], None]],
+        snapshot_path: Optional[Path],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        to_save: Optional[tuple[dict, dict[int, dict]]] = None
+        try:
+            staged, to_save = await loop.run_in_executor(self._executor, self._build, job, parse, loop, snapshot_path)
+            # Last chance to cancel; nothing awaits between here and the swap
+            job.check_cancelled()
+            generation = self.store.publish(staged)
+            if on_swap is not None:
+                on_swap()
+            job.result = {
+                "status": "ok",
+                "n_entities": len(staged.entities),
+                "n_transactions": len(staged.transactions),
+                "n_buckets": staged.n_buckets,
+                "generation": generation,
+            }
+            self._finish(job, "succeeded")
+            log.info(f"Upload job {job.id[:8]} swapped in {job.result['n_transactions']} transactions")
+        except UploadCancelled:
+            self._finish(job, "cancelled")
+            log.info(f"Upload job {job.id[:8]} cancelled")
+        except ValueError as exc:
+            self._finish(job, "failed", error=str(exc))
+        except Exception as exc:
+            log.exception(f"Upload job {job.id[:8]} failed")
+            self._finish(job, "failed", error=f"{type(exc).__name__}: {exc}")
+        await self._publish(job)
+        if job.status == "succeeded" and to_save is not None:
+            await loop.run_in_executor(self._executor, self._save_snapshot, snapshot_path, *to_save)
+
+    def _build(
+        self,
+        job: UploadJob,
+        parse: SnapshotParser,
+        loop: asyncio.AbstractEventLoop,
+        snapshot_path: Optional[Path],
+    ) -> tuple[Dataset, Optional[tuple[dict, dict[int, dict]]]]:
+        """Worker thread: parse and score a generation nobody reads yet.
+
+        Also returns the snapshot dict and risk tables to write to
+        ``snapshot_path`` once the generation is published, if any.
+        """
+        job.check_cancelled()
+        job.status = "running"
+        if snapshot_path is not None and snapshot_path.exists():
+            self._report(job, loop, "mapping", 0.0)
+            try:
+                staged = self.store.build(snapshot_path)
+                snapshot_path.touch()  # mtime is the recency used for pruning
+                job.check_cancelled()
+                self._report(job, loop, "swapping", _PARSE_SHARE + _SCORE_SHARE)
+                return staged, None
+            except (OSError, ValueError) as exc:
+                log.warning(f"Upload snapshot {snapshot_path.name} unusable, rebuilding: {exc}")
+
+        self._report(job, loop, "parsing", 0.0)
+        snapshot = parse()
+        job.check_cancelled()
+
+        self._report(job, loop, "scoring", _PARSE_SHARE)
+        last = [0.0]
+
+        def on_progress(done: int, total: int) -> None:
+            job.check_cancelled()
+            fraction = done / max(total, 1)
+            # Publish at most ~50 updates per job
+            if fraction - last[0] >= 0.02 or done == total:
+                last[0] = fraction
+                self._report(job, loop, "scoring", _PARSE_SHARE + _SCORE_SHARE * fraction)
+
+        staged = self.store.build_from_dict(snapshot, progress=on_progress)
+        job.check_cancelled()
+        self._report(job, loop, "swapping", _PARSE_SHARE + _SCORE_SHARE)
+        if snapshot_path is None:
+            return staged, None
+        # Copied before the swap: the live generation shares these objects
+        # with ``snapshot``, and appends add to them in place (entities,
+        # metadata, nested activity counts) or replace entries (risk)
+        saved = dict(
+            snapshot,
+            metadata=dict(snapshot["metadata"]),
+            entities=list(snapshot["entities"]),
+            entity_activity={
+                bucket: {eid: dict(entry) for eid, entry in activity.items()}
+                for bucket, activity in snapshot.get("entity_activity", {}).items()
+            },
+        )
+        risk = {b: dict(staged.risk_by_bucket.get(b, {})) for b in range(staged.n_buckets)}
+        return staged, (saved, risk)
+
+    def _save_snapshot(self, path: Path, snapshot: dict, risk: dict[int, dict]) -> None:
+        """Worker thread: write the binary snapshot, then drop the least recently used ones."""
+        try:
+            write_binary_snapshot(path, snapshot, risk_by_bucket=risk)
+            snapshots = sorted(path.parent.glob(f"*{SNAPSHOT_SUFFIX}"), key=lambda p: p.stat().st_mtime, reverse=True)
+            for stale in snapshots[self.keep_snapshots:]:
+                stale.unlink(missing_ok=True)
+        except Exception as exc:
+            log.warning(f"Could not write upload snapshot {path.name}: {exc}")
+
+    def _report(self, job: UploadJob, loop: asyncio.AbstractEventLoop, stage: str, progress: float) -> None:
+        job.stage = stage
+        job.progress = progress
+        if self.broadcast is not None:
+            asyncio.run_coroutine_threadsafe(self._publish(job), loop)
+
+    def _finish(self, job: UploadJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.stage = status
+        job.error = error
+        job.finished_at = _now_iso()
+        if status == "succeeded":
+            job.progress = 1.0
+
+    async def _publish(self, job: UploadJob) -> None:
+        if self.broadcast is not None:
+            await self.broadcast("UPLOAD_PROGRESS", job.to_dict())
+
+
+upload_jobs = UploadJobManager(store, manager.broadcast, snapshot_dir=UPLOAD_SNAPSHOT_DIR)
@@ -0,0 +1,13 @@
+import os
+import shutil
+import tempfile
+
+# Derived caches (risk tables, LLM responses, upload snapshots) go to a
+# per-session directory instead of the developer's .angela_cache. Set here,
+# before any test module imports app and CACHE_DIR is read.
+_CACHE_DIR = tempfile.mkdtemp(prefix="angela-test-cache-")
+os.environ["ANGELA_CACHE_DIR"] = _CACHE_DIR
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_CACHE_DIR, ignore_errors=True)
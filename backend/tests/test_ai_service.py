@@ -0,0 +1,120 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app.ai import providers, service
+from app.ai.providers import ConcurrencyGovernor, Priority
+from app.ai.response_store import LLMResponseStore
+
+
+class _FakeProvider:
+    name = "fake"
+
+    def __init__(self, delay: float = 0.2) -> None:
+        self.delay = delay
+        self.prompts: list[str] = []
+
+    async def complete(self, user_prompt: str, system_prompt: str, max_tokens: int) -> str:
+        self.prompts.append(user_prompt)
+        await asyncio.sleep(self.delay)
+        return f"answer to {' '.join(user_prompt.split())}"
+
+    @staticmethod
+    def is_retryable(exc: BaseException) -> bool:
+        return False
+
+
+@pytest.fixture
+def fake_provider(monkeypatch, tmp_path):
+    fake = _FakeProvider()
+    monkeypatch.setattr(providers, "provider", fake)
+    monkeypatch.setattr(providers, "response_store", LLMResponseStore(tmp_path / "responses.sqlite3"))
+    service.clear_ai_caches()
+    yield fake
+    service.clear_ai_caches()
+
+
+@pytest.mark.anyio
+async def test_identical_prompts_share_one_request(fake_provider):
+    coalesced = providers.single_flight.coalesced
+    results = await asyncio.gather(
+        *(service.call_llm("same   prompt ") for _ in range(4)),
+        asyncio.to_thread(service._call_llm, "same prompt"),
+        service.call_llm("other prompt"),
+    )
+    assert results[:5] == ["answer to same prompt"] * 5
+    assert results[5] == "answer to other prompt"
+    assert len(fake_provider.prompts) == 2
+    assert providers.single_flight.coalesced - coalesced == 4
+
+
+@pytest.mark.anyio
+async def test_governor_admits_by_priority():
+    governor = ConcurrencyGovernor(limit=1)
+    order: list[str] = []
+
+    async def job(name: str, priority: Priority) -> None:
+        async with governor.slot(priority):
+            order.append(name)
+            await asyncio.sleep(0.01)
+
+    first = asyncio.create_task(job("first", Priority.INTERACTIVE))
+    await asyncio.sleep(0)
+    await asyncio.gather(
+        first,
+        job("warmup", Priority.BACKGROUND),
+        job("agent", Priority.AGENT),
+        job("analyst", Priority.INTERACTIVE),
+    )
+    assert order == ["first", "analyst", "agent", "warmup"]
+    assert governor.active == 0
+
+
+@pytest.mark.anyio
+async def test_responses_survive_cache_clears(fake_provider):
+    first = await service.call_llm("explain entity A")
+    service.clear_ai_caches()
+    assert await service.call_llm("explain  entity A") == first
+    assert len(fake_provider.prompts) == 1
+    stats = providers.response_store.stats()
+    assert stats["entries"] == 1
+    assert stats["hits"] == 1
+
+
+def test_response_store_ttl_and_byte_budget(tmp_path, monkeypatch):
+    store = LLMResponseStore(tmp_path / "responses.sqlite3", max_bytes=100, ttl_seconds=60)
+    keys = [("p", "m", 200, "sys", f"user{i}") for i in range(4)]
+    for key in keys[:3]:
+        store.put(key, "x" * 30)
+        time.sleep(0.01)
+    # Touch the oldest entry so the second one is evicted instead
+    assert store.get(keys[0]) is not None
+    time.sleep(0.01)
+    store.put(keys[3], "x" * 30)
+    assert store.get(keys[1]) is None
+    assert store.get(keys[0]) is not None
+    assert store.stats()["bytes"] <= 100
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert store.get(keys[3]) is None
+
+
+def test_response_store_buffers_reads_and_tracks_bytes(tmp_path):
+    path = tmp_path / "responses.sqlite3"
+    store = LLMResponseStore(path, max_bytes=100, ttl_seconds=60)
+    keys = [("p", "m", 200, "sys", f"user{i}") for i in range(5)]
+    for key in keys:
+        store.put(key, "x" * 30)
+    store.put(keys[4], "y" * 10)
+
+    assert store.get(keys[4]) == "y" * 10
+    with sqlite3.connect(path) as conn:
+        # Hits are counted in memory until the next flush
+        assert conn.execute("SELECT value FROM counters WHERE name = 'hits'").fetchone() is None
+        actual = conn.execute("SELECT SUM(size) FROM responses").fetchone()[0]
+    stats = store.stats()
+    assert stats["hits"] == 1
+    assert stats["bytes"] == actual <= 100
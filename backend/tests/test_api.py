@@ -1,9 +1,20 @@
+import json
+import threading
+
+import anyio
 import pytest
 from httpx import ASGITransport, AsyncClient
 
+from app.assets.generator import GLBAsset, glb_cache
+from app.clusters import detect_clusters
 from app.config import DATA_PATH
-from app.data_loader import store
+from app.dashboard import DashboardAggregates, get_aggregates
+from app.data_loader import Dataset, DataStore, store
+from app.ingest import apply_batch, normalize_record
 from app.main import app
+from app.response_cache import CachedResponse, ResponseCache, Scope
+from app.snapshot_wire import ARROW_MEDIA_TYPE, COLUMNS_MEDIA_TYPE, decode_columns, negotiate
+from app.upload_jobs import UploadJob, UploadJobManager
 
 
 @pytest.fixture
@@ -34,6 +45,168 @@ async def test_snapshot_valid(client):
     assert len(data["nodes"]) > 0
 
 
+@pytest.mark.anyio
+async def test_snapshot_aggregate_collapses_pairs(client):
+    raw = (await client.get("/snapshot", params={"t": 0})).json()
+    r = await client.get("/snapshot", params={"t": 0, "aggregate": True})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["meta"]["aggregated"] is True
+    assert data["nodes"] == raw["nodes"]
+
+    expected: dict[tuple[str, str], list[float]] = {}
+    for e in raw["edges"]:
+        expected.setdefault((e["from_id"], e["to_id"]), []).append(e["amount"])
+    assert [(e["from_id"], e["to_id"]) for e in data["edges"]] == list(expected)
+    for edge in data["edges"]:
+        amounts = expected[(edge["from_id"], edge["to_id"])]
+        assert edge["count"] == len(amounts)
+        assert edge["total"] == pytest.approx(sum(amounts))
+        assert (edge["min_amount"], edge["max_amount"]) == (min(amounts), max(amounts))
+        assert edge["first_ts"] <= edge["last_ts"]
+
+
+@pytest.mark.anyio
+async def test_snapshot_lod_keeps_top_ranked_nodes(client):
+    full = (await client.get("/snapshot", params={"t": 0})).json()
+    r = await client.get("/snapshot", params={"t": 0, "max_nodes": 5, "rank_by": "volume"})
+    assert r.status_code == 200
+    data = r.json()
+
+    by_volume = sorted(full["nodes"], key=lambda n: -n["volume"])
+    assert {n["id"] for n in data["nodes"]} == {n["id"] for n in by_volume[:5]}
+    assert data["meta"]["lod"]["total_nodes"] == len(full["nodes"])
+    assert data["meta"]["lod"]["pruned"] == len(full["nodes"]) - 5
+    kept = {n["id"] for n in data["nodes"]}
+    assert all(e["from_id"] in kept and e["to_id"] in kept for e in data["edges"])
+
+
+@pytest.mark.anyio
+async def test_snapshot_lod_groups_pruned_nodes_into_supernodes(client):
+    full = (await client.get("/snapshot", params={"t": 0})).json()
+    r = await client.get("/snapshot", params={"t": 0, "min_risk": 0.3, "group_by": "jurisdiction"})
+    data = r.json()
+    lod = data["meta"]["lod"]
+
+    supernodes = [n for n in data["nodes"] if n["entity_type"] == "supernode"]
+    assert supernodes and {n["id"] for n in supernodes} == set(lod["groups"])
+    assert lod["kept"] + sum(lod["groups"].values()) == lod["total_nodes"] == len(full["nodes"])
+    assert all(n["risk_score"] >= 0.3 for n in data["nodes"] if n["entity_type"] != "supernode")
+    assert sum(n["volume"] for n in data["nodes"]) == pytest.approx(sum(n["volume"] for n in full["nodes"]))
+
+    names = {n["id"] for n in data["nodes"]}
+    assert data["meta"]["aggregated"] is True
+    assert all(e["from_id"] in names and e["to_id"] in names and e["from_id"] != e["to_id"] for e in data["edges"])
+
+
+def _decoded_snapshot(data: bytes) -> dict:
+    header, a = decode_columns(data)
+    blob, offsets = a["id_blob"].tobytes(), a["id_offsets"].tolist()
+    ids = [blob[offsets[i]:offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+    nodes = [
+        {
+            "id": ids[i],
+            "jurisdiction_bucket": int(a["node_jurisdiction"][i]),
+            "kyc_level": header["kyc_levels"][a["node_kyc"][i]],
+            "risk_score": float(a["node_risk"][i]),
+            "entity_type": header["entity_types"][a["node_entity_type"][i]],
+            "volume": float(a["node_volume"][i]),
+        }
+        for i in range(header["n_nodes"])
+    ]
+    edges = [
+        (ids[s], ids[d], amount)
+        for s, d, amount in zip(a["edge_src"].tolist(), a["edge_dst"].tolist(), a["edge_amount"].tolist())
+    ]
+    return {"meta": header["meta"], "nodes": nodes, "edges": edges}
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "params",
+    [{}, {"aggregate": True}, {"max_nodes": 20, "group_by": "bank"}],
+)
+async def test_snapshot_binary_matches_json(client, params):
+    params = {"t": 0, **params}
+    expected = (await client.get("/snapshot", params=params)).json()
+    r = await client.get("/snapshot", params=params, headers={"Accept": COLUMNS_MEDIA_TYPE})
+    assert r.status_code == 200
+    assert r.headers["content-type"] == COLUMNS_MEDIA_TYPE
+    assert "Accept" in r.headers["vary"]
+
+    data = _decoded_snapshot(r.content)
+    assert data["meta"] == expected["meta"]
+    assert data["nodes"] == expected["nodes"]
+    assert data["edges"] == [(e["from_id"], e["to_id"], e["amount"]) for e in expected["edges"]]
+
+
+def test_snapshot_accept_negotiation():
+    assert negotiate(None) is None
+    assert negotiate("application/json") is None
+    assert negotiate(COLUMNS_MEDIA_TYPE) == COLUMNS_MEDIA_TYPE
+    assert negotiate(f"application/json;q=0.5, {COLUMNS_MEDIA_TYPE}") == COLUMNS_MEDIA_TYPE
+    assert negotiate(f"{COLUMNS_MEDIA_TYPE};q=0.2, */*;q=0.8") is None
+    assert negotiate(f"{COLUMNS_MEDIA_TYPE};q=0") is None
+
+
+@pytest.mark.anyio
+async def test_snapshot_arrow_stream(client):
+    pa = pytest.importorskip("pyarrow")
+    expected = (await client.get("/snapshot", params={"t": 0})).json()
+    r = await client.get("/snapshot", params={"t": 0}, headers={"Accept": ARROW_MEDIA_TYPE})
+    assert r.headers["content-type"] == ARROW_MEDIA_TYPE
+
+    batch = pa.ipc.open_stream(r.content).read_next_batch()
+    n_nodes = len(expected["nodes"])
+    assert batch.column("ids")[0].as_py()[:n_nodes] == [n["id"] for n in expected["nodes"]]
+    assert batch.column("edge_amount")[0].as_py() == [e["amount"] for e in expected["edges"]]
+
+
+def _keyed(snapshot: dict) -> tuple[dict, dict]:
+    return (
+        {n["id"]: n for n in snapshot["nodes"]},
+        {(e["from_id"], e["to_id"]): e for e in snapshot["edges"]},
+    )
+
+
+def _apply_delta(nodes: dict, edges: dict, delta: dict) -> None:
+    for node_id in delta["nodes_removed"]:
+        del nodes[node_id]
+    for node in delta["nodes_added"]:
+        nodes[node["id"]] = node
+    for change in delta["nodes_changed"]:
+        nodes[change["id"]] = dict(nodes[change["id"]], **change)
+    for edge in delta["edges_removed"]:
+        del edges[(edge["from_id"], edge["to_id"])]
+    for edge in delta["edges_added"] + delta["edges_changed"]:
+        edges[(edge["from_id"], edge["to_id"])] = edge
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("mode", ["compact", "chain"])
+async def test_snapshot_delta_reproduces_target_snapshot(client, mode):
+    last = store.n_buckets - 1
+    start = (await client.get("/snapshot", params={"t": 0, "aggregate": True})).json()
+    target = (await client.get("/snapshot", params={"t": last, "aggregate": True})).json()
+
+    r = await client.get("/snapshot/delta", params={"from": 0, "to": last, "mode": mode})
+    assert r.status_code == 200
+    steps = r.json()["steps"]
+    assert len(steps) == (1 if mode == "compact" else last)
+
+    nodes, edges = _keyed(start)
+    for step in steps:
+        _apply_delta(nodes, edges, step)
+    assert (nodes, edges) == _keyed(target)
+
+
+@pytest.mark.anyio
+async def test_snapshot_delta_same_bucket_is_empty(client):
+    data = (await client.get("/snapshot/delta", params={"from": 1, "to": 1})).json()
+    step = data["steps"][0]
+    assert not any(step[key] for key in step if key not in {"from_t", "to_t"})
+
+
 @pytest.mark.anyio
 async def test_snapshot_out_of_range(client):
     r = await client.get("/snapshot", params={"t": 9999})
@@ -76,3 +249,303 @@ async def test_entity_bad_bucket(client):
 
     r = await client.get(f"/entity/{first_id}", params={"t": 9999})
     assert r.status_code == 400
+
+
+@pytest.mark.anyio
+async def test_ingest_ndjson_appends_and_scores(client):
+    t0 = store.metadata["t0"]
+    bucket_size = store.metadata["bucket_size_seconds"]
+    n_buckets = store.n_buckets
+    existing = store.entities[0]["id"]
+    lines = [
+        {"from_id": existing, "to_id": "STREAM_A", "amount": 9500, "timestamp": t0 + 60},
+        {"from_bank": "STREAM", "from_account": "B", "to_id": existing, "amount": 120.5, "timestamp": t0 + 120},
+        {"from_id": existing, "to_id": "STREAM_A", "amount": "oops", "timestamp": t0},
+        {"from_id": "STREAM_A", "to_id": existing, "amount": 10, "timestamp": t0 + n_buckets * bucket_size},
+    ]
+    body = "\n".join(json.dumps(line) for line in lines) + "\nnot json\n"
+
+    r = await client.post("/ingest", content=body, headers={"Content-Type": "application/x-ndjson"})
+    assert r.status_code == 200
+    data = r.json()
+    assert data["accepted"] == 3
+    assert data["rejected"] == 2
+    assert [e["line"] for e in data["errors"]] == [3, 5]
+    assert data["buckets"] == [0, n_buckets]
+    assert data["n_buckets"] == n_buckets + 1
+
+    snap = (await client.get("/snapshot", params={"t": 0})).json()
+    assert {"STREAM_A", "STREAM_B"} <= {node["id"] for node in snap["nodes"]}
+    assert store.get_entity_activity(0, "STREAM_A")["in_count"] == 1
+    assert "STREAM_A" in store.risk_by_bucket[n_buckets]
+
+
+@pytest.mark.anyio
+async def test_ingest_batch_stays_on_its_generation(monkeypatch):
+    current = DataStore()
+    current.load(DATA_PATH)
+    first = current.current
+    replacement = current.build(DATA_PATH)
+    build_risk_state = Dataset.build_risk_state
+
+    def build_and_publish(self, bucket):
+        # An upload lands while the batch's detector state is being built
+        current.publish(replacement)
+        return build_risk_state(self, bucket)
+
+    monkeypatch.setattr(Dataset, "build_risk_state", build_and_publish)
+    line = {"from_id": "GEN_A", "to_id": "GEN_B", "amount": 10, "timestamp": first.metadata["t0"]}
+    await apply_batch(current, [normalize_record(line, current)])
+
+    assert current.current is replacement
+    assert first.get_entity("GEN_A") is not None
+    assert first.get_entity_activity(0, "GEN_B")["in_count"] == 1
+    assert replacement.get_entity("GEN_A") is None
+
+
+@pytest.mark.anyio
+async def test_conditional_get_returns_304_until_bucket_changes(client):
+    first = await client.get("/clusters", params={"t": 1})
+    etag = first.headers["etag"]
+    cached = await client.get("/clusters", params={"t": 1})
+    assert cached.headers["etag"] == etag and cached.content == first.content
+
+    r = await client.get("/clusters", params={"t": 1}, headers={"If-None-Match": etag})
+    assert r.status_code == 304 and r.content == b""
+
+    other = (await client.get("/snapshot", params={"t": 0})).headers["etag"]
+    dashboard = (await client.get("/dashboard", params={"t": 0})).headers["etag"]
+    line = {
+        "from_id": store.entities[0]["id"],
+        "to_id": store.entities[1]["id"],
+        "amount": 10,
+        "timestamp": store.metadata["t0"] + store.metadata["bucket_size_seconds"] + 5,
+    }
+    await client.post("/ingest", content=json.dumps(line) + "\n")
+
+    # Only responses that read bucket 1 (clusters) or every bucket (dashboard) change
+    r = await client.get("/clusters", params={"t": 1}, headers={"If-None-Match": etag})
+    assert r.status_code == 200 and r.headers["etag"] != etag
+    r = await client.get("/snapshot", params={"t": 0}, headers={"If-None-Match": other})
+    assert r.status_code == 304
+    r = await client.get("/dashboard", params={"t": 0}, headers={"If-None-Match": dashboard})
+    assert r.status_code == 200
+
+
+@pytest.mark.anyio
+async def test_dashboard_aggregates_recompute_only_touched_buckets(client):
+    aggregates = get_aggregates(store.current)
+    before = list(aggregates.trend(store.current))
+    await client.get("/dashboard", params={"t": 2})
+
+    line = {
+        "from_id": store.entities[0]["id"],
+        "to_id": store.entities[1]["id"],
+        "amount": 9900,
+        "timestamp": store.metadata["t0"] + store.metadata["bucket_size_seconds"] + 5,
+    }
+    await client.post("/ingest", content=json.dumps(line) + "\n")
+    after = aggregates.trend(store.current)
+    assert after[1] is not before[1]
+    assert all(after[b] is before[b] for b in range(len(before)) if b != 1)
+
+    fresh = DashboardAggregates()
+    for t in (1, 2):
+        data = (await client.get("/dashboard", params={"t": t})).json()
+        assert data["trend"] == fresh.trend(store.current)
+        assert data["kpis"] == fresh.figures(store.current, t)["kpis"]
+        assert data["heatmap"] == fresh.figures(store.current, t)["heatmap"]
+
+
+@pytest.mark.anyio
+async def test_cluster_index_tracks_appends(client):
+    t = 1
+    before = (await client.get("/clusters", params={"t": t})).json()["clusters"]
+    assert before == detect_clusters(store.risk_by_bucket[t], store.get_bucket_transactions(t))
+
+    # A structuring ring among a few entities
+    ids = [e["id"] for e in store.entities[:4]]
+    start = store.metadata["t0"] + t * store.metadata["bucket_size_seconds"]
+    lines = [
+        {"from_id": ids[i], "to_id": ids[(i + 1) % len(ids)], "amount": 9900, "timestamp": start + 60 * (i + k)}
+        for k in range(3)
+        for i in range(len(ids))
+    ]
+    await client.post("/ingest", content="\n".join(json.dumps(line) for line in lines) + "\n")
+
+    after = (await client.get("/clusters", params={"t": t})).json()["clusters"]
+    assert after != before
+    assert after == detect_clusters(store.risk_by_bucket[t], store.get_bucket_transactions(t))
+    assert store.get_clusters(t, threshold=0.5) == detect_clusters(
+        store.risk_by_bucket[t], store.get_bucket_transactions(t), threshold=0.5
+    )
+
+
+def test_response_cache_bounds_bytes():
+    cache = ResponseCache(max_bytes=10)
+    scope = Scope((0,))
+    for key in "abc":
+        cache.put(key, CachedResponse(etag=key, body=b"x" * 4, media_type="application/json", scope=scope, version="v"))
+    assert cache.get("a", "a") is None
+    assert cache.get("c", "c") is not None
+    assert cache.stats()["bytes"] == 8
+
+
+@pytest.mark.anyio
+async def test_assets_served_from_glb_cache(client):
+    asset = GLBAsset("cluster_test000000.glb", b"glTF-test-bytes")
+    glb_cache.put(asset)
+    r = await client.get(f"/assets/{asset.name}")
+    assert r.status_code == 200
+    assert r.content == asset.data
+    assert r.headers["content-type"] == "model/gltf-binary"
+    assert "immutable" in r.headers["cache-control"]
+
+    r = await client.get(f"/assets/{asset.name}", headers={"If-None-Match": r.headers["etag"]})
+    assert r.status_code == 304
+    assert (await client.get("/assets/missing.glb")).status_code == 404
+
+
+def test_ingest_websocket_acks_batches():
+    from fastapi.testclient import TestClient
+
+    store.load(DATA_PATH)
+    t0 = store.metadata["t0"]
+    before = len(store.transactions)
+    frame = "\n".join(
+        json.dumps({"from_id": f"WS_{i}", "to_id": f"WS_{i + 1}", "amount": 50, "timestamp": t0 + i})
+        for i in range(3)
+    )
+
+    with TestClient(app) as tc, tc.websocket_connect("/ingest/stream") as ws:
+        ws.send_text(frame)
+        message = ws.receive_json()
+
+    assert message["event"] == "INGEST_ACK"
+    assert message["data"]["accepted"] == 3
+    assert len(store.transactions) == before + 3
+
+
+async def _wait_for_job(client, job_id: str) -> dict:
+    with anyio.fail_after(30):
+        while True:
+            job = (await client.get(f"/upload/jobs/{job_id}")).json()
+            if job["status"] in {"succeeded", "failed", "cancelled"}:
+                return job
+            await anyio.sleep(0.02)
+
+
+@pytest.mark.anyio
+async def test_upload_runs_as_background_job(client, monkeypatch):
+    monkeypatch.setenv("ANGELA_AI_WARMUP_ENABLED", "0")
+    contents = DATA_PATH.read_bytes()
+    expected = len(store.transactions)
+    store.load_from_dict({"metadata": {"n_buckets": 0}, "entities": [], "transactions": []})
+
+    r = await client.post("/upload", files={"file": ("sample.json", contents, "application/json")})
+    assert r.status_code == 202
+    assert r.json()["status"] in {"queued", "running"}
+
+    job = await _wait_for_job(client, r.json()["job_id"])
+    assert job["status"] == "succeeded"
+    assert job["progress"] == 1.0
+    assert job["result"]["n_transactions"] == expected
+    assert len(store.transactions) == expected
+
+    r = await client.post(f"/upload/jobs/{job['job_id']}/cancel")
+    assert r.status_code == 409
+
+
+@pytest.mark.anyio
+async def test_upload_job_reports_parse_errors(client):
+    before = len(store.transactions)
+    r = await client.post("/upload", files={"file": ("bad.json", b"{not json", "application/json")})
+    assert r.status_code == 202
+
+    job = await _wait_for_job(client, r.json()["job_id"])
+    assert job["status"] == "failed"
+    assert job["error"].startswith("Invalid JSON")
+    assert len(store.transactions) == before
+
+
+@pytest.mark.anyio
+async def test_cancelled_upload_keeps_current_dataset():
+    current = DataStore()
+    current.load(DATA_PATH)
+    loaded = current.transactions
+    events: list[dict] = []
+    started, release = threading.Event(), threading.Event()
+
+    async def broadcast(event: str, payload: dict) -> None:
+        events.append(dict(payload, event=event))
+
+    def parse() -> dict:
+        started.set()
+        release.wait(5)
+        return json.loads(DATA_PATH.read_text(encoding="utf-8"))
+
+    jobs = UploadJobManager(current, broadcast)
+    job = jobs.submit("upload", "sample.json", parse)
+    with anyio.fail_after(5):
+        while not started.is_set():
+            await anyio.sleep(0.01)
+    jobs.cancel(job.id)
+    release.set()
+    with anyio.fail_after(5):
+        while not job.done:
+            await anyio.sleep(0.01)
+
+    assert job.status == "cancelled"
+    assert current.transactions is loaded
+    assert events[-1]["event"] == "UPLOAD_PROGRESS"
+    assert events[-1]["status"] == "cancelled"
+    assert "parsing" in {e["stage"] for e in events}
+
+
+@pytest.mark.anyio
+async def test_repeated_upload_maps_saved_snapshot(tmp_path):
+    current = DataStore()
+    parses: list[int] = []
+
+    def parse() -> dict:
+        parses.append(1)
+        return json.loads(DATA_PATH.read_text(encoding="utf-8"))
+
+    jobs = UploadJobManager(current, snapshot_dir=tmp_path, keep_snapshots=1)
+
+    async def run(content_key: str):
+        job = jobs.submit("upload", "sample.json", parse, content_key=content_key)
+        with anyio.fail_after(30):
+            while jobs._tasks:
+                await anyio.sleep(0.01)
+        assert job.status == "succeeded"
+        return current.risk_by_bucket[0]
+
+    risk = dict(await run("a"))
+    assert [p.suffix for p in tmp_path.iterdir()] == [".angela"]
+
+    assert dict(await run("a")) == risk
+    assert len(parses) == 1
+
+    await run("b")
+    assert len(parses) == 2
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+@pytest.mark.anyio
+async def test_saved_snapshot_is_isolated_from_live_appends(tmp_path):
+    jobs = UploadJobManager(DataStore(), snapshot_dir=tmp_path)
+    parse = lambda: json.loads(DATA_PATH.read_text(encoding="utf-8"))  # noqa: E731
+    staged, (saved, _) = jobs._build(UploadJob("upload", "sample.json"), parse, None, tmp_path / "x.angela")
+    n_entities, n_buckets = len(saved["entities"]), saved["metadata"]["n_buckets"]
+    activity = {eid: dict(entry) for eid, entry in saved["entity_activity"]["0"].items()}
+
+    entity = staged.entities[0]["id"]
+    tx = {"from_id": entity, "to_id": "LIVE_NEW", "amount": 5.0, "timestamp": staged.metadata["t0"]}
+    staged.add_entities([{"id": "LIVE_NEW", "jurisdiction_bucket": 0}])
+    staged.append_and_rescore(n_buckets, [dict(tx)])
+    staged.extend_activity(0, [tx])
+
+    assert len(saved["entities"]) == n_entities
+    assert saved["metadata"]["n_buckets"] == n_buckets
+    assert saved["entity_activity"]["0"] == activity
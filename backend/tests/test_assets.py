@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+import anyio
+import pytest
+
+from app.assets import orchestrator
+from app.assets.generator import GLBAsset
+
+
+def _blocking_build(release: threading.Event, calls: list[str]):
+    def build(name: str) -> GLBAsset:
+        calls.append(name)
+        release.wait(5)
+        return GLBAsset(name=name, data=b"glb")
+
+    return build
+
+
+@pytest.mark.anyio
+async def test_concurrent_requests_share_one_build():
+    release, calls = threading.Event(), []
+    build = _blocking_build(release, calls)
+
+    first = asyncio.ensure_future(orchestrator._generate("shared.glb", build, "shared.glb"))
+    second = asyncio.ensure_future(orchestrator._generate("shared.glb", build, "shared.glb"))
+    await asyncio.sleep(0.05)
+    release.set()
+    results = await asyncio.gather(first, second)
+
+    assert calls == ["shared.glb"]
+    assert results[0] is results[1]
+    assert "shared.glb" not in orchestrator._inflight
+
+
+@pytest.mark.anyio
+async def test_cancelled_waiter_does_not_cancel_the_build():
+    release, calls = threading.Event(), []
+    build = _blocking_build(release, calls)
+
+    cancelled = asyncio.ensure_future(orchestrator._generate("kept.glb", build, "kept.glb"))
+    waiting = asyncio.ensure_future(orchestrator._generate("kept.glb", build, "kept.glb"))
+    await asyncio.sleep(0.05)
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    with anyio.fail_after(5):
+        asset = await waiting
+    assert asset.name == "kept.glb"
+    assert cancelled.cancelled()
+    assert calls == ["kept.glb"]
@@ -0,0 +1,68 @@
+import json
+
+from app.binary_snapshot import is_binary_snapshot, read_binary_snapshot, write_binary_snapshot
+from app.config import DATA_PATH
+from app.data_loader import DataStore
+
+
+def _load_json_store() -> tuple[dict, DataStore]:
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        snapshot = json.load(f)
+    store = DataStore()
+    store.load_from_dict(json.loads(json.dumps(snapshot)))
+    return snapshot, store
+
+
+def test_binary_snapshot_round_trip(tmp_path):
+    snapshot, json_store = _load_json_store()
+    path = write_binary_snapshot(tmp_path / "sample.angela", snapshot, risk_by_bucket=json_store.risk_by_bucket)
+    assert is_binary_snapshot(path)
+    assert not is_binary_snapshot(DATA_PATH)
+
+    mapped = DataStore()
+    mapped.load(path)
+
+    assert mapped.metadata == json_store.metadata
+    assert mapped.entities == json_store.entities
+    assert len(mapped.transactions) == len(json_store.transactions)
+    for b in range(json_store.n_buckets):
+        assert mapped.get_bucket_transactions(b) == json_store.get_bucket_transactions(b)
+        assert mapped.entity_activity[str(b)] == json_store.entity_activity[str(b)]
+        assert mapped.risk_by_bucket[b] == json_store.risk_by_bucket[b]
+
+
+def test_binary_snapshot_maps_arrays_without_copying(tmp_path):
+    snapshot, _ = _load_json_store()
+    path = write_binary_snapshot(tmp_path / "sample.angela", snapshot, compute_risk=False)
+
+    snap = read_binary_snapshot(path)
+    assert not snap.has_risk
+    assert snap.arrays["tx_amount"].base is not None
+    assert snap.arrays["tx_amount"].ctypes.data % 64 == 0
+
+    # Without stored risk tables the store falls back to scoring on load
+    mapped = DataStore()
+    mapped.load(path)
+    assert any(mapped.risk_by_bucket[b] for b in range(mapped.n_buckets))
+
+
+def test_mapped_store_accepts_appends(tmp_path):
+    snapshot, json_store = _load_json_store()
+    path = write_binary_snapshot(tmp_path / "sample.angela", snapshot, risk_by_bucket=json_store.risk_by_bucket)
+    mapped = DataStore()
+    mapped.load(path)
+
+    entity = mapped.entities[0]["id"]
+    before = len(mapped.get_bucket_rows(0))
+    mapped.append_transactions(0, [{
+        "tx_id": "injected_0",
+        "from_id": entity,
+        "to_id": entity,
+        "amount": 1.0,
+        "timestamp": mapped.metadata["t0"],
+    }])
+    mapped.risk_by_bucket[0] = {}
+
+    assert len(mapped.get_bucket_rows(0)) == before + 1
+    assert mapped.transactions[-1]["tx_id"] == "injected_0"
+    assert mapped.risk_by_bucket[0] == {}
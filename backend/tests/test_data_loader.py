@@ -0,0 +1,144 @@
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.columnar import IdTable, TransactionTable
+from app.config import DATA_PATH
+from app.data_loader import DataStore
+
+
+def _tx(tx_id, from_id, to_id, amount, timestamp, bucket=0):
+    return {
+        "tx_id": tx_id,
+        "from_id": from_id,
+        "to_id": to_id,
+        "amount": amount,
+        "currency": "USD",
+        "timestamp": timestamp,
+        "payment_format": "Wire",
+        "is_laundering": 0,
+        "bucket_index": bucket,
+    }
+
+
+def test_id_table_interns_codes():
+    ids = IdTable(["a", "b"])
+    assert ids.intern("b") == 1
+    assert ids.intern("c") == 2
+    assert ids.code("missing") == -1
+    assert ids.lookup(np.array([2, 0])) == ["c", "a"]
+
+
+def test_transaction_table_round_trips_dicts():
+    records = [_tx("tx_0", "a", "b", 10.5, 100), _tx("tx_1", "b", "a", 3.0, 160)]
+    table = TransactionTable.from_records(records)
+
+    assert len(table) == 2
+    assert table[0] == records[0]
+    assert table[-1]["to_id"] == "a"
+    assert table.from_code.dtype == np.int32
+    assert table.amount.dtype == np.float64
+    assert table.timestamp.dtype == np.int64
+
+    rows = table.extend([_tx("tx_2", "c", "a", 1.0, 200)])
+    assert rows.tolist() == [2]
+    assert list(table.ids) == ["a", "b", "c"]
+
+
+def test_store_bucket_columns_match_dict_views():
+    store = DataStore()
+    store.load(DATA_PATH)
+
+    for b in range(store.n_buckets):
+        bucket_tx = store.get_bucket_transactions(b)
+        cols = store.get_bucket_columns(b)
+        assert len(cols) == len(bucket_tx)
+        assert store.ids.lookup(cols.from_code) == [tx["from_id"] for tx in bucket_tx]
+        assert cols.amount.tolist() == [tx["amount"] for tx in bucket_tx]
+
+    volume = store.get_bucket_columns(0).entity_volume(len(store.ids))
+    expected: dict[str, float] = {}
+    for tx in store.get_bucket_transactions(0):
+        expected[tx["from_id"]] = expected.get(tx["from_id"], 0.0) + tx["amount"]
+        expected[tx["to_id"]] = expected.get(tx["to_id"], 0.0) + tx["amount"]
+    for eid, vol in expected.items():
+        assert np.isclose(volume[store.ids.code(eid)], vol)
+
+
+def test_store_append_transactions_extends_bucket():
+    store = DataStore()
+    store.load(DATA_PATH)
+    before = len(store.get_bucket_rows(1))
+    entity = store.entities[0]["id"]
+
+    rows = store.append_transactions(1, [_tx("injected_0", entity, entity, 5.0, 0, bucket=1)])
+
+    assert len(store.get_bucket_rows(1)) == before + 1
+    assert store.get_bucket_rows(1)[-1] == rows[0]
+    assert store.transactions[-1]["tx_id"] == "injected_0"
+
+
+def test_publish_swaps_generations_and_pins_readers():
+    store = DataStore()
+    store.load(DATA_PATH)
+    first = store.current
+    assert store.generation == 1
+
+    with store.pinned():
+        reloaded = store.build(DATA_PATH)
+        # Another context publishes while this one is pinned
+        contextvars.Context().run(store.publish, reloaded)
+
+        assert store.current is first
+        assert store.transactions is first.transactions
+        ctx = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            assert pool.submit(ctx.run, lambda: store.current).result() is first
+
+    assert store.current is reloaded
+    assert store.generation == 2
+    assert store.transactions is reloaded.transactions
+
+
+def test_publish_moves_the_publishers_own_pin():
+    store = DataStore()
+    store.load(DATA_PATH)
+
+    with store.pinned():
+        store.load(DATA_PATH)
+        assert store.generation == 2
+    assert store.generation == 2
+
+
+def test_bucket_graph_matches_bucket_rows():
+    store = DataStore()
+    store.load(DATA_PATH)
+    graph = store.get_bucket_graph(0)
+    txs = store.get_bucket_transactions(0)
+
+    pairs: dict[tuple[str, str], list[float]] = {}
+    adjacency: dict[str, set[str]] = {}
+    for tx in txs:
+        if tx["from_id"] == tx["to_id"]:
+            continue
+        pairs.setdefault((tx["from_id"], tx["to_id"]), []).append(tx["amount"])
+        adjacency.setdefault(tx["from_id"], set()).add(tx["to_id"])
+        adjacency.setdefault(tx["to_id"], set()).add(tx["from_id"])
+
+    ids = store.ids.lookup(graph.codes)
+    got = [(ids[f], ids[t]) for f, t in zip(graph.pair_from.tolist(), graph.pair_to.tolist())]
+    assert got == list(pairs)
+    assert graph.pair_count.tolist() == [len(v) for v in pairs.values()]
+    assert np.allclose(graph.pair_total, [sum(v) for v in pairs.values()])
+    assert graph.pair_first_amount.tolist() == [v[0] for v in pairs.values()]
+
+    center = next(iter(adjacency))
+    hop = graph.k_hop(graph.local(store.ids.code(center)), 1, 10_000)
+    assert {ids[i] for i in hop} == adjacency[center] | {center}
+    assert len(graph.pairs_within(hop, 3)) <= 3
+
+    entity = store.entities[0]["id"]
+    store.append_transactions(0, [_tx("injected_g", entity, "NEW_NODE", 5.0, 0)])
+    assert store.get_bucket_graph(0) is not graph
+    assert store.get_bucket_graph(0).local(store.ids.code("NEW_NODE")) >= 0
@@ -0,0 +1,108 @@
+import random
+
+import numpy as np
+
+from app.risk.cycles import CSRGraph, strongly_connected_components
+from app.risk.detectors import circular_flow_scores, velocity_detector, velocity_scores
+
+
+def _features(totals: list[int]) -> dict[str, dict]:
+    return {
+        f"E{i}": {"total_tx": total, "tx_per_minute": round(i * 0.1, 4)}
+        for i, total in enumerate(totals)
+    }
+
+
+def _velocity_reference(features: dict, all_features: dict[str, dict]) -> dict:
+    """Per-entity velocity scoring that re-sorts the population, as the detector used to."""
+    total_tx = features["total_tx"]
+    all_totals = sorted(f["total_tx"] for f in all_features.values())
+    if not all_totals:
+        return {"score": 0.0, "detail": "", "evidence": {}}
+    p50 = all_totals[len(all_totals) // 2]
+    p95 = all_totals[int(len(all_totals) * 0.95)]
+    score = 0.0 if p95 <= p50 else max(0.0, min(1.0, (total_tx - p50) / max(p95 - p50, 1)))
+    evidence = {
+        "tx_count": total_tx,
+        "tx_per_minute": features["tx_per_minute"],
+        "population_median": p50,
+        "population_p95": p95,
+    }
+    return {"score": score, "detail": f"{total_tx} tx in bucket (p50={p50}, p95={p95})", "evidence": evidence}
+
+
+def test_velocity_scores_match_reference():
+    rng = random.Random(7)
+    cases = [
+        [],
+        [3],
+        [1, 1, 1, 1],
+        [1, 2, 3, 4, 50],
+        [int(rng.paretovariate(1.2)) for _ in range(500)],
+    ]
+    for totals in cases:
+        features = _features(totals)
+        expected = {eid: _velocity_reference(f, features) for eid, f in features.items()}
+        assert velocity_scores(features) == expected
+        assert {eid: velocity_detector(f, features) for eid, f in features.items()} == expected
+
+
+def test_velocity_detector_output():
+    features = _features([1, 2, 3, 4, 50])
+    assert velocity_detector(features["E3"], features) == {
+        "score": 1 / 47,
+        "detail": "4 tx in bucket (p50=3, p95=50)",
+        "evidence": {"tx_count": 4, "tx_per_minute": 0.3, "population_median": 3, "population_p95": 50},
+    }
+    assert velocity_detector(features["E4"], features)["score"] == 1.0
+    assert velocity_detector(features["E0"], features)["score"] == 0.0
+
+
+def _cycles_through(entity_id: str, transactions: list[dict], max_depth: int = 4) -> list[list[str]]:
+    """Exhaustive per-entity DFS, as the detector used to run it."""
+    adj: dict[str, set[str]] = {}
+    for tx in transactions:
+        if tx["from_id"] != tx["to_id"]:
+            adj.setdefault(tx["from_id"], set()).add(tx["to_id"])
+
+    cycles: list[list[str]] = []
+
+    def dfs(current: str, path: list[str], depth: int) -> None:
+        for neighbor in adj.get(current, set()):
+            if neighbor == entity_id and depth >= 2:
+                cycles.append(path + [neighbor])
+            elif neighbor not in path and depth < max_depth:
+                dfs(neighbor, path + [neighbor], depth + 1)
+
+    dfs(entity_id, [entity_id], 1)
+    return cycles
+
+
+def test_circular_flow_scores_match_exhaustive_search():
+    for seed in range(50):
+        rng = random.Random(seed)
+        n = rng.randint(2, 20)
+        transactions = [
+            {"from_id": f"E{rng.randrange(n)}", "to_id": f"E{rng.randrange(n)}"}
+            for _ in range(rng.randint(1, 50))
+        ]
+        scores = circular_flow_scores(transactions, max_visits=10**9)
+        entities = {tx["from_id"] for tx in transactions} | {tx["to_id"] for tx in transactions}
+        for eid in entities:
+            cycles = _cycles_through(eid, transactions)
+            if not cycles:
+                assert eid not in scores
+                continue
+            evidence = scores[eid]["evidence"]
+            assert evidence["cycle_count"] == len(cycles)
+            assert evidence["shortest_cycle_length"] == min(len(c) for c in cycles)
+            members = {e for c in cycles for e in c} - {eid}
+            assert evidence["counterparties"] == sorted(members)[:10]
+
+
+def test_scc_labels_separate_acyclic_nodes():
+    # 0 -> 1 -> 2 -> 0 is a cycle; 3 only feeds into it
+    graph = CSRGraph.from_edges(np.array([0, 1, 2, 3, 3]), np.array([1, 2, 0, 0, 3]), 4)
+    labels = strongly_connected_components(graph)
+    assert labels[0] == labels[1] == labels[2]
+    assert labels[3] != labels[0]
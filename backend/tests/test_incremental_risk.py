@@ -0,0 +1,101 @@
+import random
+
+from app.config import DATA_PATH
+from app.data_loader import DataStore
+from app.risk.incremental import BucketRiskState
+from app.risk.scoring import compute_risk_for_bucket
+
+
+def _tx(tx_id, from_id, to_id, amount, timestamp):
+    return {
+        "tx_id": tx_id,
+        "from_id": from_id,
+        "to_id": to_id,
+        "amount": amount,
+        "currency": "USD",
+        "timestamp": timestamp,
+        "payment_format": "Wire",
+        "is_laundering": 1,
+    }
+
+
+def test_append_and_rescore_matches_full_recompute():
+    store = DataStore()
+    store.load(DATA_PATH)
+    rng = random.Random(3)
+    entity_ids = [e["id"] for e in store.entities[:30]]
+    bucket_size = store.metadata["bucket_size_seconds"]
+
+    for k in range(25):
+        bucket = rng.randrange(store.n_buckets)
+        base_ts = int(store.get_bucket_columns(bucket).timestamp.min())
+        records = [
+            _tx(
+                f"inj_{k}_{i}",
+                rng.choice(entity_ids),
+                rng.choice(entity_ids + [f"NEW_{rng.randrange(3)}"]),
+                round(rng.choice([rng.uniform(9000, 9999), rng.uniform(10, 50000)]), 2),
+                base_ts + rng.randrange(bucket_size),
+            )
+            for i in range(rng.randint(1, 12))
+        ]
+        before = dict(store.risk_by_bucket[bucket])
+        changed = store.append_and_rescore(bucket, records)
+
+        full = compute_risk_for_bucket(store.get_bucket_transactions(bucket), bucket_size)
+        assert list(store.risk_by_bucket[bucket]) == list(full)
+        assert store.risk_by_bucket[bucket] == full
+        assert changed == {eid: entry for eid, entry in full.items() if before.get(eid) != entry}
+
+
+def test_append_and_rescore_detects_new_cycle():
+    store = DataStore()
+    store.load(DATA_PATH)
+    a, b, c = (e["id"] for e in store.entities[:3])
+    ts = int(store.get_bucket_columns(0).timestamp.min())
+
+    changed = store.append_and_rescore(0, [
+        _tx("cyc_0", a, b, 20000.0, ts),
+        _tx("cyc_1", b, c, 20000.0, ts + 600),
+        _tx("cyc_2", c, a, 20000.0, ts + 1200),
+    ])
+
+    for eid in (a, b, c):
+        assert changed[eid]["evidence"]["circular_flow"]["shortest_cycle_length"] == 4
+
+
+def _without_cycles(entry):
+    evidence = {k: v for k, v in entry["evidence"].items() if k != "circular_flow"}
+    reasons = [r for r in entry["reasons"] if r["detector"] != "circular_flow"]
+    return evidence, reasons
+
+
+def test_dense_bucket_state_and_non_cycle_signals_match_full_recompute():
+    store = DataStore()
+    store.load(DATA_PATH)
+    bucket_size = store.metadata["bucket_size_seconds"]
+    ts = int(store.get_bucket_columns(0).timestamp.min())
+    dense = [e["id"] for e in store.entities[:12]]
+    # Every ordered pair: far more short cycles than the visit budget covers
+    store.append_transactions(0, [
+        _tx(f"dense_{i}_{j}", a, b, 9500.0, ts + i * 60 + j)
+        for i, a in enumerate(dense) for j, b in enumerate(dense) if a != b
+    ])
+    full = compute_risk_for_bucket(store.get_bucket_transactions(0), bucket_size)
+
+    # A freshly built state reproduces the budgeted cycle search exactly
+    rows = store.get_bucket_rows(0)
+    state = BucketRiskState.from_columns(store.transactions.columns(rows), store.transactions.tx_ids(rows))
+    assert state.score(range(len(state)), store.ids) == full
+
+    # Appends budget per new edge, so only cycle evidence may drift
+    store.risk_by_bucket[0] = full
+    extra = [e["id"] for e in store.entities[12:18]]
+    store.append_and_rescore(0, [
+        _tx(f"extra_{i}_{j}", a, b, 20000.0, ts + 3600 + i * 60 + j)
+        for i, a in enumerate(extra) for j, b in enumerate(dense[:6] + extra) if a != b
+    ])
+    full = compute_risk_for_bucket(store.get_bucket_transactions(0), bucket_size)
+    assert list(store.risk_by_bucket[0]) == list(full)
+    for eid, entry in full.items():
+        assert _without_cycles(store.risk_by_bucket[0][eid]) == _without_cycles(entry)
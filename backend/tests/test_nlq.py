@@ -0,0 +1,119 @@
+import pytest
+
+from app import nlq
+from app.nlq import parse_query, parse_query_local
+from app.semantic_cache import SemanticIntentCache
+
+
+@pytest.mark.parametrize(
+    "query, intent, params",
+    [
+        ("show high risk entities", "SHOW_HIGH_RISK", {"min_risk": 0.6}),
+        ("entities with risk above 80%", "SHOW_HIGH_RISK", {"min_risk": 0.8}),
+        ("show entities receiving large transaction volumes", "LARGE_INCOMING", {"min_amount": 50000.0}),
+        ("large transfers over $250k", "LARGE_INCOMING", {"min_amount": 250000.0}),
+        ("high risk entities in jurisdiction 3", "HIGH_RISK_JURISDICTION", {"jurisdiction": 3}),
+        ("find structuring near threshold transactions", "STRUCTURING_NEAR_THRESHOLD", {}),
+        ("strucuring patterns", "STRUCTURING_NEAR_THRESHOLD", {}),
+        ("show circular flow and layering activity", "CIRCULAR_FLOW", {}),
+        ("top 10 clusters", "TOP_CLUSTERS", {"limit": 10}),
+    ],
+)
+def test_local_parser_resolves_common_phrasings(query, intent, params):
+    parsed = parse_query_local(query)
+    assert parsed["intent"] == intent
+    assert parsed["params"] == params
+    assert parsed["parser"] == "rules"
+    assert parsed["confidence"] >= nlq.LOCAL_MIN_CONFIDENCE
+
+
+def test_ambiguous_queries_fall_back_to_llm(monkeypatch):
+    prompts: list[str] = []
+
+    def fake_llm(query, **kwargs):
+        prompts.append(query)
+        return '{"intent": "HIGH_RISK_JURISDICTION", "params": {"jurisdiction": 5}, "interpretation": "Cayman"}'
+
+    monkeypatch.setattr(nlq, "_call_llm", fake_llm)
+    monkeypatch.setattr(nlq, "semantic_cache", SemanticIntentCache())
+    assert parse_query("top 5 clusters")["parser"] == "rules"
+    assert prompts == []
+
+    parsed = parse_query("accounts moving money through the cayman islands")
+    assert prompts == ["accounts moving money through the cayman islands"]
+    assert parsed["parser"] == "llm"
+    assert parsed["params"] == {"jurisdiction": 5}
+
+    assert parse_query_local("show me accounts not involved in cycles")["confidence"] < nlq.LOCAL_MIN_CONFIDENCE
+    assert parse_query("show me accounts not involved in cycles")["parser"] == "llm"
+    assert prompts[-1] == "show me accounts not involved in cycles"
+
+
+def test_rephrased_queries_reuse_llm_parse(monkeypatch):
+    prompts: list[str] = []
+
+    def fake_llm(query, **kwargs):
+        prompts.append(query)
+        return '{"intent": "HIGH_RISK_JURISDICTION", "params": {"jurisdiction": 5}, "interpretation": "Cayman"}'
+
+    monkeypatch.setattr(nlq, "_call_llm", fake_llm)
+    monkeypatch.setattr(nlq, "semantic_cache", SemanticIntentCache(capacity=8, threshold=0.85))
+    assert parse_query("accounts moving money through the cayman islands")["parser"] == "llm"
+
+    parsed = parse_query("entities routing funds via the cayman islands")
+    assert parsed["parser"] == "semantic"
+    assert parsed["params"] == {"jurisdiction": 5}
+    assert parsed["matched_query"] == "accounts moving money through the cayman islands"
+    assert len(prompts) == 1
+
+    # A different place is not close enough to reuse
+    assert parse_query("accounts moving money through panama")["parser"] == "llm"
+    assert len(prompts) == 2
+
+
+def test_semantic_cache_requires_same_numbers():
+    cache = SemanticIntentCache(capacity=2, threshold=0.85)
+    cache.add("wires over $100k to shell companies", {"intent": "LARGE_INCOMING", "params": {"min_amount": 100000}})
+    cache.add("payments looping between shell companies", {"intent": "CIRCULAR_FLOW", "params": {}})
+    assert cache.lookup("wires over $500k to shell companies") is None
+    hit = cache.lookup("transfers above $100k to shell companies")
+    assert hit is not None and hit[0]["params"] == {"min_amount": 100000}
+
+    # Full: the least recently used query is replaced
+    cache.add("accounts moving money through panama", {"intent": "HIGH_RISK_JURISDICTION", "params": {}})
+    assert cache.lookup("payments looping between shell companies") is None
+    assert cache.lookup("wires over $100k to shell companies") is not None
+
+
+@pytest.mark.parametrize(
+    "cached, query",
+    [
+        (
+            "which accounts are moving money through entities registered in brazil",
+            "which accounts are moving money through entities registered in chile",
+        ),
+        ("accounts moving money through the cayman islands", "accounts not moving money through the cayman islands"),
+        ("routing funds to panama", "routing funds from panama"),
+        ("show risky accounts", "show low risk accounts"),
+    ],
+)
+def test_semantic_cache_requires_same_key_terms(cached, query):
+    cache = SemanticIntentCache(capacity=2, threshold=0.75)
+    cache.add(cached, {"intent": "HIGH_RISK_JURISDICTION", "params": {"jurisdiction": 2}})
+    assert cache.lookup(cached) is not None
+    assert cache.lookup(query) is None
+
+
+def test_semantic_cache_reuses_rephrased_risk_query():
+    cache = SemanticIntentCache(capacity=2)
+    cache.add("show risky accounts", {"intent": "SHOW_HIGH_RISK", "params": {"min_risk": 0.6}})
+    hit = cache.lookup("display high-risk entities")
+    assert hit is not None and hit[0]["intent"] == "SHOW_HIGH_RISK"
+
+
+def test_coerced_llm_parse_is_not_cached(monkeypatch):
+    monkeypatch.setattr(nlq, "_call_llm", lambda query, **kwargs: '{"intent": "SUMMARIZE_EVERYTHING", "params": {}}')
+    monkeypatch.setattr(nlq, "semantic_cache", SemanticIntentCache(capacity=2))
+    parsed = parse_query("summarize everything about the pacific rim")
+    assert parsed["intent"] == "SHOW_HIGH_RISK"
+    assert nlq.semantic_cache.stats()["entries"] == 0
@@ -0,0 +1,109 @@
+import json
+import os
+
+from app.config import DATA_PATH
+from app.data_loader import DataStore
+from app.risk import cache as risk_cache
+from app.risk.cache import RiskCache
+
+
+def _snapshot() -> dict:
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _count_scoring_calls(monkeypatch) -> list[int]:
+    calls: list[int] = []
+    original = risk_cache.compute_risk_for_bucket
+
+    def counting(transactions, bucket_size_seconds):
+        calls.append(len(transactions))
+        return original(transactions, bucket_size_seconds)
+
+    monkeypatch.setattr(risk_cache, "compute_risk_for_bucket", counting)
+    return calls
+
+
+def test_risk_cache_reuses_unchanged_buckets(tmp_path, monkeypatch):
+    cache = RiskCache(tmp_path)
+    cold = DataStore(risk_cache=cache)
+    cold.load_from_dict(_snapshot())
+    uncached = DataStore()
+    uncached.load_from_dict(_snapshot())
+    assert dict(cold.risk_by_bucket) == dict(uncached.risk_by_bucket)
+
+    calls = _count_scoring_calls(monkeypatch)
+    warm = DataStore(risk_cache=cache)
+    warm.load_from_dict(_snapshot())
+
+    assert calls == []
+    assert dict(warm.risk_by_bucket) == dict(uncached.risk_by_bucket)
+
+
+def test_risk_cache_recomputes_only_stale_buckets(tmp_path, monkeypatch):
+    cache = RiskCache(tmp_path)
+    DataStore(risk_cache=cache).load_from_dict(_snapshot())
+
+    snapshot = _snapshot()
+    row = snapshot["bucket_index"]["1"][0]
+    snapshot["transactions"][row]["amount"] += 1.0
+
+    calls = _count_scoring_calls(monkeypatch)
+    DataStore(risk_cache=cache).load_from_dict(snapshot)
+
+    assert calls == [len(snapshot["bucket_index"]["1"])]
+
+
+def test_risk_cache_is_scoped_by_detector_fingerprint(tmp_path):
+    assert RiskCache(tmp_path).directory != RiskCache(tmp_path, fingerprint="other").directory
+    DataStore(risk_cache=RiskCache(tmp_path, fingerprint="v-test")).load_from_dict(_snapshot())
+    assert list((tmp_path / "v-test").glob("*.json"))
+
+
+def test_parallel_scoring_matches_serial():
+    serial = DataStore()
+    serial.load_from_dict(_snapshot())
+
+    parallel = DataStore(risk_workers=2)
+    parallel.load_from_dict(_snapshot())
+
+    assert list(parallel.risk_by_bucket) == list(serial.risk_by_bucket)
+    assert parallel.risk_by_bucket == serial.risk_by_bucket
+
+
+def test_compute_risk_tables_reports_progress():
+    store = DataStore()
+    store.load_from_dict(_snapshot())
+    seen: list[tuple[int, int]] = []
+
+    risk_cache.compute_risk_tables(
+        store.transactions,
+        store.bucket_index,
+        store.n_buckets,
+        store.metadata["bucket_size_seconds"],
+        workers=2,
+        progress=lambda done, total: seen.append((done, total)),
+    )
+
+    assert seen[-1] == (store.n_buckets, store.n_buckets)
+    assert [done for done, _ in seen] == list(range(1, store.n_buckets + 1))
+
+
+def test_prune_drops_old_fingerprints_and_least_recently_used(tmp_path):
+    stale = tmp_path / "0123456789abcdef"
+    stale.mkdir()
+    (stale / "old.json").write_text("{}")
+    (tmp_path / "notes").mkdir()
+
+    cache = RiskCache(tmp_path, fingerprint="fedcba9876543210", max_bytes=200)
+    for i in range(3):
+        cache.put(f"k{i}", {"E0": {"risk_score": 0.5, "reasons": [], "evidence": {"pad": "x" * 40}}})
+    times = {"k0": 100, "k1": 300, "k2": 200}
+    for key, mtime in times.items():
+        os.utime(cache._path(key), (mtime, mtime))
+
+    cache.prune()
+    assert not stale.exists()
+    assert (tmp_path / "notes").exists()
+    assert cache.get("k0") is None
+    assert cache.get("k1") is not None
@@ -1,4 +1,4 @@
-import type { AutopilotTarget, EntityDetail, Neighborhood, Snapshot } from "../types";
+import type { AutopilotTarget, EntityDetail, Neighborhood, Snapshot, SnapshotColumns, SnapshotDeltaResponse } from "../types";
 
 const BASE = import.meta.env.VITE_API_URL || "/api";
 
@@ -27,8 +27,102 @@ async function fetchJSON<T>(url: string, init?: RequestInit): Promise<T> {
   return res.json() as Promise<T>;
 }
 
-export function getSnapshot(t: number): Promise<Snapshot> {
-  return fetchJSON<Snapshot>(`${BASE}/snapshot?t=${t}`);
+export interface SnapshotOptions {
+  aggregate?: boolean;
+  maxNodes?: number;
+  minRisk?: number;
+  rankBy?: "risk" | "volume";
+  groupBy?: "bank" | "jurisdiction";
+}
+
+function snapshotParams(t: number, options: SnapshotOptions): URLSearchParams {
+  const params = new URLSearchParams({ t: String(t) });
+  if (options.aggregate) params.set("aggregate", "true");
+  if (options.maxNodes !== undefined) params.set("max_nodes", String(options.maxNodes));
+  if (options.minRisk !== undefined) params.set("min_risk", String(options.minRisk));
+  if (options.rankBy) params.set("rank_by", options.rankBy);
+  if (options.groupBy) params.set("group_by", options.groupBy);
+  return params;
+}
+
+export function getSnapshot(t: number, options: SnapshotOptions = {}): Promise<Snapshot> {
+  return fetchJSON<Snapshot>(`${BASE}/snapshot?${snapshotParams(t, options)}`);
+}
+
+const SNAPSHOT_COLUMNS_TYPE = "application/vnd.angela.snapshot";
+
+type ArrayDirectory = Record<string, { dtype: string; length: number; offset: number }>;
+
+const TYPED_ARRAYS: Record<string, new (buffer: ArrayBuffer, offset: number, length: number) => ArrayBufferView> = {
+  "|u1": Uint8Array,
+  "<u2": Uint16Array,
+  "<i4": Int32Array,
+  "<i8": BigInt64Array,
+  "<f8": Float64Array,
+};
+
+// Snapshot as typed arrays (zero-copy views over the response body),
+// ready to upload to GPU buffers without building node/edge objects
+export async function getSnapshotColumns(t: number, options: SnapshotOptions = {}): Promise<SnapshotColumns> {
+  const res = await fetch(`${BASE}/snapshot?${snapshotParams(t, options)}`, {
+    headers: { Accept: SNAPSHOT_COLUMNS_TYPE },
+  });
+  if (!res.ok) {
+    const body = await res.json().catch(() => ({}));
+    throw new Error(extractErrorMessage(body, `HTTP ${res.status}`));
+  }
+  const buffer = await res.arrayBuffer();
+  const view = new DataView(buffer);
+  const headerLength = Number(view.getBigUint64(8, true));
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 16, headerLength)));
+  const base = Math.ceil((16 + headerLength) / 8) * 8;
+  const directory = header.arrays as ArrayDirectory;
+  const column = <T extends ArrayBufferView>(name: string): T => {
+    const spec = directory[name];
+    return new TYPED_ARRAYS[spec.dtype](buffer, base + spec.offset, spec.length) as T;
+  };
+  const optional = <T extends ArrayBufferView>(name: string): T | undefined =>
+    directory[name] ? column<T>(name) : undefined;
+
+  const blob = column<Uint8Array>("id_blob");
+  const offsets = column<Int32Array>("id_offsets");
+  const decoder = new TextDecoder();
+  const ids: string[] = [];
+  for (let i = 0; i + 1 < offsets.length; i++) ids.push(decoder.decode(blob.subarray(offsets[i], offsets[i + 1])));
+
+  return {
+    meta: header.meta,
+    ids,
+    nNodes: header.n_nodes,
+    kycLevels: header.kyc_levels,
+    entityTypes: header.entity_types,
+    node: {
+      jurisdiction: column("node_jurisdiction"),
+      kyc: column("node_kyc"),
+      entityType: column("node_entity_type"),
+      risk: column("node_risk"),
+      volume: column("node_volume"),
+    },
+    edge: {
+      src: column("edge_src"),
+      dst: column("edge_dst"),
+      amount: column("edge_amount"),
+      count: optional("edge_count"),
+      minAmount: optional("edge_min_amount"),
+      maxAmount: optional("edge_max_amount"),
+      firstTs: optional("edge_first_ts"),
+      lastTs: optional("edge_last_ts"),
+    },
+  };
+}
+
+export function getSnapshotDelta(
+  from: number,
+  to: number,
+  mode: "compact" | "chain" = "compact",
+): Promise<SnapshotDeltaResponse> {
+  const params = new URLSearchParams({ from: String(from), to: String(to), mode });
+  return fetchJSON<SnapshotDeltaResponse>(`${BASE}/snapshot/delta?${params}`);
 }
 
 export function getEntity(id: string, t?: number, signal?: AbortSignal): Promise<EntityDetail> {
@@ -74,7 +168,47 @@ export function getAIWarmupStatus(): Promise<AIWarmupStatus> {
   return fetchJSON(`${BASE}/ai/warmup/status`);
 }
 
-export async function uploadFile(file: File): Promise<{ status: string; n_entities: number; n_transactions: number; n_buckets: number }> {
+export interface UploadResult {
+  status: string;
+  n_entities: number;
+  n_transactions: number;
+  n_buckets: number;
+}
+
+export interface UploadJob {
+  job_id: string;
+  kind: string;
+  filename: string;
+  status: "queued" | "running" | "succeeded" | "failed" | "cancelled";
+  stage: string;
+  progress: number;
+  cancel_requested: boolean;
+  result: UploadResult | null;
+  error: string | null;
+}
+
+export function getUploadJob(jobId: string): Promise<UploadJob> {
+  return fetchJSON(`${BASE}/upload/jobs/${encodeURIComponent(jobId)}`);
+}
+
+export function cancelUploadJob(jobId: string): Promise<UploadJob> {
+  return fetchJSON(`${BASE}/upload/jobs/${encodeURIComponent(jobId)}/cancel`, { method: "POST" });
+}
+
+async function waitForUploadJob(job: UploadJob, onProgress?: (job: UploadJob) => void): Promise<UploadResult> {
+  while (job.status === "queued" || job.status === "running") {
+    onProgress?.(job);
+    await new Promise((resolve) => setTimeout(resolve, 500));
+    job = await getUploadJob(job.job_id);
+  }
+  onProgress?.(job);
+  if (job.status !== "succeeded" || !job.result) {
+    throw new Error(job.error || `Upload ${job.status}`);
+  }
+  return job.result;
+}
+
+export async function uploadFile(file: File, onProgress?: (job: UploadJob) => void): Promise<UploadResult> {
   const form = new FormData();
   form.append("file", file);
   const res = await fetch(`${BASE}/upload`, { method: "POST", body: form });
@@ -82,7 +216,7 @@ export async function uploadFile(file: File): Promise<{ status: string; n_entiti
     const body = await res.json().catch(() => ({}));
     throw new Error(body.detail || `Upload failed: HTTP ${res.status}`);
   }
-  return res.json();
+  return waitForUploadJob(await res.json(), onProgress);
 }
 
 export interface CSVPreviewStats {
@@ -118,7 +252,11 @@ export async function previewCSV(file: File): Promise<CSVPreview> {
   return res.json();
 }
 
-export async function uploadMapped(file: File, mapping: Record<string, string>): Promise<{ status: string; n_entities: number; n_transactions: number; n_buckets: number }> {
+export async function uploadMapped(
+  file: File,
+  mapping: Record<string, string>,
+  onProgress?: (job: UploadJob) => void,
+): Promise<UploadResult> {
   const form = new FormData();
   form.append("file", file);
   const res = await fetch(`${BASE}/upload/mapped?mapping=${encodeURIComponent(JSON.stringify(mapping))}`, {
@@ -129,10 +267,10 @@ export async function uploadMapped(file: File, mapping: Record<string, string>):
     const body = await res.json().catch(() => ({}));
     throw new Error(body.detail || `Upload failed: HTTP ${res.status}`);
   }
-  return res.json();
+  return waitForUploadJob(await res.json(), onProgress);
 }
 
-export async function loadSample(): Promise<{ status: string; n_entities: number; n_transactions: number; n_buckets: number }> {
+export async function loadSample(): Promise<UploadResult> {
   const res = await fetch(`${BASE}/load-sample`, { method: "POST" });
   if (!res.ok) {
     const body = await res.json().catch(() => ({}));
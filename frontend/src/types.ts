@@ -11,6 +11,13 @@ export interface SnapshotEdge {
   from_id: string;
   to_id: string;
   amount: number;
+  // Present on aggregated snapshots (`amount` is then the pair total)
+  count?: number;
+  total?: number;
+  min_amount?: number;
+  max_amount?: number;
+  first_ts?: number;
+  last_ts?: number;
 }
 
 export interface SnapshotMeta {
@@ -19,6 +26,18 @@ export interface SnapshotMeta {
   n_entities: number;
   n_transactions: number;
   bucket_size_seconds: number;
+  aggregated?: boolean;
+  lod?: SnapshotLod | null;
+}
+
+export interface SnapshotLod {
+  total_nodes: number;
+  kept: number;
+  pruned: number;
+  rank_by: "risk" | "volume";
+  group_by: "bank" | "jurisdiction" | null;
+  // Supernode ID -> number of collapsed entities
+  groups: Record<string, number>;
 }
 
 export interface Snapshot {
@@ -27,6 +46,59 @@ export interface Snapshot {
   edges: SnapshotEdge[];
 }
 
+// Typed-array form of a snapshot (Accept: application/vnd.angela.snapshot)
+export interface SnapshotColumns {
+  meta: SnapshotMeta;
+  // Node IDs first (nNodes), then edge endpoints without an entity record
+  ids: string[];
+  nNodes: number;
+  kycLevels: string[];
+  entityTypes: string[];
+  node: {
+    jurisdiction: Int32Array;
+    kyc: Uint16Array;
+    entityType: Uint16Array;
+    risk: Float64Array;
+    volume: Float64Array;
+  };
+  edge: {
+    src: Int32Array;
+    dst: Int32Array;
+    amount: Float64Array;
+    // Aggregated snapshots only
+    count?: Int32Array;
+    minAmount?: Float64Array;
+    maxAmount?: Float64Array;
+    firstTs?: BigInt64Array;
+    lastTs?: BigInt64Array;
+  };
+}
+
+export interface SnapshotNodeChange {
+  id: string;
+  risk_score: number;
+  volume: number;
+}
+
+export interface SnapshotDelta {
+  from_t: number;
+  to_t: number;
+  nodes_added: SnapshotNode[];
+  nodes_removed: string[];
+  nodes_changed: SnapshotNodeChange[];
+  // Aggregated edges, one per directed pair
+  edges_added: SnapshotEdge[];
+  edges_removed: { from_id: string; to_id: string }[];
+  edges_changed: SnapshotEdge[];
+}
+
+export interface SnapshotDeltaResponse {
+  from_t: number;
+  to_t: number;
+  mode: "compact" | "chain";
+  steps: SnapshotDelta[];
+}
+
 export interface EntityReason {
   detector: string;
   detail: string;
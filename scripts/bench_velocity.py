@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark the velocity detector: original per-entity vs bucket-level scoring.
+
+Usage:
+    python scripts/bench_velocity.py
+    python scripts/bench_velocity.py --sizes 10000 100000 1000000 --sample 200
+
+The original per-entity detector (kept below as ``legacy_velocity_detector``)
+re-sorted the population for every entity, so scoring a whole bucket with
+it was quadratic. It is timed on ``--sample`` entities and extrapolated to
+the full bucket; ``velocity_scores`` is timed end to end and checked
+against the legacy output on the sample.
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from app.risk.detectors import velocity_scores  # noqa: E402
+
+
+def legacy_velocity_detector(features: dict, all_features: dict[str, dict]) -> dict:
+    """Per-entity velocity scoring as it was before bucket-level scoring."""
+    total_tx = features["total_tx"]
+    all_totals = sorted(f["total_tx"] for f in all_features.values())
+    if not all_totals:
+        return {"score": 0.0, "detail": "", "evidence": {}}
+    p50 = all_totals[len(all_totals) // 2]
+    p95 = all_totals[int(len(all_totals) * 0.95)]
+    score = 0.0 if p95 <= p50 else max(0.0, min(1.0, (total_tx - p50) / max(p95 - p50, 1)))
+    evidence = {
+        "tx_count": total_tx,
+        "tx_per_minute": features["tx_per_minute"],
+        "population_median": p50,
+        "population_p95": p95,
+    }
+    return {"score": score, "detail": f"{total_tx} tx in bucket (p50={p50}, p95={p95})", "evidence": evidence}
+
+
+def make_features(n_entities: int, seed: int) -> dict[str, dict]:
+    """Synthetic features with a heavy-tailed tx count distribution."""
+    rng = random.Random(seed)
+    features = {}
+    for i in range(n_entities):
+        total_tx = int(rng.paretovariate(1.5))
+        features[f"E{i:07d}"] = {
+            "total_tx": total_tx,
+            "tx_per_minute": round(rng.random() * 5, 4),
+        }
+    return features
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark velocity detector scoring")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--sample", type=int, default=100, help="Entities timed with the per-entity detector")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{'entities':>10}  {'per-entity (est.)':>18}  {'bucket-level':>12}  {'speedup':>9}")
+    for n in args.sizes:
+        features = make_features(n, args.seed)
+        sample = list(features.items())[: args.sample]
+
+        start = time.perf_counter()
+        legacy = {eid: legacy_velocity_detector(f, features) for eid, f in sample}
+        legacy_s = (time.perf_counter() - start) / len(sample) * n
+
+        start = time.perf_counter()
+        vectorized = velocity_scores(features)
+        vectorized_s = time.perf_counter() - start
+
+        assert all(vectorized[eid] == result for eid, result in legacy.items()), "output mismatch"
+        print(f"{n:>10,}  {legacy_s:>17.2f}s  {vectorized_s:>11.3f}s  {legacy_s / vectorized_s:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
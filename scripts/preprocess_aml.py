@@ -5,6 +5,10 @@ Preprocess IBM AML dataset into ANGELA snapshot JSON.
 Usage:
     python scripts/preprocess_aml.py --input data/raw/HI-Small_Trans.csv
     python scripts/preprocess_aml.py --input data/raw/HI-Small_Trans.csv --entities 500 --tx 5000
+    python scripts/preprocess_aml.py --input data/raw/HI-Small_Trans.csv --no-binary
+
+Besides each JSON snapshot, a memory-mapped binary snapshot (.angela) with
+precomputed risk tables is written next to it; the API maps it at startup.
 """
 
 import argparse
@@ -18,6 +22,9 @@ from collections import defaultdict
 from datetime import datetime, timezone
 from pathlib import Path
 
+# Binary snapshots are written with the backend's own format/scoring code
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
 log = logging.getLogger(__name__)
 
@@ -265,8 +272,9 @@ def write_snapshot(
     bucket_index: dict,
     entity_activity: dict,
     metadata: dict,
+    binary: bool = True,
 ) -> None:
-    """Write snapshot JSON file."""
+    """Write snapshot JSON file (and its binary sibling unless disabled)."""
     snapshot = {
         "metadata": metadata,
         "entities": entities,
@@ -280,6 +288,11 @@ def write_snapshot(
     size_mb = path.stat().st_size / (1024 * 1024)
     log.info(f"Wrote {path} ({size_mb:.1f} MB)")
 
+    if binary:
+        from app.binary_snapshot import SNAPSHOT_SUFFIX, write_binary_snapshot
+
+        write_binary_snapshot(path.with_suffix(SNAPSHOT_SUFFIX), snapshot)
+
 
 def main():
     parser = argparse.ArgumentParser(description="Preprocess IBM AML data for ANGELA")
@@ -289,6 +302,7 @@ def main():
     parser.add_argument("--entities", type=int, default=500, help="Target entity count for sample_small")
     parser.add_argument("--tx", type=int, default=5000, help="Target tx count for sample_small")
     parser.add_argument("--bucket_size", type=int, default=86400, help="Bucket size in seconds (default: 1 day)")
+    parser.add_argument("--no-binary", dest="binary", action="store_false", help="Skip writing .angela binary snapshots")
     args = parser.parse_args()
 
     input_path = Path(args.input)
@@ -339,6 +353,7 @@ def main():
             "t0": t0_small,
             "sample_type": "small",
         },
+        binary=args.binary,
     )
 
     # sample (demo)
@@ -357,6 +372,7 @@ def main():
             "t0": t0_demo,
             "sample_type": "demo",
         },
+        binary=args.binary,
     )
 
     # Validation